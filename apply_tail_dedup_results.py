@@ -32,22 +32,31 @@ Usage:
 import argparse
 import json
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 from collections import defaultdict
 import regex as re
 import networkx as nx
 
-from utils_ import graph_processor
+from utils_ import graph_processor, graph_rewrite, union_find
 from utils_.logger import logger
 
 
 class TailDedupApplicator:
     """Apply tail deduplication results to a knowledge graph."""
     
-    def __init__(self, graph: nx.MultiDiGraph):
+    def __init__(self, graph: nx.MultiDiGraph, entity_resolver: Optional[union_find.EntityUnionFind] = None):
+        """
+        Args:
+            graph: Graph to deduplicate in place
+            entity_resolver: Optional shared union-find over node ids; every
+                member -> representative replacement is recorded in it
+        """
         self.graph = graph
-        # Mapping from node identifier string to its representative
-        self.node_mapping: Dict[str, str] = {}
+        self.entity_resolver = entity_resolver
+        # Disjoint sets of node identifier strings; find() gives the representative
+        self.node_resolver = union_find.EntityUnionFind()
+        # (label, name, chunk id) -> first matching node id, built on first lookup
+        self._identifier_index: Dict[Tuple[str, str, str], str] | None = None
         self.node_mapping_reverse: Dict[str,list[str]] = defaultdict(list[str])
         self.name_mapping: Dict[str, str] = {}
         self.name_mapping_reverse: Dict['str', list[str]] = defaultdict(list[str])
@@ -147,22 +156,22 @@ class TailDedupApplicator:
             return None
         label = label.replace('[', '').replace(']', '')
         
-        # Search for matching node in the graph
-        for node_id, node_data in self.graph.nodes(data=True):
-            props = node_data.get('properties', {})
-            #if '单位: 百万分比 (ppm)' in props.get('name', '') and '单位: 百万分比 (ppm)' in node_str:
-            #    import pdb; pdb.set_trace()
-            
-            if node_data.get('label') != label:
-                continue
-            
-            node_name = props.get('name', '')
-            node_chunk_id = props.get('chunk id', '')
-            schema_type = props.get('schema_type', '')
-            if node_name == name and node_chunk_id == chunk_id and schema_type == schema_type:
-                return node_id
-        
-        return None
+        node_id = self._get_identifier_index().get((label, name, chunk_id))
+        if node_id is not None and node_id not in self.graph:
+            # Nodes were removed since the index was built
+            self._identifier_index = None
+            node_id = self._get_identifier_index().get((label, name, chunk_id))
+        return node_id
+    
+    def _get_identifier_index(self) -> Dict[Tuple[str, str, str], str]:
+        """Index nodes by (label, name, chunk id) in one pass; the first matching node wins."""
+        if self._identifier_index is None:
+            index = {}
+            for node_id, node_data in self.graph.nodes(data=True):
+                props = node_data.get('properties', {})
+                index.setdefault((node_data.get('label'), props.get('name', ''), props.get('chunk id', '')), node_id)
+            self._identifier_index = index
+        return self._identifier_index
     
     def build_mapping_from_dedup_results(self, dedup_results: List[Dict]) -> None:
         """
@@ -196,7 +205,7 @@ class TailDedupApplicator:
                 
                 # Map all members to the representative
                 for member in members:
-                    self.node_mapping[member] = representative
+                    self.node_resolver.union(member, representative)
                     self.node_mapping_reverse[representative].append(member)
 
                     representative_node = self._find_node_by_identifier(representative)
@@ -215,7 +224,7 @@ class TailDedupApplicator:
                 self.stats['total_members'] += len(members)
         #import pdb;pdb.set_trace()
         logger.info(f"Built mapping with {self.stats['total_clusters']} clusters and {self.stats['total_members']} total members")
-        logger.info(f"Mapping entries: {len(self.node_mapping)}")
+        logger.info(f"Mapping entries: {len(self.node_resolver)}")
     
     def _get_representative(self, node_id: str) -> str:
         """
@@ -245,11 +254,11 @@ class TailDedupApplicator:
         
         
         # Check if this node has a mapping
-        if node_str not in self.node_mapping:
+        if node_str not in self.node_resolver:
             return node_id
         
         # Get representative identifier
-        rep_str = self.node_mapping[node_str]
+        rep_str = self.node_resolver.find(node_str)
         
         # If representative is same as current, no change needed
         if rep_str == node_str:
@@ -263,6 +272,8 @@ class TailDedupApplicator:
             logger.warning(f"Representative node not found for {node_str} -> {rep_str}, keeping original")
             return node_id
         
+        if self.entity_resolver is not None:
+            self.entity_resolver.union(node_id, rep_node_id)
         return rep_node_id
     
     def apply_to_edges(self) -> None:
@@ -272,195 +283,32 @@ class TailDedupApplicator:
         For each edge, replace BOTH head and tail nodes with their representatives
         if they are in a dedup cluster. This ensures all occurrences of deduplicated
         nodes are replaced, regardless of their position in the triple.
+        
+        Replaced members stay linked to their representative through an
+        "等同于" edge. The edge list is rewritten in one pass; edges that end up
+        identical are merged and edges that only become self-loops are dropped.
         """
         logger.info("Applying deduplication to edges...")
         
-        edges_to_add = []
-        edges_to_remove = []
-        edges_to_save = []
-
-        ori_graph_has_save_head_and_tails = defaultdict(bool)
-
-        edge_to_remove_edge_to_add_dict = defaultdict(str)
-        
-        for u, v, key, data in self.graph.edges(keys=True, data=True):
-            
-            if (key != 0):
-                logger.warning(f"key: {key} is not 0, {self.graph.nodes[u]['properties']['name']} -> {data.get('relation', '')} -> {self.graph.nodes[v]['properties']['name']}")
-            
-            # Get representatives for BOTH head and tail nodes
-            u_rep = self._get_representative(u)
-            v_rep = self._get_representative(v)
-            u_meta = self.graph.nodes[u].get('properties', {})
-            v_meta = self.graph.nodes[v].get('properties', {})
-            u_meta_rep = self.graph.nodes[u_rep].get('properties', {})
-            v_meta_rep = self.graph.nodes[v_rep].get('properties', {})
-
-            ori_graph_has_save_head_and_tail = False
-            if u == v:
-                ori_graph_has_save_head_and_tail = True
-                        
-            if u == u_rep and v in self.node_mapping_reverse[u_rep]:
-                import pdb; pdb.set_trace()
-
-            if v == v_rep and u in self.node_mapping_reverse[v_rep]:
-                import pdb; pdb.set_trace()
-
-            #if "环状伪影" in u_meta.get('name', '') or "截断伪影" in u_meta_rep.get('name', ''):
-            #    import pdb; pdb.set_trace()
-
-            #if "空间预饱和" in u_meta.get('name', '') and "可细分为" in data.get('relation', ''):
-            #    import ipdb; ipdb.set_trace()
-
-            #if u_rep == v_rep and "别名包括" in data.get('relation', ''):
-            #    logger.warning(f"{self.graph.nodes[u]['properties']['name']}({u}) "\
-            #        f"and {self.graph.nodes[v]['properties']['name']}({v}) has same representative {self.graph.nodes[u_rep]['properties']['name']}({u_rep})")
-            #    #import pdb; pdb.set_trace()
-            #    has_alias_edge = False
-            #    if self.graph.has_edge(u_rep, v):
-            #        for edge_key, edge_data in self.graph[u][v].items():
-            #            if edge_data.get('relation') == '别名包括':
-            #                #import pdb; pdb.set_trace()
-            #                has_alias_edge = True
-            #                break
-            #    if has_alias_edge:
-            #        pass
-            #    else:
-            #        logger.warning(f"Adding alias edge: {self.graph.nodes[u_rep]['properties']['name']}({u_rep}) -> {data.get('relation', '')} -> {self.graph.nodes[v]['properties']['name']}({v})")
-            #        edges_to_add.append((u_rep, v, {'relation': '别名包括'}))
-            #        edges_to_remove.append((u, v, key, data))
-            #else:
-
-            # If either head or tail should be replaced
-            if u_rep != u or v_rep != v:
-                relation = data.get('relation', '')
-                
-                # Check if edge with representatives already exists
-                if u_rep != v_rep or ori_graph_has_save_head_and_tail:
-                    edge_exists = False
-                    if self.graph.has_edge(u_rep, v_rep):
-                        for edge_key, edge_data in self.graph[u_rep][v_rep].items():
-                            if edge_data.get('relation') == relation:
-                                edge_exists = True
-                                break
-                                
-                    if not edge_exists:
-                        if (u_rep, v_rep, data) in edges_to_add:
-                            continue
-                        edges_to_add.append((u_rep, v_rep, data))
-                        assert (u_rep + '_' + v_rep + '_' + data.get('relation', '')) not in ori_graph_has_save_head_and_tails, f"{(u_rep + '_' + v_rep + '_' + data.get('relation', ''))} already in ori_graph_has_save_head_and_tails"
-                        ori_graph_has_save_head_and_tails[(u_rep + '_' + v_rep + '_' + data.get('relation', ''))] = ori_graph_has_save_head_and_tail
-                        
-                        dickey = "+".join([u, v, str(key), data.get('relation', '')])
-                        edge_to_remove_edge_to_add_dict[dickey] = "+".join([u_rep, v_rep, data.get('relation', '')])
-                
-                alias_edge_exists = False
-                if u_rep != u:
-                    if self.graph.has_edge(u_rep, u):
-                        for edge_key, edge_data in self.graph[u_rep][u].items():
-                            if edge_data.get('relation') == '别名包括' or edge_data.get('relation') == '等同于':
-                                alias_edge_exists = True
-                                break
-                    selected_alias_relation = {'relation': '等同于'}
-                    if (u_rep, u, {'relation': '别名包括'}) in edges_to_add or (u_rep, u, {'relation': '等同于'}) in edges_to_add:                        
-                        alias_edge_exists = True
-                        if (u_rep, u, {'relation': '等同于'}) in edges_to_add:
-                            selected_alias_relation = {'relation': '等同于'}
-                    if not alias_edge_exists:
-                        #if "奈奎斯特伪影" in u_meta.get('name', '') or "折绕伪影" in u_meta_rep.get('name', ''):
-                        #    import pdb; pdb.set_trace()
-                        edges_to_add.append((u_rep, u, selected_alias_relation))
-
-                        #self.graph.nodes[u_rep]['properties']['chunk id'] += ',' + self.graph.nodes[u]['properties']['chunk id']
-                    edges_to_save.append((u_rep, u, selected_alias_relation))
-
-                alias_edge_exists = False
-                if v_rep != v:
-                    if self.graph.has_edge(v_rep, v):
-                        for edge_key, edge_data in self.graph[v_rep][v].items():
-                            if edge_data.get('relation') == '别名包括' or edge_data.get('relation') == '等同于' :
-                                alias_edge_exists = True
-                                break
-                    selected_alias_relation = {'relation': '等同于'}
-                    if (v_rep, v, {'relation': '别名包括'}) in edges_to_add or (v_rep, v, {'relation': '等同于'}) in edges_to_add:
-                        alias_edge_exists = True
-                        if (v_rep, v, {'relation': '等同于'}) in edges_to_add:
-                            selected_alias_relation = {'relation': '等同于'}
-                    if not alias_edge_exists:
-                        #if "奈奎斯特伪影" in v_meta.get('name', '') or "折绕伪影" in v_meta_rep.get('name', ''):
-                        #    import pdb; pdb.set_trace()
-                        edges_to_add.append((v_rep, v, selected_alias_relation))
-
-                        #self.graph.nodes[v_rep]['properties']['chunk id'] += ',' + self.graph.nodes[v]['properties']['chunk id']
-                    edges_to_save.append((v_rep, v, selected_alias_relation))
-
-                edges_to_remove.append((u, v, key, data))
-                self.stats['edges_updated'] += 1
-        
-        # Apply changes
-        for u, v, key, data in edges_to_remove:
-            if (u,v,data) in edges_to_save:
-                continue
-            dictkey = "+".join([u, v, str(key), data.get('relation', '')])
-
-            self.graph.remove_edge(u, v, key)
-            
-            #if dictkey in edge_to_remove_edge_to_add_dict:
-#
-            #    try:
-#
-            #        to_add_edge = edge_to_remove_edge_to_add_dict[dictkey]
-            #        to_add_edge_split = to_add_edge.split("+")
-            #        to_add_u = to_add_edge_split[0]
-            #        to_add_v = to_add_edge_split[1]
-            #        to_add_relation = to_add_edge_split[2]
-#
-            #        logger.info(f"Removed edge: "\
-            #        f"{self.graph.nodes[u]['properties']['name']} -> "\
-            #        f"{data.get('relation', '')} -> "\
-            #        f"{self.graph.nodes[v]['properties']['name']}"\
-            #        f"  | To Add edge: {self.graph.nodes[to_add_u]['properties']['name']} -> {to_add_relation} -> {self.graph.nodes[to_add_v]['properties']['name']}")
-            #    except:
-            #        import pdb; pdb.set_trace()
-            #        print()
-            #else:
-            logger.info(f"Removed edge: "\
-                    f"{self.graph.nodes[u]['properties']['name']} -> "\
-                    f"{data.get('relation', '')} -> "\
-                    f"{self.graph.nodes[v]['properties']['name']}")
-
-        
-        for u, v, data in edges_to_add:
-            #if u=='entity_237' and v=='entity_237':
-            #    import ipdb; ipdb.set_trace()
-            if u == v and not ori_graph_has_save_head_and_tails[(u + '_' + v + '_' + data.get('relation', ''))]:
-                logger.warning(f"Skipping self-loop edge: {self.graph.nodes[u]['properties']['name']} -> {data.get('relation', '')} -> {self.graph.nodes[v]['properties']['name']}")
-                continue
-            elif u == v and ori_graph_has_save_head_and_tails[(u + '_' + v + '_' + data.get('relation', ''))]:
-                logger.warning(f"Adding edge Which has same head and tail in ori graph: {self.graph.nodes[u]['properties']['name']}({self.name_mapping_reverse[self.graph.nodes[u]['properties']['name']]}) -> {data.get('relation', '')} -> {self.graph.nodes[v]['properties']['name']}({self.name_mapping_reverse[self.graph.nodes[v]['properties']['name']]})")
-
-            if self.graph.has_edge(u, v):
-                exists_edge_data = self.graph[u][v]
-                if data.get('relation', '') in exists_edge_data:
-                    if data.get("relation") == exists_edge_data.get("relation"):
-                        logger.warning(f"Skipping existing edge: {self.graph.nodes[u]['properties']['name']} -> {data.get('relation', '')} -> {self.graph.nodes[v]['properties']['name']}")
-                        import pdb; pdb.set_trace()
-                        continue
-                    else:
-                        logger.warning(f"---Skipping existing edge: {self.graph.nodes[u]['properties']['name']} -> {data.get('relation', '')} -> {self.graph.nodes[v]['properties']['name']}")
-                        import pdb; pdb.set_trace()
-
-            self.graph.add_edge(u, v, **data)
-            #if "数据采样不足" in self.graph.nodes[u]['properties']['name'] and \
-            #    'member_of' in data.get('relation','') and '采样优化策略' in self.graph.nodes[v]['properties']['name']:
-            #    import pdb; pdb.set_trace()
-            logger.info(f"Added edge: "\
-                f"{self.graph.nodes[u]['properties']['name']} -> {data.get('relation', '')} -> "\
-                f"{self.graph.nodes[v]['properties']['name']}")
-            
-
+        mapping = {}
+        for node_id in self.graph.nodes():
+            representative = self._get_representative(node_id)
+            if representative != node_id:
+                mapping[node_id] = representative
+        
+        rewrite_stats = graph_rewrite.rewrite_edges(
+            self.graph,
+            mapping,
+            alias_relation='等同于',
+            alias_relations=('别名包括', '等同于')
+        )
+        self.stats['edges_updated'] += rewrite_stats['edges_remapped']
         
-        logger.info(f"Updated {self.stats['edges_updated']} edges")
+        logger.info(
+            f"Updated {self.stats['edges_updated']} edges "
+            f"({rewrite_stats['edges_merged']} merged, {rewrite_stats['self_loops_dropped']} self-loops dropped, "
+            f"{rewrite_stats['alias_edges_added']} alias edges added)"
+        )
 
     
     def apply_to_communities(self) -> None:
@@ -635,7 +483,7 @@ def _parse_args() -> argparse.Namespace:
         "--graph",
         required=True,
         type=Path,
-        help="Path to the input graph JSON file"
+        help="Path to the input graph file (.json or compact .npz)"
     )
     parser.add_argument(
         "--dedup-results",
@@ -647,7 +495,7 @@ def _parse_args() -> argparse.Namespace:
         "--output",
         required=True,
         type=Path,
-        help="Path to save the deduplicated graph JSON"
+        help="Path to save the deduplicated graph (.json or compact .npz)"
     )
     return parser.parse_args()
 
@@ -657,7 +505,7 @@ def main() -> None:
     #import pdb; pdb.set_trace()
     # Load graph
     logger.info(f"Loading graph from {args.graph}")
-    graph = graph_processor.load_graph_from_json(str(args.graph))
+    graph = graph_processor.load_graph(str(args.graph))
     
     original_nodes = graph.number_of_nodes()
     original_edges = graph.number_of_edges()
@@ -673,8 +521,11 @@ def main() -> None:
     
     logger.info(f"Loaded {len(dedup_results)} deduplication groups")
     
-    # Apply deduplication
-    applicator = TailDedupApplicator(graph)
+    # Apply deduplication, extending the merge state saved with the input graph
+    entity_resolver = union_find.EntityUnionFind.load(union_find.resolver_path_for_graph(str(args.graph)))
+    if entity_resolver is None:
+        entity_resolver = union_find.EntityUnionFind.from_alias_graph(graph)
+    applicator = TailDedupApplicator(graph, entity_resolver=entity_resolver)
     stats = applicator.apply_all(dedup_results)
     
     final_nodes = graph.number_of_nodes()
@@ -696,7 +547,8 @@ def main() -> None:
     
     # Save deduplicated graph
     args.output.parent.mkdir(parents=True, exist_ok=True)
-    graph_processor.save_graph_to_json(graph, str(args.output))
+    graph_processor.save_graph(graph, str(args.output))
+    entity_resolver.save(union_find.resolver_path_for_graph(str(args.output)))
     logger.info(f"Deduplicated graph saved to {args.output}")
 
     # Return the deduplicated graph
@@ -10,6 +10,8 @@ import json
 import asyncio
 import glob
 import shutil
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Optional
 from datetime import datetime
 
@@ -25,6 +27,7 @@ from pydantic import BaseModel
 import uvicorn
 
 from utils.logger import logger
+from utils.job_manager import JobManager
 import ast
 
 # Try to import GraphRAG components
@@ -80,7 +83,261 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+# Rough per-element overheads used when estimating a retriever's resident size
+GRAPH_NODE_OVERHEAD_BYTES = 1024
+GRAPH_EDGE_OVERHEAD_BYTES = 512
+
+
+def _estimate_retriever_bytes(kt_retriever) -> int:
+    """Estimate the memory held by a warm KTRetriever (embeddings, FAISS indices, graph)"""
+    total = 0
+    faiss_retriever = getattr(kt_retriever, "faiss_retriever", None)
+
+    embedding_caches = [
+        getattr(kt_retriever, "node_embedding_cache", {}),
+        getattr(kt_retriever, "chunk_embedding_cache", {}),
+        getattr(faiss_retriever, "node_embedding_cache", {}),
+    ]
+    for cache in embedding_caches:
+        for embed in (cache or {}).values():
+            if hasattr(embed, "element_size") and hasattr(embed, "nelement"):
+                total += embed.element_size() * embed.nelement()
+            elif hasattr(embed, "nbytes"):
+                total += embed.nbytes
+
+    indices = [getattr(kt_retriever, "chunk_faiss_index", None)]
+    for name in ("node_index", "relation_index", "triple_index", "comm_index"):
+        indices.append(getattr(faiss_retriever, name, None))
+    for index in indices:
+        if index is not None and hasattr(index, "ntotal") and hasattr(index, "d"):
+            total += int(index.ntotal) * int(index.d) * 4
+
+    text_index = getattr(kt_retriever, "_node_text_index", None)
+    for name in ("offsets", "postings", "tfs", "doc_lengths"):
+        array = getattr(text_index, name, None)
+        if hasattr(array, "nbytes"):
+            total += array.nbytes
+
+    graph = getattr(kt_retriever, "graph", None)
+    if graph is not None:
+        total += graph.number_of_nodes() * GRAPH_NODE_OVERHEAD_BYTES
+        total += graph.number_of_edges() * GRAPH_EDGE_OVERHEAD_BYTES
+
+    return total
+
+
+class RetrieverPool:
+    """Dataset-keyed pool of warm KTRetriever instances.
+
+    Retrievers are built lazily on first use (graph load + build_indices), kept
+    in LRU order and evicted once the estimated memory footprint exceeds the
+    budget. Entries are dropped when the dataset is rebuilt or deleted, or when
+    the graph file on disk changes.
+    """
+
+    def __init__(self, memory_budget_mb: int = 4096):
+        self.memory_budget_bytes = int(memory_budget_mb) * 1024 * 1024
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._qa_encoder = None
+
+    def _get_load_lock(self, dataset_name: str) -> threading.Lock:
+        with self._lock:
+            if dataset_name not in self._load_locks:
+                self._load_locks[dataset_name] = threading.Lock()
+            return self._load_locks[dataset_name]
+
+    def _get_qa_encoder(self, cfg):
+        """Share one SentenceTransformer across all pooled retrievers"""
+        if self._qa_encoder is None:
+            from sentence_transformers import SentenceTransformer
+            self._qa_encoder = SentenceTransformer(cfg.embeddings.model_name)
+        return self._qa_encoder
+
+    def _is_fresh(self, entry: Dict, graph_path: str) -> bool:
+        if entry["graph_path"] != graph_path:
+            return False
+        try:
+            return os.path.getmtime(graph_path) == entry["graph_mtime"]
+        except OSError:
+            return False
+
+    def get(self, dataset_name: str, graph_path: str, schema_path: str, cfg):
+        """Return a warm retriever for the dataset, loading it if necessary"""
+        with self._get_load_lock(dataset_name):
+            with self._lock:
+                entry = self._entries.get(dataset_name)
+                if entry is not None:
+                    if self._is_fresh(entry, graph_path):
+                        self._entries.move_to_end(dataset_name)
+                        return entry["retriever"]
+                    del self._entries[dataset_name]
+                    logger.info(f"Retriever for '{dataset_name}' is stale, reloading")
+                generation = self._generations.get(dataset_name, 0)
+
+            graph_mtime = os.path.getmtime(graph_path)
+            start_time = datetime.now()
+            kt_retriever = retriever.KTRetriever(
+                dataset_name,
+                graph_path,
+                qa_encoder=self._get_qa_encoder(cfg),
+                recall_paths=cfg.retrieval.recall_paths,
+                schema_path=schema_path,
+                top_k=cfg.retrieval.top_k_filter,
+                mode="agent",  # 强制 agent 模式
+                config=cfg
+            )
+            kt_retriever.build_indices()
+            size_bytes = _estimate_retriever_bytes(kt_retriever)
+            elapsed = (datetime.now() - start_time).total_seconds()
+            logger.info(
+                f"Loaded retriever for '{dataset_name}' in {elapsed:.1f}s "
+                f"(~{size_bytes / (1024 * 1024):.1f} MB)"
+            )
+
+            with self._lock:
+                if self._generations.get(dataset_name, 0) != generation:
+                    # Dataset was invalidated while loading; serve this request but don't cache it
+                    return kt_retriever
+                self._entries[dataset_name] = {
+                    "retriever": kt_retriever,
+                    "graph_path": graph_path,
+                    "graph_mtime": graph_mtime,
+                    "size_bytes": size_bytes,
+                }
+                self._evict(keep=dataset_name)
+            return kt_retriever
+
+    def _evict(self, keep: str) -> None:
+        """Evict least recently used retrievers until the pool fits the budget (lock held)"""
+        total = sum(entry["size_bytes"] for entry in self._entries.values())
+        while total > self.memory_budget_bytes and len(self._entries) > 1:
+            dataset_name = next(iter(self._entries))
+            if dataset_name == keep:
+                break
+            entry = self._entries.pop(dataset_name)
+            total -= entry["size_bytes"]
+            logger.info(f"Evicted retriever for '{dataset_name}' (~{entry['size_bytes'] / (1024 * 1024):.1f} MB)")
+
+    def invalidate(self, dataset_name: str) -> None:
+        """Drop the cached retriever for a dataset whose graph or caches changed"""
+        with self._lock:
+            self._generations[dataset_name] = self._generations.get(dataset_name, 0) + 1
+            if self._entries.pop(dataset_name, None) is not None:
+                logger.info(f"Invalidated retriever for '{dataset_name}'")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "datasets": list(self._entries.keys()),
+                "total_bytes": sum(entry["size_bytes"] for entry in self._entries.values()),
+                "memory_budget_bytes": self.memory_budget_bytes,
+            }
+
+retriever_pool: Optional[RetrieverPool] = None
+
+
+def get_retriever_pool() -> RetrieverPool:
+    global retriever_pool, config
+    if retriever_pool is None:
+        if config is None:
+            config = get_config("config/base_config.yaml")
+        budget_mb = getattr(config.retrieval, "pool_memory_budget_mb", 4096)
+        retriever_pool = RetrieverPool(memory_budget_mb=budget_mb)
+    return retriever_pool
+
 # Request/Response models
+# Overall progress range (start, end) assigned to each KTBuilder stage
+CONSTRUCTION_STAGE_RANGES = {
+    "init": (5, 10),
+    "extraction": (10, 60),
+    "triple_dedup": (60, 65),
+    "semantic_dedup": (60, 65),
+    "head_dedup": (65, 75),
+    "community": (75, 90),
+    "saving": (90, 98),
+}
+
+job_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    global job_manager, config
+    if job_manager is None:
+        if config is None:
+            config = get_config("config/base_config.yaml")
+        max_jobs = getattr(config.construction, "max_concurrent_jobs", 1)
+        job_manager = JobManager(jobs_dir="output/jobs", max_concurrent_jobs=max_jobs)
+    return job_manager
+
+
+def _submit_construction_job(kind: str, dataset_name: str, corpus_path: str, schema_path: str,
+                             client_id: str, loop: asyncio.AbstractEventLoop) -> str:
+    """Queue a KTBuilder run as a background job that streams progress over the websocket"""
+    def notify(message: dict):
+        asyncio.run_coroutine_threadsafe(manager.send_message(message, client_id), loop)
+
+    def run(progress, cancel_event):
+        def on_stage(stage: str, fraction: float, message: str):
+            start, end = CONSTRUCTION_STAGE_RANGES.get(stage, (0, 100))
+            percent = start + (end - start) * fraction
+            progress(stage, percent, message)
+            asyncio.run_coroutine_threadsafe(
+                send_progress_update(client_id, kind, int(percent), message), loop
+            )
+
+        try:
+            on_stage("init", 0.0, "初始化图构建器...")
+            builder = constructor.KTBuilder(
+                dataset_name,
+                schema_path,
+                mode=config.construction.mode,
+                config=config,
+                progress_callback=on_stage,
+                cancel_event=cancel_event
+            )
+            builder.build_knowledge_graph(corpus_path)
+        except constructor.ConstructionCancelled:
+            notify({"type": "error", "dataset_name": dataset_name, "message": "Construction cancelled"})
+            raise
+        except Exception as e:
+            notify({"type": "error", "dataset_name": dataset_name, "message": str(e)})
+            raise
+        finally:
+            get_retriever_pool().invalidate(dataset_name)
+
+        graph_path = f"output/graphs/{dataset_name}_new.json"
+        notify({"type": "complete", "dataset_name": dataset_name,
+                "message": "Knowledge graph constructed successfully"})
+        return {"dataset_name": dataset_name, "graph_path": graph_path}
+
+    return get_job_manager().submit(
+        kind,
+        {"dataset_name": dataset_name, "corpus_path": corpus_path, "client_id": client_id},
+        run
+    )
+
+
+def _find_active_job(dataset_name: str) -> Optional[Dict]:
+    jobs = get_job_manager()
+    return jobs.find_active("construction", dataset_name=dataset_name) or \
+        jobs.find_active("reconstruction", dataset_name=dataset_name)
+
+
+def _has_active_job(dataset_name: str) -> bool:
+    return job_manager is not None and _find_active_job(dataset_name) is not None
+
+
+def _ensure_no_active_job(dataset_name: str) -> None:
+    active = _find_active_job(dataset_name)
+    if active is not None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Dataset '{dataset_name}' already has an active job {active['job_id']} ({active['status']})"
+        )
+
 class FileUploadResponse(BaseModel):
     success: bool
     message: str
@@ -94,6 +351,7 @@ class GraphConstructionResponse(BaseModel):
     success: bool
     message: str
     graph_data: Optional[Dict] = None
+    job_id: Optional[str] = None
 
 class QuestionRequest(BaseModel):
     question: str
@@ -176,7 +434,8 @@ async def get_status():
     return {
         "message": "Youtu-GraphRAG Unified Interface is running!", 
         "status": "ok",
-        "graphrag_available": GRAPHRAG_AVAILABLE
+        "graphrag_available": GRAPHRAG_AVAILABLE,
+        "retriever_pool": retriever_pool.stats() if retriever_pool is not None else None
     }
 
 @app.websocket("/ws/{client_id}")
@@ -298,18 +557,12 @@ async def create_dataset_config():
 
 @app.post("/api/construct-graph", response_model=GraphConstructionResponse)
 async def construct_graph(request: GraphConstructionRequest, client_id: str = "default"):
-    """Construct knowledge graph from uploaded data"""
+    """Queue knowledge graph construction for uploaded data; progress is streamed over the websocket"""
     try:
         if not GRAPHRAG_AVAILABLE:
             raise HTTPException(status_code=503, detail="GraphRAG components not available. Please install or configure them.")
         dataset_name = request.dataset_name
-        
-        await send_progress_update(client_id, "construction", 2, "清理旧缓存文件...")
-        
-        # Clear all cache files before construction
-        await clear_cache_files(dataset_name)
-        
-        await send_progress_update(client_id, "construction", 5, "初始化图构建器...")
+        _ensure_no_active_job(dataset_name)
         
         # Get dataset paths
         corpus_path = f"data/uploaded/{dataset_name}/corpus.json" 
@@ -323,66 +576,30 @@ async def construct_graph(request: GraphConstructionRequest, client_id: str = "d
         if not os.path.exists(corpus_path):
             raise HTTPException(status_code=404, detail="Dataset not found")
         
-        await send_progress_update(client_id, "construction", 10, "加载配置和语料库...")
+        await send_progress_update(client_id, "construction", 2, "清理旧缓存文件...")
+        
+        # Clear all cache files before construction
+        get_retriever_pool().invalidate(dataset_name)
+        await clear_cache_files(dataset_name)
         
         # Initialize config
         global config
         if config is None:
             config = get_config("config/base_config.yaml")
         
-        # Initialize KTBuilder
-        builder = constructor.KTBuilder(
-            dataset_name,
-            schema_path,
-            mode=config.construction.mode,
-            config=config
+        job_id = _submit_construction_job(
+            "construction", dataset_name, corpus_path, schema_path, client_id, asyncio.get_running_loop()
         )
-        
-        await send_progress_update(client_id, "construction", 20, "开始实体关系抽取...")
-        
-        # Build knowledge graph
-        def build_graph_sync():
-            return builder.build_knowledge_graph(corpus_path)
-        
-        # Run in executor to avoid blocking
-        loop = asyncio.get_event_loop()
-        
-        # Progress simulation for different stages
-        stages = [
-            (30, "抽取实体和关系中..."),
-            (50, "社区检测中..."),
-            (70, "构建层次结构中..."),
-            (85, "优化图结构中..."),
-        ]
-        # Start progress updates
-        async def update_progress():
-            for progress, message in stages:
-                await asyncio.sleep(3)  # Simulate work time
-                await send_progress_update(client_id, "construction", progress, message)
-        
-        # Run both graph construction and progress updates
-        progress_task = asyncio.create_task(update_progress())
-        
-        try:
-            knowledge_graph = await loop.run_in_executor(None, build_graph_sync)
-            progress_task.cancel()
-        except Exception as e:
-            progress_task.cancel()
-            raise e
-        
-        await send_progress_update(client_id, "construction", 95, "准备可视化数据...")
-        # Load constructed graph for visualization
-        graph_path = f"output/graphs/{dataset_name}_new.json"
-        graph_vis_data = await prepare_graph_visualization(graph_path)
-        
-        await send_progress_update(client_id, "construction", 100, "图构建完成!")
+        await send_progress_update(client_id, "construction", 5, f"构图任务已提交 (job {job_id})...")
         
         return GraphConstructionResponse(
             success=True,
-            message="Knowledge graph constructed successfully",
-            graph_data=graph_vis_data
+            message="Knowledge graph construction started",
+            job_id=job_id
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         await send_progress_update(client_id, "construction", 0, f"构建失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -549,7 +766,7 @@ async def ask_question(request: QuestionRequest, client_id: str = "default"):
         dataset_name = request.dataset_name
         question = request.question
 
-        await send_progress_update(client_id, "retrieval", 10, "初始化检索系统 (agent 模式)...")
+        await send_progress_update(client_id, "retrieval", 10, "加载检索系统 (agent 模式)...")
 
         graph_path = f"output/graphs/{dataset_name}_new.json"
         schema_path = "schemas/demo.json"
@@ -564,18 +781,12 @@ async def ask_question(request: QuestionRequest, client_id: str = "default"):
             config = get_config("config/base_config.yaml")
 
         graphq = decomposer.GraphQ(dataset_name, config=config)
-        kt_retriever = retriever.KTRetriever(
-            dataset_name,
-            graph_path,
-            recall_paths=config.retrieval.recall_paths,
-            schema_path=schema_path,
-            top_k=config.retrieval.top_k_filter,
-            mode="agent",  # 强制 agent 模式
-            config=config
+        # Warm retriever from the pool; only the first question for a dataset pays for loading
+        loop = asyncio.get_event_loop()
+        kt_retriever = await loop.run_in_executor(
+            None, get_retriever_pool().get, dataset_name, graph_path, schema_path, config
         )
-
-        await send_progress_update(client_id, "retrieval", 40, "构建索引...")
-        kt_retriever.build_indices()
+        await send_progress_update(client_id, "retrieval", 40, "检索系统就绪...")
 
         # Helper functions (复用 main.py 逻辑的精简版)
         def _dedup(items):
@@ -844,6 +1055,8 @@ async def get_datasets():
                 if os.path.exists(corpus_path):
                     graph_path = f"output/graphs/{item}_new.json"
                     status = "ready" if os.path.exists(graph_path) else "needs_construction"
+                    if _has_active_job(item):
+                        status = "constructing"
                     datasets.append({
                         "name": item,
                         "type": "uploaded",
@@ -855,6 +1068,8 @@ async def get_datasets():
     if os.path.exists(demo_corpus):
         demo_graph = "output/graphs/demo_new.json"
         status = "ready" if os.path.exists(demo_graph) else "needs_construction"
+        if _has_active_job("demo"):
+            status = "constructing"
         datasets.append({
             "name": "demo",
             "type": "demo", 
@@ -869,7 +1084,11 @@ async def delete_dataset(dataset_name: str):
     try:
         if dataset_name == "demo":
             raise HTTPException(status_code=400, detail="Cannot delete demo dataset")
+        if _has_active_job(dataset_name):
+            raise HTTPException(status_code=409, detail="Dataset has an active construction job; cancel it first")
         
+        if retriever_pool is not None:
+            retriever_pool.invalidate(dataset_name)
         deleted_files = []
         
         # Delete dataset directory
@@ -899,10 +1118,10 @@ async def delete_dataset(dataset_name: str):
             deleted_files.append(cache_dir)
         
         # Delete chunk files
-        chunk_file = f"output/chunks/{dataset_name}.txt"
-        if os.path.exists(chunk_file):
-            os.remove(chunk_file)
-            deleted_files.append(chunk_file)
+        for chunk_file in (f"output/chunks/{dataset_name}.txt", f"output/chunks/{dataset_name}_hashes.txt"):
+            if os.path.exists(chunk_file):
+                os.remove(chunk_file)
+                deleted_files.append(chunk_file)
         
         return {
             "success": True,
@@ -910,12 +1129,14 @@ async def delete_dataset(dataset_name: str):
             "deleted_files": deleted_files
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete dataset: {str(e)}")
 
 @app.post("/api/datasets/{dataset_name}/reconstruct")
 async def reconstruct_dataset(dataset_name: str, client_id: str = "default"):
-    """Reconstruct graph for an existing dataset"""
+    """Queue graph reconstruction for an existing dataset"""
     try:
         if not GRAPHRAG_AVAILABLE:
             raise HTTPException(status_code=503, detail="GraphRAG components not available. Please install or configure them.")
@@ -926,23 +1147,23 @@ async def reconstruct_dataset(dataset_name: str, client_id: str = "default"):
                 corpus_path = "data/demo/demo_corpus.json"
             else:
                 raise HTTPException(status_code=404, detail="Dataset not found")
+        _ensure_no_active_job(dataset_name)
+        
+        await send_progress_update(client_id, "reconstruction", 1, "开始重新构图...")
         
-        await send_progress_update(client_id, "reconstruction", 5, "开始重新构图...")
+        get_retriever_pool().invalidate(dataset_name)
         
         # Delete existing graph file
         graph_path = f"output/graphs/{dataset_name}_new.json"
         if os.path.exists(graph_path):
             os.remove(graph_path)
-            await send_progress_update(client_id, "reconstruction", 15, "已删除旧图谱文件...")
+            await send_progress_update(client_id, "reconstruction", 2, "已删除旧图谱文件...")
         
         # Delete existing cache files
         cache_dir = f"retriever/faiss_cache_new/{dataset_name}"
         if os.path.exists(cache_dir):
-            import shutil
             shutil.rmtree(cache_dir)
-            await send_progress_update(client_id, "reconstruction", 25, "已清理缓存文件...")
-        
-        await send_progress_update(client_id, "reconstruction", 35, "重新初始化图构建器...")
+            await send_progress_update(client_id, "reconstruction", 3, "已清理缓存文件...")
         
         # Initialize config
         global config
@@ -952,59 +1173,46 @@ async def reconstruct_dataset(dataset_name: str, client_id: str = "default"):
         # Always use demo.json schema for consistency
         schema_path = "schemas/demo.json"
         
-        # Initialize KTBuilder
-        builder = constructor.KTBuilder(
-            dataset_name,
-            schema_path,
-            mode=config.construction.mode,
-            config=config
+        job_id = _submit_construction_job(
+            "reconstruction", dataset_name, corpus_path, schema_path, client_id, asyncio.get_running_loop()
         )
-        
-        await send_progress_update(client_id, "reconstruction", 50, "开始重新构建图谱...")
-        
-        # Build knowledge graph
-        def build_graph_sync():
-            return builder.build_knowledge_graph(corpus_path)
-        
-        # Run in executor to avoid blocking
-        loop = asyncio.get_event_loop()
-        
-        # Progress simulation for different stages
-        stages = [
-            (65, "重新抽取实体和关系中..."),
-            (80, "重新进行社区检测中..."),
-            (90, "重新构建层次结构中..."),
-            (95, "重新优化图结构中..."),
-        ]
-        
-        # Start progress updates
-        async def update_progress():
-            for progress, message in stages:
-                await asyncio.sleep(2)  # Simulate work time
-                await send_progress_update(client_id, "reconstruction", progress, message)
-        
-        # Run both graph construction and progress updates
-        progress_task = asyncio.create_task(update_progress())
-        
-        try:
-            knowledge_graph = await loop.run_in_executor(None, build_graph_sync)
-            progress_task.cancel()
-        except Exception as e:
-            progress_task.cancel()
-            raise e
-        
-        await send_progress_update(client_id, "reconstruction", 100, "图谱重构完成!")
+        await send_progress_update(client_id, "reconstruction", 5, f"重构任务已提交 (job {job_id})...")
         
         return {
             "success": True,
-            "message": "Dataset reconstructed successfully",
-            "dataset_name": dataset_name
+            "message": "Dataset reconstruction started",
+            "dataset_name": dataset_name,
+            "job_id": job_id
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         await send_progress_update(client_id, "reconstruction", 0, f"重构失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/jobs")
+async def list_jobs(kind: Optional[str] = None):
+    """List background jobs, newest first"""
+    return {"jobs": get_job_manager().list_jobs(kind)}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get status and progress of a background job"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Request cancellation of a queued or running job"""
+    if get_job_manager().get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not get_job_manager().cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job has already finished")
+    return {"success": True, "job": get_job_manager().get(job_id)}
+
 @app.get("/api/graph/{dataset_name}")
 async def get_graph_data(dataset_name: str):
     """Get graph visualization data"""
@@ -1039,5 +1247,11 @@ async def startup_event():
     
     logger.info("🚀 Youtu-GraphRAG Unified Interface initialized")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background jobs on shutdown"""
+    if job_manager is not None:
+        job_manager.shutdown(wait=False)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
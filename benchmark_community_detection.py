@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the Tree-Comm community detection engines.
+
+Runs FastTreeComm.detect_communities on the level-2 nodes of a graph with
+each engine (tree_comm.community_engine) and reports runtime, community
+count and size, and modularity on two graphs:
+
+- structural: the undirected graph induced by the level-2 nodes
+- similarity: the sparse kNN-semantic + structural graph used by louvain
+
+Node embeddings are computed once before timing, so the timings cover
+clustering only. Any graph file accepted by graph_processor.load_graph
+works; --synthetic generates a planted-partition graph instead.
+
+Usage:
+    python benchmark_community_detection.py --graph output/graphs/demo_new.json
+    python benchmark_community_detection.py --synthetic 5000 --engines minibatch_kmeans louvain
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+import networkx as nx
+
+from config import get_config
+from utils import graph_processor
+from utils.tree_comm import COMMUNITY_ENGINES, FastTreeComm, similarity_graph
+
+
+def synthetic_graph(n_nodes: int, n_topics: int, seed: int = 42) -> nx.MultiDiGraph:
+    """Planted-partition graph of level-2 entities named after their topic"""
+    rng = random.Random(seed)
+    sizes = [n_nodes // n_topics + (1 if topic < n_nodes % n_topics else 0) for topic in range(n_topics)]
+    partition = nx.random_partition_graph(sizes, p_in=min(1.0, 8 / max(1, max(sizes))), p_out=1 / n_nodes,
+                                          seed=seed, directed=True)
+    graph = nx.MultiDiGraph()
+    for node in partition.nodes():
+        topic = next(index for index, block in enumerate(partition.graph["partition"]) if node in block)
+        graph.add_node(f"entity_{node}", label="entity", level=2,
+                       properties={"name": f"topic {topic} item {rng.randrange(10 ** 6)}"})
+    for u, v in partition.edges():
+        graph.add_edge(f"entity_{u}", f"entity_{v}", relation="related_to")
+    return graph
+
+
+def modularity(graph: nx.Graph, communities, weight="weight") -> float:
+    return nx.community.modularity(graph, [set(members) for members in communities], weight=weight)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare community detection engines")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--graph", help="Graph file (.json or .npz)")
+    source.add_argument("--synthetic", type=int, metavar="N", help="Generate a synthetic graph with N level-2 nodes")
+    parser.add_argument("--topics", type=int, default=50, help="Planted communities in the synthetic graph")
+    parser.add_argument("--engines", nargs="+", default=list(COMMUNITY_ENGINES), choices=COMMUNITY_ENGINES)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per engine (median is reported)")
+    args = parser.parse_args()
+
+    graph = graph_processor.load_graph(args.graph) if args.graph else synthetic_graph(args.synthetic, args.topics)
+    level_nodes = [node for node, data in graph.nodes(data=True) if data.get("level") == 2]
+    config = get_config()
+
+    tree_comm = FastTreeComm(graph, embedding_model=config.tree_comm.embedding_model,
+                             struct_weight=config.tree_comm.struct_weight, config=config)
+    start = time.perf_counter()
+    embeddings = tree_comm.get_triple_embeddings_batch(level_nodes)
+    print(f"{len(level_nodes)} level-2 nodes, {graph.number_of_edges()} edges, "
+          f"embeddings in {time.perf_counter() - start:.2f}s")
+
+    structural = nx.Graph(graph.subgraph(level_nodes))
+    weights = similarity_graph(
+        embeddings,
+        tree_comm._level_adjacency(level_nodes),
+        struct_weight=tree_comm.struct_weight,
+        knn_k=tree_comm.community_knn_k,
+        knn_threshold=tree_comm.community_knn_threshold,
+    )
+    similarity = nx.relabel_nodes(nx.from_scipy_sparse_array(weights), dict(enumerate(level_nodes)))
+
+    print(f"{'engine':<18} {'time (s)':>9} {'comms':>6} {'max size':>8} {'Q struct':>9} {'Q sim':>7}")
+    print("-" * 62)
+    for engine in args.engines:
+        tree_comm.community_engine = engine
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            communities = list(tree_comm.detect_communities(level_nodes).values())
+            timings.append(time.perf_counter() - start)
+        max_size = max((len(members) for members in communities), default=0)
+        q_struct = modularity(structural, communities, weight=None) if structural.number_of_edges() else float("nan")
+        q_sim = modularity(similarity, communities) if similarity.number_of_edges() else float("nan")
+        print(f"{engine:<18} {statistics.median(timings):>9.2f} {len(communities):>6} {max_size:>8} "
+              f"{q_struct:>9.3f} {q_sim:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for CLI and API startup.
+
+Each target is timed in a fresh interpreter so module caches do not leak
+between runs. Heavy dependencies (torch, faiss, spacy, sentence-transformers,
+scikit-learn) are listed separately to show what lazy importing saves.
+
+Usage:
+    python benchmark_startup.py [--repeat 5]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+TARGETS = [
+    ("main.py --help", [sys.executable, "main.py", "--help"]),
+    ("import backend", [sys.executable, "-c", "import backend"]),
+    ("import enhanced_kt_retriever", [sys.executable, "-c", "import models.retriever.enhanced_kt_retriever"]),
+    ("import kt_gen", [sys.executable, "-c", "import models.constructor.kt_gen"]),
+]
+
+HEAVY_MODULES = ["torch", "faiss", "spacy", "sentence_transformers", "sklearn", "openai"]
+
+
+def time_command(cmd, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result.returncode
+
+
+def loaded_heavy_modules(statement: str):
+    """Return the heavy modules that end up in sys.modules after running `statement`"""
+    probe = (
+        f"{statement}\n"
+        "import sys\n"
+        f"print('LOADED:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    for line in result.stdout.splitlines():
+        if line.startswith("LOADED:"):
+            return line[len("LOADED:"):]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure startup/import time")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per target (median is reported)")
+    args = parser.parse_args()
+
+    print(f"{'target':<36} {'median (s)':>10}  {'exit':>4}")
+    print("-" * 56)
+    baseline, _ = time_command([sys.executable, "-c", "pass"], args.repeat)
+    print(f"{'python -c pass':<36} {baseline:>10.3f}  {0:>4}")
+    for name, cmd in TARGETS:
+        median, code = time_command(cmd, args.repeat)
+        print(f"{name:<36} {median:>10.3f}  {code:>4}")
+
+    print("\nHeavy dependencies (eager import cost, for reference):")
+    for module in HEAVY_MODULES:
+        median, code = time_command([sys.executable, "-c", f"import {module}"], args.repeat)
+        status = f"{median:.3f}s" if code == 0 else "not installed"
+        print(f"  {module:<24} {status}")
+
+    print("\nHeavy modules loaded as a side effect of importing:")
+    for statement in ("import backend", "import models.retriever.enhanced_kt_retriever"):
+        loaded = loaded_heavy_modules(statement)
+        if loaded is None:
+            print(f"  {statement:<48} import failed")
+        else:
+            print(f"  {statement:<48} {loaded or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
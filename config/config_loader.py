@@ -47,6 +47,13 @@ class SemanticDedupConfig:
     use_embeddings: bool = True
     embedding_model: str = ""
     prompt_type: str = "general"
+    # Embedding clustering backend: "auto", "exact", "graph" or "hdbscan"
+    clustering_backend: str = "auto"
+    exact_clustering_max_size: int = 2000
+    clustering_knn_k: int = 30
+    clustering_use_faiss: bool = None
+    # Concurrent requests when embedding through the online API
+    embedding_max_workers: int = 8
     save_intermediate_results: bool = False
     intermediate_results_path: str = ""
     # Dual LLM support: separate models for clustering and deduplication
@@ -65,6 +72,7 @@ class ConstructionConfig:
     """Construction configuration"""
     mode: str = "agent"
     max_workers: int = 32
+    max_concurrent_jobs: int = 1
     datasets_no_chunk: list = None
     chunk_size: int = 1000
     overlap: int = 200
@@ -81,6 +89,21 @@ class TreeCommConfig:
     embedding_model: str = "all-MiniLM-L6-v2"
     struct_weight: float = 0.3
     enable_fast_mode: bool = True
+    naming_max_workers: int = 8  # Concurrent community-naming LLM requests
+    naming_token_budget: int = 2000  # Approximate community-data tokens per naming prompt
+    naming_max_batch_size: int = 20  # Max communities per naming prompt
+    naming_min_llm_size: int = 3  # Smaller communities are named from their members without the LLM
+    naming_cache_path: str = "cache/community_names.json"  # Names cached by member set; empty disables
+    community_engine: str = "kmeans"  # "kmeans", "minibatch_kmeans" or "louvain"
+    louvain_resolution: float = 1.0  # Higher values give more, smaller communities
+    community_knn_k: int = 10  # Semantic neighbours per node in the louvain similarity graph
+    community_knn_threshold: float = 0.5  # Minimum cosine for a semantic edge
+    sim_top_k: int = 20  # Most similar nodes kept per node in the sparse refinement similarity matrix
+    embedding_batch_size: int = 128  # Triple texts per encoder call
+    incremental: bool = False  # Extend the saved graph with new documents and update its communities instead of rebuilding
+    incremental_assign_threshold: float = 0.5  # Min cosine to an existing community centroid to join it
+    incremental_size_drift: float = 0.5  # Re-cluster a community that grew by more than this fraction
+    incremental_cohesion_drift: float = 0.1  # Re-cluster a community whose cohesion dropped by more than this
 
 @dataclass
 class FAISSConfig:
@@ -108,6 +131,12 @@ class RetrievalConfig:
     enable_high_recall: bool = True
     enable_caching: bool = True
     cache_dir: str = "retriever/faiss_cache_new"
+    pool_memory_budget_mb: int = 4096  # Memory budget for warm retrievers kept by the backend
+    keyword_extractor: str = "fast"  # "fast", "spacy" or "simple"
+    keyword_cache_size: int = 1024  # Queries memoized by the keyword extractor
+    keyword_top_k: int = 200  # Max nodes returned by BM25 keyword search
+    spacy_model: str = "en_core_web_lg"
+    graph_backend: str = "networkx"  # "networkx" or "compact" (array-backed, read-mostly)
     faiss: FAISSConfig = None
     agent: AgentConfig = None
     
@@ -124,6 +153,7 @@ class EmbeddingsConfig:
     device: str = "cpu"
     batch_size: int = 32
     max_length: int = 512
+    store_path: str = "cache/embeddings"  # Persistent embeddings keyed by text hash; empty disables
 
 
 @dataclass
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Convert a legacy JSON edge-list graph to the compact normalized format.
+
+The JSON format repeats both endpoint nodes (label and full properties) on
+every edge. The compact .npz format stores a node table and an integer edge
+table, which is much smaller and faster to load. Any tool that reads graphs
+through graph_processor.load_graph accepts either file.
+
+Usage:
+    python convert_graph_format.py \
+        --input output/graphs/demo_new.json \
+        --output output/graphs/demo_new.npz
+"""
+
+import argparse
+from pathlib import Path
+
+from utils import graph_processor
+from utils.logger import logger
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Convert a legacy JSON knowledge graph to the compact .npz format"
+    )
+    parser.add_argument("--input", required=True, type=Path, help="Path to the legacy graph JSON file")
+    parser.add_argument("--output", type=Path, help="Path of the compact graph (default: input with .npz suffix)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    output = args.output or args.input.with_suffix(".npz")
+    if not str(output).endswith(".npz"):
+        raise ValueError(f"Compact graph path must end with .npz: {output}")
+    graph_processor.convert_json_to_compact(str(args.input), str(output))
+    logger.info(f"Compact graph saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,7 +21,6 @@ from typing import Dict, Any, Optional
 import base64
 from datetime import datetime
 import traceback
-import copy
 
 # Import existing modules
 from offline_semantic_dedup import (
@@ -439,7 +438,7 @@ async def stage_2_tail_entity_dedup():
     config = get_config()
     deduper = OfflineSemanticDeduper(config, dataset_name="ui_dedup_session", log_dir=st.session_state.workflow_log_dir)
     deduper.graph = st.session_state.graph
-    deduper.ori_graph = copy.deepcopy(st.session_state.graph)
+    deduper.snapshot_graph()
     deduper.all_chunks = st.session_state.chunk_data
     logger.info(f"Loaded graph with {deduper.graph.number_of_nodes()} nodes and {deduper.graph.number_of_edges()} edges")
 
@@ -491,7 +490,7 @@ async def stage_3_head_entity_dedup():
     config = get_config()
     deduper = OfflineSemanticDeduper(config, dataset_name="ui_dedup_session", log_dir=st.session_state.workflow_log_dir)
     deduper.graph = st.session_state.graph
-    deduper.ori_graph = copy.deepcopy(st.session_state.graph)
+    deduper.snapshot_graph()
     deduper.all_chunks = st.session_state.chunk_data
     logger.info(f"Loaded graph with {deduper.graph.number_of_nodes()} nodes and {deduper.graph.number_of_edges()} edges")
 
@@ -546,7 +545,7 @@ async def stage_4_final_tail_dedup():
     config = get_config()
     deduper = OfflineSemanticDeduper(config, dataset_name="ui_dedup_session", log_dir=st.session_state.workflow_log_dir)
     deduper.graph = st.session_state.graph
-    deduper.ori_graph = copy.deepcopy(st.session_state.graph)
+    deduper.snapshot_graph()
     deduper.all_chunks = st.session_state.chunk_data
     logger.info(f"Loaded graph with {deduper.graph.number_of_nodes()} nodes and {deduper.graph.number_of_edges()} edges")
 
@@ -11,12 +11,16 @@ import glob
 import shutil
 from typing import List
 
-from models.constructor import kt_gen as constructor
-from models.retriever import agentic_decomposer as decomposer, enhanced_kt_retriever as retriever
-from utils.eval import Eval
 from config import get_config, ConfigManager
+from utils.lazy_import import lazy_import
 from utils.logger import logger
 
+# Pipeline modules are imported on first use so `--help` and single-stage runs start fast
+constructor = lazy_import("models.constructor.kt_gen")
+decomposer = lazy_import("models.retriever.agentic_decomposer")
+retriever = lazy_import("models.retriever.enhanced_kt_retriever")
+eval_utils = lazy_import("utils.eval")
+
 
 def rerank_chunks_by_keywords(chunks: List[str], question: str, top_k: int) -> List[str]:
     """
@@ -347,7 +351,7 @@ def no_agent_retrieval(graphq, kt_retriever, qa_pairs, schema_path):
     total_time = 0
     accuracy = 0
     total_questions = len(qa_pairs)
-    evaluator = Eval()
+    evaluator = eval_utils.Eval()
     for qa in qa_pairs:
         result = initial_question_decomposition(graphq, kt_retriever, qa["question"], schema_path)
         total_time += result['total_time']
@@ -371,7 +375,7 @@ def agent_retrieval(graphq, kt_retriever, qa_pairs, schema_path):
     total_time = 0
     accuracy = 0
     total_questions = len(qa_pairs)
-    evaluator = Eval()
+    evaluator = eval_utils.Eval()
     max_steps = config.retrieval.agent.max_steps 
                     
     for qa in qa_pairs:
@@ -1,5 +1,6 @@
 import asyncio
 import copy
+import hashlib
 import json
 import os
 import threading
@@ -19,8 +20,8 @@ from collections import defaultdict
 
 import numpy as np
 from config import get_config
-from utils_ import call_llm_api, graph_processor, tree_comm
-from utils_.logger import logger
+from utils import call_llm_api, embedding_store, entity_blocking, graph_processor, graph_rewrite, graph_snapshot, pair_packing, similarity_search, tail_clustering, tree_comm, union_find, vocabulary
+from utils.logger import logger
 import datetime
 
 DEFAULT_LLM_CLUSTERING_PROMPT = (
@@ -170,8 +171,20 @@ DEFAULT_SEMANTIC_DEDUP_VALIDATION_PROMPT = (
     "═══════════════════════════════════════════════════════════════════\n"
 )
 
+class ConstructionCancelled(Exception):
+    """Raised inside KTBuilder when the caller has requested cancellation."""
+
+
 class KTBuilder:
-    def __init__(self, dataset_name, schema_path=None, mode=None, config=None):
+    def __init__(self, dataset_name, schema_path=None, mode=None, config=None,
+                 progress_callback=None, cancel_event=None):
+        """
+        Args:
+            progress_callback: Optional callable(stage, fraction, message) receiving
+                progress of each construction stage, with fraction in [0, 1]
+            cancel_event: Optional threading.Event; when set, construction stops at
+                the next progress checkpoint by raising ConstructionCancelled
+        """
         if config is None:
             config = get_config()
         
@@ -205,8 +218,29 @@ class KTBuilder:
         self.all_chunks = {}
         self.mode = mode or config.construction.mode
         self._semantic_dedup_embedder = None
+        # Memoized node descriptions and chunk context lines; only set while a dedup pass runs
+        self._prepare_cache = None
+        # Persistent disjoint sets of merged entities, saved alongside the graph
+        self.entity_resolver = union_find.EntityUnionFind()
+        # Frozen view of the graph a dedup pass started from, used for LLM cache keys
+        self.graph_snapshot = None
+        # One shared string object / integer code per distinct relation and schema type
+        self.relation_vocab = vocabulary.Vocabulary()
+        self.label_vocab = vocabulary.Vocabulary()
         self.llm_embed_client = call_llm_api.LLMEmbeddingCall()
-
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+
+    def _report_progress(self, stage: str, fraction: float, message: str = "") -> None:
+        """Forward stage progress to the callback and honour pending cancellation."""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise ConstructionCancelled(f"Construction cancelled during stage '{stage}'")
+        if self.progress_callback is None:
+            return
+        try:
+            self.progress_callback(stage, max(0.0, min(1.0, fraction)), message)
+        except Exception as e:
+            logger.warning(f"Progress callback failed: {type(e).__name__}: {e}")
 
     def load_schema(self, schema_path) -> Dict[str, Any]:
         try:
@@ -217,12 +251,14 @@ class KTBuilder:
             return dict()
 
 
-    def chunk_text(self, text) -> Tuple[List[str], Dict[str, str]]:
+    def _document_chunks(self, text) -> List[str]:
         if self.dataset_name in self.datasets_no_chunk:
-            chunks = [f"{text.get('title', '')} {text.get('text', '')}".strip() 
-                     if isinstance(text, dict) else str(text)]
-        else:
-            chunks = [str(text)]
+            return [f"{text.get('title', '')} {text.get('text', '')}".strip() 
+                    if isinstance(text, dict) else str(text)]
+        return [str(text)]
+
+    def chunk_text(self, text) -> Tuple[List[str], Dict[str, str]]:
+        chunks = self._document_chunks(text)
 
         chunk2id = {}
         for chunk in chunks:
@@ -260,10 +296,8 @@ class KTBuilder:
         
         return cleaned if cleaned else "[EMPTY_AFTER_CLEANING]"
     
-    def save_chunks_to_file(self):
-        os.makedirs("output/chunks", exist_ok=True)
-        chunk_file = f"output/chunks/{self.dataset_name}.txt"
-        
+    def _load_saved_chunks(self, chunk_file: str) -> Dict[str, str]:
+        """{chunk_id: chunk_text} from a chunk file written by save_chunks_to_file"""
         existing_data = {}
         if os.path.exists(chunk_file):
             try:
@@ -279,13 +313,46 @@ class KTBuilder:
                                 existing_data[chunk_id] = chunk_text
             except Exception as e:
                 logger.warning(f"Failed to parse existing chunks from {chunk_file}: {type(e).__name__}: {e}")
+        return existing_data
+
+    @staticmethod
+    def _chunk_hash(chunk_text: str) -> str:
+        return hashlib.sha256(chunk_text.encode("utf-8")).hexdigest()
+
+    def _load_chunk_hashes(self, hash_file: str) -> Dict[str, str]:
+        """{chunk_id: sha256 of the full chunk text} from a hash file written by save_chunks_to_file"""
+        hashes = {}
+        if os.path.exists(hash_file):
+            try:
+                with open(hash_file, "r", encoding="utf-8") as f:
+                    for line in f:
+                        parts = line.strip().split("\t")
+                        if len(parts) == 2:
+                            hashes[parts[0]] = parts[1]
+            except Exception as e:
+                logger.warning(f"Failed to parse chunk hashes from {hash_file}: {type(e).__name__}: {e}")
+        return hashes
+
+    def save_chunks_to_file(self):
+        os.makedirs("output/chunks", exist_ok=True)
+        chunk_file = f"output/chunks/{self.dataset_name}.txt"
         
-        all_data = {**existing_data, **self.all_chunks}
+        all_data = {**self._load_saved_chunks(chunk_file), **self.all_chunks}
         
         with open(chunk_file, "w", encoding="utf-8") as f:
             for chunk_id, chunk_text in all_data.items():
                 f.write(f"id: {chunk_id}\tChunk: {chunk_text}\n")
         
+        # The chunk file cuts multi-line chunks short on reading; the hashes of the full
+        # texts let incremental builds recognise documents they already hold
+        hash_file = f"output/chunks/{self.dataset_name}_hashes.txt"
+        hashes = self._load_chunk_hashes(hash_file)
+        for chunk_id, chunk_text in self.all_chunks.items():
+            hashes.setdefault(chunk_id, self._chunk_hash(chunk_text))
+        with open(hash_file, "w", encoding="utf-8") as f:
+            for chunk_id, chunk_hash in hashes.items():
+                f.write(f"{chunk_id}\t{chunk_hash}\n")
+        
         logger.info(f"Chunk data saved to {chunk_file} ({len(all_data)} chunks)")
     
     def extract_with_llm(self, prompt: str):
@@ -346,7 +413,7 @@ class KTBuilder:
                 entity_node_id = f"entity_{self.node_counter}"
                 properties = {"name": entity_name, "chunk id": chunk_id}
                 if entity_type:
-                    properties["schema_type"] = entity_type
+                    properties["schema_type"] = self.label_vocab.intern(entity_type)
                 
                 nodes_to_add.append((
                     entity_node_id,
@@ -448,10 +515,10 @@ class KTBuilder:
             #     self.graph.add_edge(u, v, relation=relation)
 
             for u, v, relation in attr_edges:
-                self.graph.add_edge(u, v, relation=relation)
+                self.graph.add_edge(u, v, relation=self.relation_vocab.intern(relation))
 
             for subj, obj, relation, source_chunk_id in triple_edges:
-                edge_data = {"relation": relation}
+                edge_data = {"relation": self.relation_vocab.intern(relation)}
                 if source_chunk_id:
                     edge_data["source_chunks"] = [source_chunk_id]
                 self.graph.add_edge(subj, obj, **edge_data)
@@ -472,7 +539,7 @@ class KTBuilder:
             entity_node_id = f"entity_{self.node_counter}"
             properties = {"name": entity_name, "chunk id": chunk_id}
             if entity_type:
-                properties["schema_type"] = entity_type
+                properties["schema_type"] = self.label_vocab.intern(entity_type)
                 
             self.graph.add_node(
                 entity_node_id, 
@@ -523,7 +590,7 @@ class KTBuilder:
             
             # self.graph.add_edge(subj_node_id, obj_node_id, relation=pred)
 
-            edge_data = {"relation": pred}
+            edge_data = {"relation": self.relation_vocab.intern(pred)}
             if chunk_id:
                 edge_data["source_chunks"] = [chunk_id]
             self.graph.add_edge(subj_node_id, obj_node_id, **edge_data)
@@ -615,6 +682,7 @@ class KTBuilder:
 
     def process_level4(self, dedup = "normal"):
         """Process communities using Tree-Comm algorithm"""
+        self._report_progress("community", 0.0, "Detecting communities...")
         level2_nodes = [n for n, d in self.graph.nodes(data=True) if d['level'] == 2]
         start_comm = time.time()
         _tree_comm = tree_comm.FastTreeComm(
@@ -622,28 +690,34 @@ class KTBuilder:
             embedding_model=self.config.tree_comm.embedding_model,
             struct_weight=self.config.tree_comm.struct_weight,
         )
-        comm_to_nodes = _tree_comm.detect_communities(level2_nodes)
-
-        if dedup == "semantic":
+        # Incremental mode updates the communities already in the graph; None when there are none yet
+        updated = None
+        if getattr(self.config.tree_comm, "incremental", False):
+            updated = _tree_comm.update_communities(level2_nodes, level=4)
+        if updated is None:
+            comm_to_nodes = _tree_comm.detect_communities(level2_nodes)
+            self._report_progress("community", 0.5, f"Naming {len(comm_to_nodes)} communities...")
+            # create super nodes (level 4 communities)
             _, keyword_mapping = _tree_comm.create_super_nodes_with_keywords(comm_to_nodes, level=4)
-            if keyword_mapping:
-                try:
-                    self._deduplicate_keyword_nodes(keyword_mapping)
-                except Exception as keyword_error:
-                    logger.warning(
-                        "Keyword semantic deduplication failed: %s: %s",
-                        type(keyword_error).__name__,
-                        keyword_error,
-                    )
+            _tree_comm.record_community_stats(comm_to_nodes, level=4)
         else:
+            _, keyword_mapping = updated
 
-        # create super nodes (level 4 communities)
-            _tree_comm.create_super_nodes_with_keywords(comm_to_nodes, level=4)
+        if dedup == "semantic" and keyword_mapping:
+            try:
+                self._deduplicate_keyword_nodes(keyword_mapping)
+            except Exception as keyword_error:
+                logger.warning(
+                    "Keyword semantic deduplication failed: %s: %s",
+                    type(keyword_error).__name__,
+                    keyword_error,
+                )
         # _tree_comm.add_keywords_to_level3(comm_to_nodes)
         # connect keywords to communities (optional)
         # self._connect_keywords_to_communities()
         end_comm = time.time()
         logger.info(f"Community Indexing Time: {end_comm - start_comm}s")
+        self._report_progress("community", 1.0, "Community indexing finished")
     
     def _connect_keywords_to_communities(self):
         """Connect relevant keywords to communities"""
@@ -701,30 +775,46 @@ class KTBuilder:
         processed_count = 0
         failed_count = 0
         
+        self._report_progress("extraction", 0.0, f"Extracting entities from {total_docs} documents...")
         try:
             with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
                 # Submit all documents for processing and store futures
                 all_futures = [executor.submit(self.process_document, doc) for doc in documents]
 
-                for i, future in enumerate(futures.as_completed(all_futures)):
-                    try:
-                        future.result()
-                        processed_count += 1
-                        
-                        if processed_count % 10 == 0 or processed_count == total_docs:
-                            elapsed_time = time.time() - start_construct
-                            avg_time_per_doc = elapsed_time / processed_count if processed_count > 0 else 0
-                            remaining_docs = total_docs - processed_count
-                            estimated_remaining_time = remaining_docs * avg_time_per_doc
+                try:
+                    for i, future in enumerate(futures.as_completed(all_futures)):
+                        try:
+                            future.result()
+                            processed_count += 1
                             
-                            logger.info(f"Progress: {processed_count}/{total_docs} documents processed "
-                                  f"({processed_count/total_docs*100:.1f}%) "
-                                  f"[{failed_count} failed] "
-                                  f"ETA: {estimated_remaining_time/60:.1f} minutes")
-                        
-                    except Exception as e:
-                        failed_count += 1
+                            if processed_count % 10 == 0 or processed_count == total_docs:
+                                elapsed_time = time.time() - start_construct
+                                avg_time_per_doc = elapsed_time / processed_count if processed_count > 0 else 0
+                                remaining_docs = total_docs - processed_count
+                                estimated_remaining_time = remaining_docs * avg_time_per_doc
+                                
+                                logger.info(f"Progress: {processed_count}/{total_docs} documents processed "
+                                      f"({processed_count/total_docs*100:.1f}%) "
+                                      f"[{failed_count} failed] "
+                                      f"ETA: {estimated_remaining_time/60:.1f} minutes")
+                            
+                        except Exception as e:
+                            failed_count += 1
 
+                        done_count = processed_count + failed_count
+                        self._report_progress(
+                            "extraction",
+                            done_count / total_docs if total_docs else 1.0,
+                            f"{done_count}/{total_docs} documents processed [{failed_count} failed]"
+                        )
+                except ConstructionCancelled:
+                    # Drop documents that have not started yet; running ones finish on exit
+                    for pending in all_futures:
+                        pending.cancel()
+                    raise
+
+        except ConstructionCancelled:
+            raise
         except Exception as e:
             return
 
@@ -735,7 +825,9 @@ class KTBuilder:
         
         logger.info(f"🚀🚀🚀🚀 {'Processing Level 3 and 4':^20} 🚀🚀🚀🚀")
         logger.info(f"{'➖' * 20}")
+        self._report_progress("triple_dedup", 0.0, "Deduplicating triples...")
         self.triple_deduplicate()
+        self._report_progress("triple_dedup", 1.0, "Triple deduplication finished")
         self.process_level4()
 
     def _semantic_dedup_enabled(self) -> bool:
@@ -806,7 +898,13 @@ class KTBuilder:
         try:
             from sentence_transformers import SentenceTransformer
 
-            self._semantic_dedup_embedder = SentenceTransformer(f"/home/hhy/GPT/workspace/m_youtu/sentence-transformers/{model_name}")
+            model = SentenceTransformer(f"/home/hhy/GPT/workspace/m_youtu/sentence-transformers/{model_name}")
+            # Description embeddings persist across runs and are shared with the offline deduper
+            self._semantic_dedup_embedder = embedding_store.CachedEncoder(
+                model,
+                embedding_store.open_store(getattr(self.config.embeddings, "store_path", ""), model_name),
+                batch_size=getattr(self.config.embeddings, "batch_size", 32),
+            )
         except Exception as e:
             logger.warning(
                 "Failed to initialize semantic dedup embedder with model '%s': %s: %s",
@@ -819,6 +917,15 @@ class KTBuilder:
         return self._semantic_dedup_embedder
 
     def _describe_node(self, node_id: str) -> str:
+        cache = self._prepare_cache
+        if cache is None:
+            return self._build_node_description(node_id)
+        description = cache["describe"].get(node_id)
+        if description is None:
+            description = cache["describe"][node_id] = self._build_node_description(node_id)
+        return description
+
+    def _build_node_description(self, node_id: str) -> str:
         node_data = self.graph.nodes.get(node_id, {})
         label = node_data.get("label", "node")
         properties = node_data.get("properties", {})
@@ -847,6 +954,15 @@ class KTBuilder:
         This method excludes chunk_id and label information to focus on
         the semantic content of the node for better clustering results.
         """
+        cache = self._prepare_cache
+        if cache is None:
+            return self._build_node_description_for_clustering(node_id)
+        description = cache["clustering"].get(node_id)
+        if description is None:
+            description = cache["clustering"][node_id] = self._build_node_description_for_clustering(node_id)
+        return description
+
+    def _build_node_description_for_clustering(self, node_id: str) -> str:
         node_data = self.graph.nodes.get(node_id, {})
         properties = node_data.get("properties", {})
 
@@ -898,6 +1014,26 @@ class KTBuilder:
 
         return []
 
+    def _context_line(self, chunk_id: str, max_chars: int = 5000) -> str:
+        cache = self._prepare_cache
+        if cache is not None:
+            line = cache["context"].get((chunk_id, max_chars))
+            if line is not None:
+                return line
+
+        chunk_text = self.all_chunks.get(chunk_id)
+        if not chunk_text:
+            line = f"- ({chunk_id}) [context not available]"
+        else:
+            snippet = " ".join(str(chunk_text).split())
+            if len(snippet) > max_chars:
+                snippet = snippet[:max_chars].rstrip() + "…"
+            line = f"- ({chunk_id}) {snippet}"
+
+        if cache is not None:
+            cache["context"][(chunk_id, max_chars)] = line
+        return line
+
     def _summarize_contexts(self, chunk_ids: list, max_items: int = 10, max_chars: int = 5000) -> list:
         summaries: list = []
         seen: set = set()
@@ -907,18 +1043,7 @@ class KTBuilder:
                 continue
 
             seen.add(chunk_id)
-            chunk_text = self.all_chunks.get(chunk_id)
-            if not chunk_text:
-                summaries.append(f"- ({chunk_id}) [context not available]")
-                if len(summaries) >= max_items:
-                    break
-                continue
-
-            snippet = " ".join(str(chunk_text).split())
-            if len(snippet) > max_chars:
-                snippet = snippet[:max_chars].rstrip() + "…"
-
-            summaries.append(f"- ({chunk_id}) {snippet}")
+            summaries.append(self._context_line(chunk_id, max_chars))
             if len(summaries) >= max_items:
                 break
 
@@ -926,6 +1051,7 @@ class KTBuilder:
             summaries.append("- (no context available)")
 
         return summaries
+
     def _llm_validate_semantic_dedup(self, groups: list, original_candidates: list,
                                      head_text: str = None, relation: str = None) -> tuple:
         """
@@ -1493,93 +1619,45 @@ class KTBuilder:
 
         return clusters, cluster_details
 
-    def _cluster_candidate_tails(self, descriptions: list, threshold: float) -> list:
+    def _cluster_candidate_tails(self, descriptions: list, threshold: float, embeddings=None) -> list:
+        """
+        Cluster descriptions by embedding similarity.
+
+        Args:
+            embeddings: Optional precomputed normalized embeddings, one row per description
+                (see _embed_unique_descriptions); encoded here when omitted
+        """
         if len(descriptions) <= 1:
             return [list(range(len(descriptions)))]
 
-        embedder = self._get_semantic_dedup_embedder()
-        if embedder is None:
-            return [list(range(len(descriptions)))]
+        if embeddings is None:
+            embedder = self._get_semantic_dedup_embedder()
+            if embedder is None:
+                return [list(range(len(descriptions)))]
 
-        try:
-            embeddings = embedder.encode(descriptions, normalize_embeddings=True)
-        except Exception as e:
-            logger.warning("Failed to encode descriptions for semantic dedup: %s: %s", type(e).__name__, e)
-            return [list(range(len(descriptions)))]
+            try:
+                embeddings = embedder.encode(descriptions, normalize_embeddings=True)
+            except Exception as e:
+                logger.warning("Failed to encode descriptions for semantic dedup: %s: %s", type(e).__name__, e)
+                return [list(range(len(descriptions)))]
 
-        # clusters: list = []
-        # for idx, vector in enumerate(embeddings):
-        #     vector_arr = np.asarray(vector, dtype=float)
-        #     assigned = False
-        #     for cluster in clusters:
-        #         if any(float(np.dot(existing_vec, vector_arr)) >= threshold for existing_vec in cluster["vectors"]):
-        #             cluster["members"].append(idx)
-        #             cluster["vectors"].append(vector_arr)
-        #             assigned = True
-        #             break
-        # import pdb; pdb.set_trace()
+        # Exact average linkage for small groups; kNN threshold graph (or HDBSCAN)
+        # for large ones, whose dense distance matrix would not fit in memory
+        config = self._get_semantic_dedup_config()
         try:
-            from sklearn.cluster import AgglomerativeClustering
-            
-            # Convert embeddings to numpy array
-            embeddings = np.asarray(embeddings, dtype=float)
-            
-            # Compute cosine similarity matrix (embeddings are already normalized)
-            similarity_matrix = np.dot(embeddings, embeddings.T)
-            
-            # Convert similarity to distance: distance = 1 - similarity
-            distance_matrix = 1 - similarity_matrix
-            
-            # Ensure distance matrix is symmetric and has zero diagonal
-            distance_matrix = (distance_matrix + distance_matrix.T) / 2
-            np.fill_diagonal(distance_matrix, 0)
-            
-            # Convert similarity threshold to distance threshold
-            distance_threshold = 1 - threshold
-            
-            # Apply AgglomerativeClustering with average linkage
-            clustering = AgglomerativeClustering(
-                n_clusters=None,  # Don't specify number of clusters
-                distance_threshold=distance_threshold,  # Use distance threshold instead
-                linkage='average',  # Average linkage: mean distance between all pairs
-                metric='precomputed'  # Use our precomputed distance matrix
+            return tail_clustering.cluster_embeddings(
+                embeddings,
+                threshold,
+                method=getattr(config, "clustering_backend", "auto"),
+                exact_max_size=getattr(config, "exact_clustering_max_size", 2000),
+                knn_k=getattr(config, "clustering_knn_k", 30),
+                use_faiss=getattr(config, "clustering_use_faiss", None)
             )
-            
-            labels = clustering.fit_predict(distance_matrix)
-            
-            # Convert cluster labels to list of index lists
-            clusters_dict = {}
-            for idx, label in enumerate(labels):
-                if label not in clusters_dict:
-                    clusters_dict[label] = []
-                clusters_dict[label].append(idx)
-            
-            return list(clusters_dict.values())
-            
-        except ImportError:
-            logger.warning("sklearn not available, falling back to simple single-linkage clustering")
-            # Fallback to original implementation if sklearn is not available
-            clusters: list = []
-            for idx, vector in enumerate(embeddings):
-                vector_arr = np.asarray(vector, dtype=float)
-                assigned = False
-                for cluster in clusters:
-                    if any(float(np.dot(existing_vec, vector_arr)) >= threshold for existing_vec in cluster["vectors"]):
-                        cluster["members"].append(idx)
-                        cluster["vectors"].append(vector_arr)
-                        assigned = True
-                        break
-
-                if not assigned:
-                    clusters.append({"members": [idx], "vectors": [vector_arr]})
-
-        # return [cluster["members"] for cluster in clusters]
         except Exception as e:
             logger.warning("Clustering failed: %s: %s, using fallback", type(e).__name__, e)
             # If anything goes wrong, put all items in one cluster
             return [list(range(len(descriptions)))]
 
-
     def _build_semantic_dedup_prompt(
         self,
         head_text: str,
@@ -1725,7 +1803,7 @@ class KTBuilder:
     
     def _generate_embedding_cache_key(self, texts: list) -> str:
         """
-        Generate a cache key based on graph state and chunks for LLM results caching.
+        Generate a cache key from a hash of the texts to embed.
         """
         import hashlib
         import json
@@ -1736,6 +1814,11 @@ class KTBuilder:
         cache_hash = hashlib.sha256(cache_str.encode('utf-8')).hexdigest()[:16]
         return f"embedding_cache_{cache_hash}.json"
 
+    def snapshot_graph(self) -> "graph_snapshot.GraphSnapshot":
+        """Freeze the current graph structure as the reference for LLM cache keys."""
+        self.graph_snapshot = graph_snapshot.GraphSnapshot.from_graph(self.graph)
+        return self.graph_snapshot
+
     def _generate_llm_cache_key(self, prompts_with_metadata: list) -> str:
         """
         Generate a cache key based on graph state and chunks for LLM results caching.
@@ -1749,19 +1832,24 @@ class KTBuilder:
         import hashlib
         import json
 
-        # Collect key data for hashing
+        # Collect key data for hashing; the graph parts come pre-serialized from the snapshot
+        snapshot = self.graph_snapshot or self.snapshot_graph()
         cache_data = {
             'dataset_name': self.dataset_name,
-            'graph_nodes': sorted([str(node) for node in self.ori_graph.nodes()]),
-            'graph_edges': sorted([f"{u}({self.ori_graph.nodes[u]['properties']['name']})-{v}({self.ori_graph.nodes[v]['properties']['name']})  -{k}" for u, v, k in self.ori_graph.edges(keys=True)]),
+            'graph_nodes': snapshot.nodes_json,
+            'graph_edges': snapshot.edges_json,
             'chunks_count': len(self.all_chunks),
             'chunks_keys': sorted(list(self.all_chunks.keys())),
             'prompts_count': len(prompts_with_metadata),
             'prompt_types': sorted([p.get('type') for p in prompts_with_metadata]),  # Sort for consistency
             'prompt_hashes': sorted([hashlib.md5(p.get('prompt', '').encode('utf-8')).hexdigest()[:8] for p in prompts_with_metadata])  # Sort for consistency
         }
-        # Convert to JSON string and hash
-        cache_str = json.dumps(cache_data, sort_keys=True, ensure_ascii=False)
+        # Same string as json.dumps(cache_data, sort_keys=True, ensure_ascii=False) with the graph lists inline
+        cache_str = "{" + ", ".join(
+            f"{json.dumps(key)}: "
+            f"{value if key in ('graph_nodes', 'graph_edges') else json.dumps(value, sort_keys=True, ensure_ascii=False)}"
+            for key, value in sorted(cache_data.items())
+        ) + "}"
         cache_hash = hashlib.sha256(cache_str.encode('utf-8')).hexdigest()[:16]
         #print(f"cache_data: {cache_data}")
         #print(f"cache_hash: {cache_hash}")
@@ -1842,7 +1930,7 @@ class KTBuilder:
                     'timestamp': str(datetime.datetime.now()),
                     'results': results
                 }, f, protocol=4)
-            logger.info(f"Saved embedding results to cache: {cache_path}")
+            logger.debug(f"Saved embedding results to cache: {cache_path}")
         except Exception as e:
             logger.warning(f"Failed to save embedding results to cache: {e}")
 
@@ -1863,44 +1951,44 @@ class KTBuilder:
             with open(cache_path, 'rb') as f:
                 data = pickle.load(f)
                 results = data.get('results', [])
-                logger.info(f"Loaded cached embedding results: {cache_path}")
+                logger.debug(f"Loaded cached embedding results: {cache_path}")
                 return np.concatenate(results, axis=0)
         except Exception as e:
             logger.warning(f"Failed to load cached embedding results: {e}")
             return None
     
-    def _generate_embedding_cache_key(self, texts: list) -> str:
-        """
-        Generate a cache key based on graph state and chunks for LLM results caching.
+    def _concurrent_embedding_calls(self, texts: list, enable_cache: bool = True) -> np.ndarray:
         """
-        import hashlib
-        import json
-        
-        cache_data = {
-            'texts': texts}
-        cache_str = json.dumps(cache_data, sort_keys=True, ensure_ascii=False)
-        cache_hash = hashlib.sha256(cache_str.encode('utf-8')).hexdigest()[:16]
-        return f"embedding_cache_{cache_hash}.json"
+        Embed texts in concurrent batches.
 
-    def _concurrent_embedding_calls(self, texts: list, enable_cache: bool = True) -> list:
-        """
-        Concurrently process multiple embedding calls.
+        Batches are submitted to a thread pool with at most embedding_max_workers requests
+        in flight, retried on failure, and cached individually under a hash of their
+        content, so a rerun only requests the batches that are missing. Row i of the
+        returned matrix always belongs to texts[i]; a batch that still fails after
+        retrying raises instead of being dropped.
         """
         embedder = self._get_online_API_embedder()
-        embedding_batch_size = getattr(self._get_semantic_dedup_config(), "embedding_batch_size", 1000)
+        config = self._get_semantic_dedup_config()
+        embedding_batch_size = max(1, int(getattr(config, "embedding_batch_size", 1000) or 1000))
+        max_workers = max(1, int(getattr(config, "embedding_max_workers", 8) or 8))
 
-        if embedder is None:
-            return []
-        
-        cached_results = None
+        if embedder is None or not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        total_batches = (len(texts) + embedding_batch_size - 1) // embedding_batch_size
+        batch_results = [None] * total_batches
+        batch_keys = [None] * total_batches
 
         if enable_cache:
-            
-            cache_key = self._generate_embedding_cache_key(texts)
-            cached_results = self._load_embedding_results(cache_key)
-            if cached_results is not None:
-                logger.info(f"Using cached embedding results for {len(cached_results)} texts")
-                return cached_results
+            model_name = getattr(self.llm_embed_client, "model", "")
+            for batch_index in range(total_batches):
+                start_index = batch_index * embedding_batch_size
+                batch_texts = texts[start_index:start_index + embedding_batch_size]
+                batch_keys[batch_index] = self._generate_embedding_cache_key([model_name] + list(batch_texts))
+                batch_results[batch_index] = self._load_embedding_results(batch_keys[batch_index])
+            cached = sum(result is not None for result in batch_results)
+            if cached:
+                logger.info(f"Using cached embeddings for {cached}/{total_batches} batches")
 
         def retry_sync(fun, item, index):
             """Synchronous retry function"""
@@ -1930,29 +2018,35 @@ class KTBuilder:
         def _call_single_batch_embedding_sync(item, index):
             """Call embedding for a single batch of texts synchronously."""
             batch_texts = texts[item:item + embedding_batch_size]
-            return embedder.encode(batch_texts)
-
-        # Process batches synchronously with progress bar
-        embeddings_array = []
-        total_batches = (len(texts) + embedding_batch_size - 1) // embedding_batch_size
+            result = np.asarray(embedder.encode(batch_texts), dtype=np.float32)
+            if result.ndim != 2 or result.shape[0] != len(batch_texts):
+                raise ValueError(f"Embedding batch {index} returned shape {result.shape} for {len(batch_texts)} texts")
+            return result
 
-        with tqdm(total=total_batches, desc="Processing Embedding calls", unit="batch") as pbar:
-            for batch_index in range(total_batches):
-                start_index = batch_index * embedding_batch_size
-                result = retry_sync(_call_single_batch_embedding_sync, start_index, batch_index)
-                if result is not None:
-                    embeddings_array.append(result)
-                pbar.update(1)
+        pending = [batch_index for batch_index, result in enumerate(batch_results) if result is None]
+        with futures.ThreadPoolExecutor(max_workers=min(max_workers, max(1, len(pending)))) as executor:
+            future_to_index = {
+                executor.submit(retry_sync, _call_single_batch_embedding_sync,
+                                batch_index * embedding_batch_size, batch_index): batch_index
+                for batch_index in pending
+            }
+            with tqdm(total=total_batches, initial=total_batches - len(pending),
+                      desc="Processing Embedding calls", unit="batch") as pbar:
+                for future in futures.as_completed(future_to_index):
+                    batch_index = future_to_index[future]
+                    result = future.result()
+                    if result is not None:
+                        batch_results[batch_index] = result
+                        if enable_cache:
+                            # Saved per batch so completed work survives a failure elsewhere
+                            self._save_embedding_results(batch_keys[batch_index], [result])
+                    pbar.update(1)
 
-        # Save results to cache if caching is enabled
-        if enable_cache and embeddings_array:
-            try:
-                cache_key = self._generate_embedding_cache_key(texts)
-                self._save_embedding_results(cache_key, embeddings_array)
-            except Exception as e:
-                logger.warning(f"Failed to save embedding results to cache: {e}")
+        failed = [batch_index for batch_index, result in enumerate(batch_results) if result is None]
+        if failed:
+            raise RuntimeError(f"Embedding failed for {len(failed)}/{total_batches} batches (first: {failed[0]})")
 
-        return np.concatenate(embeddings_array, axis=0)
+        return np.concatenate(batch_results, axis=0)
 
     def _concurrent_llm_calls(self, prompts_with_metadata: list, enable_cache: bool = True, type: str = "clustering") -> list:
         """
@@ -2564,8 +2658,7 @@ class KTBuilder:
         else:
             # Use embedding-based clustering
             logger.info("Using embedding-based clustering for keywords...")
-            for community_data in dedup_communities:
-                self._apply_embedding_clustering(community_data)
+            self._apply_embedding_clustering_to_groups(dedup_communities)
         
         # ================================================================
         # PHASE 3: Batch collect and process semantic dedup prompts
@@ -3067,7 +3160,8 @@ class KTBuilder:
                 continue
 
             seen.add(key)
-            unique_edges.append((tail_id, copy.deepcopy(data)))
+            # No copy: add_edge copies the attribute dict and merges deep-copy what they modify
+            unique_edges.append((tail_id, data))
 
         return unique_edges
 
@@ -3086,8 +3180,8 @@ class KTBuilder:
                 {
                     "index": idx,
                     "node_id": tail_id,
-                    "data": copy.deepcopy(data),
-                    "raw_data": copy.deepcopy(data),
+                    "data": data,
+                    "raw_data": data,
                     "description": self._describe_node(tail_id),
                     "description_for_clustering": self._describe_node_for_clustering(tail_id),  # Simplified for clustering
                     "context_chunk_ids": chunk_ids,
@@ -3563,7 +3657,7 @@ class KTBuilder:
             if len(cluster_indices) == 1:
                 idx = cluster_indices[0]
                 entry = entries[idx]
-                final_edges.append((entry["node_id"], copy.deepcopy(entry["data"])))
+                final_edges.append((entry["node_id"], entry["data"]))
                 processed_indices.add(idx)
                 continue
 
@@ -3627,7 +3721,7 @@ class KTBuilder:
                     for global_idx in batch_indices:
                         if global_idx not in processed_indices:
                             entry = entries[global_idx]
-                            final_edges.append((entry["node_id"], copy.deepcopy(entry["data"])))
+                            final_edges.append((entry["node_id"], entry["data"]))
                             processed_indices.add(global_idx)
                 else:
                     # Process each group
@@ -3685,14 +3779,14 @@ class KTBuilder:
                 for global_idx in overflow_indices:
                     if global_idx not in processed_indices:
                         entry = entries[global_idx]
-                        final_edges.append((entry["node_id"], copy.deepcopy(entry["data"])))
+                        final_edges.append((entry["node_id"], entry["data"]))
                         processed_indices.add(global_idx)
 
         for entry in entries:
             idx = entry["index"]
             if idx in processed_indices or idx in duplicate_indices:
                 continue
-            final_edges.append((entry["node_id"], copy.deepcopy(entry["data"])))
+            final_edges.append((entry["node_id"], entry["data"]))
             processed_indices.add(idx)
 
         # Save edge dedup result with summary
@@ -3731,11 +3825,12 @@ class KTBuilder:
             chunk_ids = self._extract_edge_chunk_ids(data)
             if not chunk_ids:
                 chunk_ids = self._collect_node_chunk_ids(tail_id)
+            # Entries share the graph's edge dicts; every consumer copies before modifying
             entries.append({
                 "index": idx,
                 "node_id": tail_id,
-                "data": copy.deepcopy(data),
-                "raw_data": copy.deepcopy(data),
+                "data": data,
+                "raw_data": data,
                 "description": self._describe_node(tail_id),
                 "description_for_clustering": self._describe_node_for_clustering(tail_id),
                 "context_chunk_ids": chunk_ids,
@@ -3963,12 +4058,53 @@ class KTBuilder:
             group_data['initial_clusters'] = all_clusters
             group_data['llm_clustering_details'] = all_details
     
-    def _apply_embedding_clustering(self, group_data: dict):
+    def _apply_embedding_clustering(self, group_data: dict, embeddings=None):
         """Apply embedding-based clustering to a group."""
         threshold = group_data['config_params']['threshold']
         candidate_descriptions = group_data['candidate_descriptions']
-        initial_clusters = self._cluster_candidate_tails(candidate_descriptions, threshold)
+        initial_clusters = self._cluster_candidate_tails(candidate_descriptions, threshold, embeddings)
         group_data['initial_clusters'] = initial_clusters
+
+    def _embed_unique_descriptions(self, groups: list):
+        """
+        Encode every distinct candidate description across groups in one pass.
+
+        Returns:
+            (row index per description, normalized embedding matrix), or (None, None)
+            when no embedder is available or encoding fails
+        """
+        description_rows = {}
+        for group_data in groups:
+            if len(group_data['candidate_descriptions']) <= 1:
+                continue
+            for description in group_data['candidate_descriptions']:
+                description_rows.setdefault(description, len(description_rows))
+        if not description_rows:
+            return None, None
+
+        embedder = self._get_semantic_dedup_embedder()
+        if embedder is None:
+            return None, None
+
+        total = sum(len(group_data['candidate_descriptions']) for group_data in groups)
+        logger.info(f"Embedding {len(description_rows)} unique descriptions ({total} across {len(groups)} groups)")
+        try:
+            embeddings = embedder.encode(list(description_rows), normalize_embeddings=True)
+        except Exception as e:
+            logger.warning("Failed to encode descriptions for semantic dedup: %s: %s", type(e).__name__, e)
+            return None, None
+        return description_rows, np.asarray(embeddings, dtype=np.float32)
+
+    def _apply_embedding_clustering_to_groups(self, groups: list):
+        """Cluster every group with embeddings sliced from one shared matrix of unique descriptions."""
+        description_rows, embeddings = self._embed_unique_descriptions(groups)
+        for group_data in groups:
+            if embeddings is None or len(group_data['candidate_descriptions']) <= 1:
+                # No shared matrix: fall back to per-group encoding (or the single-cluster fallback)
+                self._apply_embedding_clustering(group_data)
+                continue
+            rows = [description_rows[description] for description in group_data['candidate_descriptions']]
+            self._apply_embedding_clustering(group_data, embeddings[rows])
     
     def _collect_semantic_dedup_prompts(self, group_data: dict) -> list:
         """
@@ -4257,7 +4393,7 @@ class KTBuilder:
             if len(cluster_indices) == 1:
                 idx = cluster_indices[0]
                 entry = entries[idx]
-                final_edges.append((entry["node_id"], copy.deepcopy(entry["data"])))
+                final_edges.append((entry["node_id"], entry["data"]))
                 processed_indices.add(idx)
                 continue
             
@@ -4305,7 +4441,7 @@ class KTBuilder:
                     for global_idx in batch_indices:
                         if global_idx not in processed_indices:
                             entry = entries[global_idx]
-                            final_edges.append((entry["node_id"], copy.deepcopy(entry["data"])))
+                            final_edges.append((entry["node_id"], entry["data"]))
                             processed_indices.add(global_idx)
                 else:
                     for group in groups:
@@ -4362,7 +4498,7 @@ class KTBuilder:
                     for global_idx in overflow_indices:
                         if global_idx not in processed_indices:
                             entry = entries[global_idx]
-                            final_edges.append((entry["node_id"], copy.deepcopy(entry["data"])))
+                            final_edges.append((entry["node_id"], entry["data"]))
                             processed_indices.add(global_idx)
                 
                 batch_num += 1
@@ -4371,7 +4507,7 @@ class KTBuilder:
         for entry in entries:
             idx = entry["index"]
             if idx not in processed_indices and idx not in duplicate_indices:
-                final_edges.append((entry["node_id"], copy.deepcopy(entry["data"])))
+                final_edges.append((entry["node_id"], entry["data"]))
                 processed_indices.add(idx)
         
         # Save results
@@ -4402,9 +4538,9 @@ class KTBuilder:
 
         seen_triples = set()
         for u, v, key, data in self.graph.edges(keys=True, data=True):
-            relation = data.get('relation') 
-            if (u, v, relation) not in seen_triples:
-                seen_triples.add((u, v, relation))
+            triple = (u, v, self.relation_vocab.code(data.get('relation')))
+            if triple not in seen_triples:
+                seen_triples.add(triple)
                 new_graph.add_edge(u, v, **data)
         self.graph = new_graph
 
@@ -4414,6 +4550,14 @@ class KTBuilder:
         Args:
             return_dedup_results: If True, return dedup results in entity_attribution format instead of modifying graph
         """
+        # Node descriptions and chunk contexts are reused across groups for the duration of the pass
+        self._prepare_cache = {"describe": {}, "clustering": {}, "context": {}}
+        try:
+            return self._run_triple_deduplicate_semantic(return_dedup_results)
+        finally:
+            self._prepare_cache = None
+
+    def _run_triple_deduplicate_semantic(self, return_dedup_results=False):
         new_graph = nx.MultiDiGraph()
         for node, node_data in self.graph.nodes(data=True):
             new_graph.add_node(node, **node_data)
@@ -4423,6 +4567,7 @@ class KTBuilder:
         if save_intermediate:
             self._edge_dedup_results = []
 
+        self._report_progress("semantic_dedup", 0.0, "Grouping edges by (head, relation)...")
         # seen_triples = set()
         grouped_edges: dict = defaultdict(list)
         for u, v, key, data in self.graph.edges(keys=True, data=True):
@@ -4430,8 +4575,11 @@ class KTBuilder:
             # if (u, v, relation) not in seen_triples:
             #     seen_triples.add((u, v, relation))
             #     new_graph.add_edge(u, v, **data)
-            relation = data.get('relation')
-            grouped_edges[(u, relation)].append((v, copy.deepcopy(data)))
+            # Grouped by relation code; the relation string is looked up once per group
+            relation_code = self.relation_vocab.code(data.get('relation'))
+            # No copy here: entries share the graph's edge dicts; add_edge and
+            # _merge_duplicate_metadata make the copies
+            grouped_edges[(u, relation_code)].append((v, data))
 
 
         # ================================================================
@@ -4440,7 +4588,8 @@ class KTBuilder:
         dedup_groups = []  # List of dicts with all info needed for deduplication
  
 
-        for (head, relation), edges in grouped_edges.items():
+        for (head, relation_code), edges in grouped_edges.items():
+            relation = self.relation_vocab[relation_code]
             exact_unique = self._deduplicate_exact(edges)
             
             # Only process if semantic dedup is enabled and there are multiple edges
@@ -4460,6 +4609,7 @@ class KTBuilder:
                 dedup_groups.append(group_data)
         
         logger.info(f"Prepared {len(dedup_groups)} groups for semantic deduplication")
+        self._report_progress("semantic_dedup", 0.25, f"Prepared {len(dedup_groups)} groups")
         
         if not dedup_groups:
             # No deduplication needed, return empty results or None based on return_dedup_results flag
@@ -4493,12 +4643,12 @@ class KTBuilder:
         else:
             # Use embedding-based clustering
             logger.info("Using embedding-based clustering...")
-            for group_data in dedup_groups:
-                self._apply_embedding_clustering(group_data)
+            self._apply_embedding_clustering_to_groups(dedup_groups)
         
         # ================================================================
         # PHASE 3: Batch collect and process semantic dedup prompts
         # ================================================================
+        self._report_progress("semantic_dedup", 0.5, "Clustering finished, running semantic dedup")
         logger.info("Collecting all semantic dedup prompts...")
         semantic_prompts = []
         #import ipdb; ipdb.set_trace()
@@ -4537,6 +4687,7 @@ class KTBuilder:
         # ================================================================
         # PHASE 4: Build final deduplicated edges
         # ================================================================
+        self._report_progress("semantic_dedup", 0.75, "Building final deduplicated graph")
         logger.info("Building final deduplicated graph...")
         for group_data in dedup_groups:
             final_edges = self._build_final_edges(group_data, save_intermediate)
@@ -4727,26 +4878,7 @@ class KTBuilder:
 
     def format_output(self) -> List[Dict[str, Any]]:
         """convert graph to specified output format"""
-        output = []
-
-        for u, v, data in self.graph.edges(data=True):
-            u_data = self.graph.nodes[u]
-            v_data = self.graph.nodes[v]
-
-            relationship = {
-                "start_node": {
-                    "label": u_data["label"],
-                    "properties": u_data["properties"],
-                },
-                "relation": data["relation"],
-                "end_node": {
-                    "label": v_data["label"],
-                    "properties": v_data["properties"],
-                },
-            }
-            output.append(relationship)
-
-        return output
+        return list(graph_processor.iter_relationships(self.graph))
     
     def save_graphml(self, output_path: str):
         graph_processor.save_graph(self.graph, output_path)
@@ -4897,6 +5029,7 @@ class KTBuilder:
                         similarity_threshold=candidate_similarity_threshold
                     )
                     logger.info(f"✓ Generated {len(candidate_pairs)} candidate pairs")
+                    candidate_pairs = self._drop_resolved_pairs(candidate_pairs)
                 
                 #import pdb; pdb.set_trace()
                 # Record candidate pairs
@@ -5147,6 +5280,19 @@ class KTBuilder:
         if len(remaining_nodes) < 2:
             return []
         
+        config = self.config.construction.semantic_dedup.head_dedup if hasattr(
+            self.config.construction.semantic_dedup, 'head_dedup'
+        ) else None
+        config = config or {}
+        
+        # Optional blocking: restrict comparisons (and the embeddings they need) to plausible pairs
+        blocking_config = config.get('blocking', {}) or {}
+        blocked_pairs = None
+        if blocking_config.get('enabled', False) or len(remaining_nodes) >= blocking_config.get('auto_enable_above', float('inf')):
+            remaining_nodes, blocked_pairs = self._block_head_candidates(remaining_nodes, blocking_config)
+            if not blocked_pairs:
+                return []
+        
         #import pdb; pdb.set_trace()
         # Get node descriptions
         node_descriptions = {}
@@ -5164,7 +5310,11 @@ class KTBuilder:
         nodes = list(node_descriptions.keys())
         descriptions = [node_descriptions[node_id] for node_id in nodes]
         if concurrent_calls:
-            embeddings_array = self._concurrent_embedding_calls(descriptions, enable_cache=True)
+            try:
+                embeddings_array = self._concurrent_embedding_calls(descriptions, enable_cache=True)
+            except Exception as e:
+                logger.error(f"Failed to get embeddings: {e}")
+                return []
         else:
             #import pdb; pdb.set_trace()
             #embedder = self._get_semantic_dedup_embedder()
@@ -5180,28 +5330,79 @@ class KTBuilder:
                 return []
 
             #import pdb; pdb.set_trace()
-        # Compute similarity matrix
-        from sklearn.metrics.pairwise import cosine_similarity
-        similarity_matrix = cosine_similarity(embeddings_array)
-        
-        # Extract high similarity pairs
-        candidates = []
-        n = len(nodes)
-        
-        for i in range(n):
-            for j in range(i + 1, n):
-                sim = similarity_matrix[i][j]
-                if sim >= similarity_threshold:
-                    candidates.append((nodes[i], nodes[j], float(sim)))
-        
-        # Sort by similarity and take top-K
-        candidates.sort(key=lambda x: x[2], reverse=True)
+        if blocked_pairs is not None:
+            # Score only the blocked pairs
+            node_index = {node_id: i for i, node_id in enumerate(nodes)}
+            left, right = [], []
+            for a, b in blocked_pairs:
+                if a in node_index and b in node_index:
+                    left.append(node_index[a])
+                    right.append(node_index[b])
+            top_pairs = similarity_search.top_scored_pairs(
+                embeddings_array, left, right,
+                threshold=similarity_threshold,
+                max_pairs=max_candidates
+            )
+        else:
+            # Stream pairs above the threshold from memory-bounded tiles (or FAISS kNN
+            # on large inputs) into a top-max_candidates heap, instead of a dense N×N matrix
+            top_pairs = similarity_search.top_similar_pairs(
+                embeddings_array,
+                threshold=similarity_threshold,
+                max_pairs=max_candidates,
+                k=config.get('candidate_knn_k', 50),
+                use_faiss=config.get('candidate_use_faiss', None),
+                tile_bytes=int(config.get('candidate_tile_mb', 256)) * 1024 * 1024
+            )
         
-        if len(candidates) > max_candidates:
-            candidates = candidates[:max_candidates]
+        # Sorted by similarity, at most max_candidates pairs
+        candidates = [(nodes[i], nodes[j], sim) for i, j, sim in top_pairs]
         
         return candidates
     
+    def _block_head_candidates(
+        self,
+        remaining_nodes: List[str],
+        blocking_config: Dict
+    ) -> Tuple[List[str], List[Tuple[str, str]]]:
+        """
+        Blocking stage for head dedup: name MinHash-LSH, shared-chunk and schema_type blocks.
+        
+        Returns:
+            (nodes that appear in at least one candidate pair, candidate node-id pairs)
+        """
+        entities = []
+        for node_id in remaining_nodes:
+            if node_id not in self.graph:
+                continue
+            properties = self.graph.nodes[node_id].get("properties", {})
+            chunk_ids = properties.get("chunk id") or properties.get("chunk_id") or []
+            if isinstance(chunk_ids, str):
+                chunk_ids = [chunk_ids]
+            entities.append(entity_blocking.BlockingEntity(
+                node_id=node_id,
+                name=str(properties.get("name", "")),
+                schema_type=properties.get("schema_type"),
+                chunk_ids=tuple(str(c) for c in chunk_ids)
+            ))
+        
+        result = entity_blocking.EntityBlocker.from_config(blocking_config).build(entities)
+        self.head_dedup_blocking_stats = result.stats
+        for kind, block_stats in result.stats["blocks"].items():
+            logger.info(f"  Blocking [{kind}]: {block_stats}")
+        
+        pairs = [(entities[i].node_id, entities[j].node_id) for i, j in result.pairs()]
+        paired = {node_id for pair in pairs for node_id in pair}
+        paired_nodes = [node_id for node_id in remaining_nodes if node_id in paired]
+        return paired_nodes, pairs
+    
+    def _drop_resolved_pairs(self, candidate_pairs: List[Tuple[str, str, float]]) -> List[Tuple[str, str, float]]:
+        """Drop candidate pairs already merged by the entity resolver (e.g. in an earlier run)."""
+        kept = [pair for pair in candidate_pairs if not self.entity_resolver.connected(pair[0], pair[1])]
+        if len(kept) < len(candidate_pairs):
+            logger.info(f"  Skipped {len(candidate_pairs) - len(kept)} candidate pairs already resolved")
+        return kept
+
     def _validate_candidates_with_embedding(
         self,
         candidate_pairs: List[Tuple[str, str, float]],
@@ -5212,30 +5413,20 @@ class KTBuilder:
         merge_mapping = {}
         metadata = {}
         
-        # Use Union-Find to handle transitivity
-        parent = {}
-        
-        def find(x):
-            if x not in parent:
-                parent[x] = x
-            if parent[x] != x:
-                parent[x] = find(parent[x])
-            return parent[x]
-        
-        def union(x, y):
-            px, py = find(x), find(y)
-            if px != py:
-                if int(px.split('_')[1]) < int(py.split('_')[1]):
-                    parent[py] = px
-                else:
-                    parent[px] = py
+        # Use Union-Find to handle transitivity; the lowest-numbered entity stays canonical
+        resolver = union_find.EntityUnionFind()
+        find = resolver.find
         
         # Process valid pairs
         valid_pairs = []
         valid_pairs_names = []
         for node_id_1, node_id_2, similarity in candidate_pairs:
             if similarity >= threshold:
-                union(node_id_1, node_id_2)
+                px, py = find(node_id_1), find(node_id_2)
+                if int(px.split('_')[1]) < int(py.split('_')[1]):
+                    resolver.union(node_id_2, node_id_1)
+                else:
+                    resolver.union(node_id_1, node_id_2)
                 valid_pairs.append((node_id_1, node_id_2, similarity))
                 valid_pairs_names.append((candidate_names[node_id_1], candidate_names[node_id_2]))
 
@@ -5407,69 +5598,37 @@ class KTBuilder:
         if not merge_mapping:
             return 0
         
-        merged_count = 0
-        
+        # Resolve chains (A -> B, B -> C) so every duplicate maps to its final canonical
+        resolver = union_find.EntityUnionFind()
         for duplicate_id, canonical_id in merge_mapping.items():
-            if duplicate_id not in self.graph or canonical_id not in self.graph:
-                continue
-            
-            if duplicate_id == canonical_id:
-                continue
-            
+            if duplicate_id in self.graph and canonical_id in self.graph:
+                resolver.union(duplicate_id, canonical_id)
+        resolved_mapping = resolver.mapping()
+        if not resolved_mapping:
+            return 0
+        
+        # A pair whose properties fail to merge is skipped, leaving its duplicate in place
+        for duplicate_id, canonical_id in list(resolved_mapping.items()):
             try:
-
-                # Transfer outgoing edges
-                self._reassign_outgoing_edges(duplicate_id, canonical_id)
-                
-                # Transfer incoming edges
-                self._reassign_incoming_edges(duplicate_id, canonical_id)
-                
-                # Merge node properties
                 self._merge_node_properties(
                     duplicate_id,
                     canonical_id,
                     metadata.get(duplicate_id, {})
                 )
-                
-                # Remove duplicate node
-                self.graph.remove_node(duplicate_id)
-                merged_count += 1
-                
             except Exception as e:
                 logger.error(f"Error merging {duplicate_id} into {canonical_id}: {e}")
-                continue
+                del resolved_mapping[duplicate_id]
+        if not resolved_mapping:
+            return 0
         
-        return merged_count
-    
-    def _reassign_outgoing_edges(self, source_id: str, target_id: str):
-        """Transfer outgoing edges from source to target node."""
-        outgoing = list(self.graph.out_edges(source_id, keys=True, data=True))
-        #import pdb; pdb.set_trace()
-        for _, tail_id, key, data in outgoing:
-            if tail_id == target_id:
-                continue
-            
-            edge_exists, existing_key = self._find_similar_edge(target_id, tail_id, data)
-            
-            if not edge_exists:
-                self.graph.add_edge(target_id, tail_id, **copy.deepcopy(data))
-            else:
-                self._merge_edge_chunks(target_id, tail_id, existing_key, data)
-    
-    def _reassign_incoming_edges(self, source_id: str, target_id: str):
-        """Transfer incoming edges from source to target node."""
-        incoming = list(self.graph.in_edges(source_id, keys=True, data=True))
+        # Transfer all edges in one pass, then drop the duplicates
+        rewrite_stats = graph_rewrite.rewrite_edges(self.graph, resolved_mapping)
+        logger.debug(f"Head merge edge rewrite: {rewrite_stats}")
+        self.graph.remove_nodes_from(resolved_mapping)
+        for duplicate_id, canonical_id in resolved_mapping.items():
+            self.entity_resolver.union(duplicate_id, canonical_id)
         
-        for head_id, _, key, data in incoming:
-            if head_id == target_id:
-                continue
-            
-            edge_exists, existing_key = self._find_similar_edge(head_id, target_id, data)
-            
-            if not edge_exists:
-                self.graph.add_edge(head_id, target_id, **copy.deepcopy(data))
-            else:
-                self._merge_edge_chunks(head_id, target_id, existing_key, data)
+        return len(resolved_mapping)
     
     def _find_similar_edge(self, u: str, v: str, new_data: dict) -> Tuple[bool, Any]:
         """Check if a similar edge already exists."""
@@ -5650,23 +5809,18 @@ class KTBuilder:
         Returns:
             (merge_mapping, metadata): {duplicate_id: representative_id}, metadata
         """
-        parent = {}
-        def find(x):
-            if x not in parent:
-                parent[x] = x
-            if parent[x] != x:
-                parent[x] = find(parent[x])
-            return parent[x]
-
-        def union(entity1, entity2):
-            """Union with frequency priority."""
-            root1, root2 = find(entity1), find(entity2)
-            if root1 == root2:
-                return
-            if root1 != root2:
-                parent[root1] = root2
- 
-        if not load_llm_results:
+        # union(duplicate, canonical) keeps the canonical side's representative
+        resolver = union_find.EntityUnionFind()
+
+        config = self.config.construction.semantic_dedup.head_dedup if hasattr(
+            self.config.construction.semantic_dedup, 'head_dedup'
+        ) else None
+        packing_config = (config or {}).get('pair_packing', {}) or {}
+
+        if not load_llm_results and packing_config.get('enabled', False):
+            logger.info(f"Validating {len(candidate_pairs)} candidates with LLM (v2, packed prompts)...")
+            llm_results, prompts = self._validate_pairs_packed(candidate_pairs, packing_config)
+        elif not load_llm_results:
             logger.info(f"Validating {len(candidate_pairs)} candidates with LLM (v2: LLM-driven representative)...")
         # Build prompts
             prompts = []
@@ -5960,79 +6114,12 @@ class KTBuilder:
         )
 
 
-        def find_with_path(x):
-            """Find root and return the path from x to root.
-            
-            Returns:
-                tuple: (root, path) where path is list of nodes from x to root
-            """
-            if x not in parent:
-                parent[x] = x
-                rank[x] = 0
-                return x, [x]
-            
-            path = [x]
-            visited = {x}
-            current = x
-            
-            # Traverse to root, detecting cycles
-            while parent[current] != current:
-                next_node = parent[current]
-                
-                # Cycle detection
-                if next_node in visited:
-                    cycle_start = path.index(next_node)
-                    cycle = path[cycle_start:] + [next_node]
-                    logger.error(
-                        f"CYCLE DETECTED: {' -> '.join(cycle)}\n"
-                        f"Full path: {' -> '.join(path)} -> {next_node}"
-                    )
-                    raise ValueError(f"Cycle detected in DSU: {' -> '.join(cycle)}")
-                
-                visited.add(next_node)
-                path.append(next_node)
-                current = next_node
-            
-            return current, path, llm_results
-        
-        def get_path_to_root(x):
-            """Get the path from entity x to its root without modifying structure.
-            
-            Returns:
-                list: Path from x to root (including both x and root)
-            """
-            if x not in parent:
-                return [x]
-            
-            path = [x]
-            visited = {x}
-            current = x
-            max_depth = len(parent) + 1  # Safety limit
-            
-            while parent.get(current) != current and len(path) < max_depth:
-                next_node = parent[current]
-                
-                # Cycle detection
-                if next_node in visited:
-                    cycle_start = path.index(next_node)
-                    cycle = path[cycle_start:] + [next_node]
-                    logger.warning(
-                        f"Cycle in path from {x}: {' -> '.join(cycle)}"
-                    )
-                    return path + [next_node]  # Return path including cycle point
-                
-                visited.add(next_node)
-                path.append(next_node)
-                current = next_node
-            
-            return path
-
         #import pdb; pdb.set_trace()
         for dup_id, can_id in merge_mapping.items():
-            union(dup_id, can_id)
+            resolver.union(dup_id, can_id)
         final_merge = []
         for dup_id, can_id in merge_mapping.items():
-            root = find(dup_id)
+            root = resolver.find(dup_id)
             if root != dup_id:
                 final_merge_mapping[dup_id] = root
                 final_merge.append(
@@ -6074,6 +6161,134 @@ class KTBuilder:
         logger.info(f"LLM validated {len(merge_mapping)} merges with representative selection")
         return final_merge_mapping, metadata, llm_results
 
+    def _validate_pairs_packed(
+        self,
+        candidate_pairs: List[Tuple[str, str, float]],
+        packing_config: Dict
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Judge candidate pairs with multi-pair prompts.
+
+        Pairs that share entities are packed into one prompt (see utils.pair_packing) in which
+        every entity and its context appears once, and the LLM returns one decision per pair.
+
+        Returns:
+            (per-pair results, per-pair prompts) in the single-pair format used by
+            _validate_candidates_with_llm_v2: each result's response is the pair's decision
+            as JSON, and each prompt is the packed prompt that produced it
+        """
+        packs = pair_packing.pack_pairs(
+            [(node_id_1, node_id_2) for node_id_1, node_id_2, _ in candidate_pairs],
+            max_entities=int(packing_config.get('max_entities', 8)),
+            max_pairs=int(packing_config.get('max_pairs', 12))
+        )
+
+        head_config = self.config.construction.semantic_dedup.head_dedup if hasattr(
+            self.config.construction.semantic_dedup, 'head_dedup'
+        ) else None
+        use_hybrid_context = bool(head_config and head_config.get('use_hybrid_context', False))
+
+        entity_blocks = {}
+
+        def _entity_block(node_id: str) -> str:
+            # Built once per entity, however many packs it appears in
+            if node_id not in entity_blocks:
+                chunk_context = self._collect_chunk_context(node_id) if use_hybrid_context else "(Not available)"
+                entity_blocks[node_id] = (
+                    f"[{node_id}] {self._describe_node(node_id)}\n"
+                    f"Graph relationships:\n{self._collect_node_context(node_id, max_relations=1000)}\n"
+                    f"Source text:\n{chunk_context}"
+                )
+            return entity_blocks[node_id]
+
+        prompts = []
+        entity_mentions = 0
+        for pack in packs:
+            entity_ids = []
+            for index in pack:
+                for node_id in candidate_pairs[index][:2]:
+                    if node_id not in entity_ids:
+                        entity_ids.append(node_id)
+            entity_mentions += len(entity_ids)
+            pairs_text = "\n".join(
+                f"P{k + 1}: {candidate_pairs[index][0]} vs {candidate_pairs[index][1]}"
+                for k, index in enumerate(pack)
+            )
+            prompts.append({
+                "prompt": self.config.get_prompt_formatted(
+                    "head_dedup",
+                    "batch_with_representative_selection",
+                    entities="\n\n".join(_entity_block(node_id) for node_id in entity_ids),
+                    pairs=pairs_text
+                ),
+                "type": "semantic",
+                "metadata": {"pair_indices": pack}
+            })
+
+        logger.info(
+            f"Packed {len(candidate_pairs)} pairs into {len(prompts)} prompts "
+            f"({entity_mentions} entity contexts instead of {2 * len(candidate_pairs)})"
+        )
+        packed_results = self._concurrent_llm_calls(prompts, type="head_dedup")
+
+        decisions = {}
+        for result in packed_results:
+            pack = result.get("metadata", {}).get("pair_indices", [])
+            try:
+                parsed = json_repair.loads(result.get("response") or "{}")
+                pack_decisions = parsed.get("decisions", []) if isinstance(parsed, dict) else parsed
+            except Exception as e:
+                logger.warning(f"Failed to parse packed head dedup response: {e}")
+                pack_decisions = []
+            for decision in pack_decisions or []:
+                if not isinstance(decision, dict):
+                    continue
+                try:
+                    index = pack[int(str(decision.get("pair", "")).lstrip("Pp")) - 1]
+                except (ValueError, IndexError):
+                    continue
+                decisions[index] = decision
+
+        missing = 0
+        pair_results, pair_prompts = [], []
+        for index, (node_id_1, node_id_2, embedding_sim) in enumerate(candidate_pairs):
+            decision = decisions.get(index)
+            if decision is None:
+                missing += 1
+                decision = {"is_coreferent": False, "representative": None,
+                            "rationale": "No decision returned for this pair in the packed response"}
+            elif decision.get("is_coreferent") and decision.get("representative") not in (node_id_1, node_id_2):
+                logger.warning(
+                    f"LLM returned invalid representative {decision.get('representative')} "
+                    f"for pair ({node_id_1}, {node_id_2}). Keeping separate."
+                )
+                decision = dict(decision, is_coreferent=False, representative=None)
+            pair_results.append({
+                "type": "semantic",
+                "metadata": {
+                    "node_id_1": node_id_1,
+                    "node_id_2": node_id_2,
+                    "embedding_similarity": embedding_sim
+                },
+                "response": json.dumps({
+                    "is_coreferent": bool(decision.get("is_coreferent", False)),
+                    "representative": decision.get("representative"),
+                    "rationale": str(decision.get("rationale", ""))
+                }, ensure_ascii=False),
+                "error": None,
+                "index": index
+            })
+            pair_prompts.append(None)
+
+        # Map every pair to the packed prompt it was judged in
+        for pack_index, pack in enumerate(packs):
+            for index in pack:
+                pair_prompts[index] = prompts[pack_index]
+
+        if missing:
+            logger.warning(f"{missing} of {len(candidate_pairs)} pairs had no decision in packed responses; kept separate")
+        return pair_results, pair_prompts
+
     def _collect_chunk_context(self, node_id: str, max_length: int = 500) -> str:
         """
         Collect chunk text context for a node.
@@ -6338,6 +6553,7 @@ class KTBuilder:
                 # Step 4: Mark node roles
                 self.graph.nodes[duplicate_id]["properties"]["node_role"] = "alias"
                 self.graph.nodes[duplicate_id]["properties"]["alias_of"] = canonical_id
+                self.entity_resolver.union(duplicate_id, canonical_id)
 
                 canonical_props = self.graph.nodes[canonical_id].get("properties", {})
                 canonical_props["node_role"] = "representative"
@@ -6472,6 +6688,7 @@ class KTBuilder:
                 # Step 4: Mark node roles
                 self.graph.nodes[duplicate_id]["properties"]["node_role"] = "alias"
                 self.graph.nodes[duplicate_id]["properties"]["alias_of"] = canonical_id
+                self.entity_resolver.union(duplicate_id, canonical_id)
 
                 canonical_props = self.graph.nodes[canonical_id].get("properties", {})
                 canonical_props["node_role"] = "representative"
@@ -6508,30 +6725,6 @@ class KTBuilder:
             "edges_transferred": edges_transferred
         }
 
-    def _resolve_canonical_chain(self, node_id: str, merge_mapping: Dict[str, str] = None) -> str:
-        """
-        Resolve the canonical chain for a node by following merge mappings.
-        Returns the final canonical node after following all alias relationships.
-
-        Args:
-            node_id: The node to resolve
-            merge_mapping: Optional merge mapping to use for resolution
-
-        Returns:
-            The final canonical node ID
-        """
-        if merge_mapping is None:
-            merge_mapping = {}
-
-        visited = set()
-        current = node_id
-
-        while current in merge_mapping and current not in visited:
-            visited.add(current)
-            current = merge_mapping[current]
-
-        return current
-
     def _merge_exact_and_semantic_mappings(
         self,
         exact_merge_mapping: Dict[str, str],
@@ -6549,9 +6742,12 @@ class KTBuilder:
             Combined merge mapping with resolved canonical chains
         """
         # First, resolve all canonical targets in semantic_merge_mapping
-        resolved_semantic_mapping = {}
+        resolver = union_find.EntityUnionFind()
         for dup_id, can_id in semantic_merge_mapping.items():
-            resolved_semantic_mapping[dup_id] = self._resolve_canonical_chain(can_id, semantic_merge_mapping)
+            resolver.union(dup_id, can_id)
+        resolved_semantic_mapping = {
+            dup_id: resolver.find(can_id) for dup_id, can_id in semantic_merge_mapping.items()
+        }
 
         # Create a mapping from old canonical to new canonical for updates
         canonical_updates = {}
@@ -6873,7 +7069,7 @@ class KTBuilder:
         logger.info("Head Deduplication (LLM-Driven + Alias Relationships)")
         logger.info("=" * 70)
 
-        self.ori_graph = copy.deepcopy(self.graph)
+        self.snapshot_graph()
         #import pdb; pdb.set_trace()
         # Get configuration
         config = self.config.construction.semantic_dedup.head_dedup if hasattr(
@@ -6910,6 +7106,7 @@ class KTBuilder:
         
         # Phase 1: Collect candidates
         logger.info("\n[Phase 1/4] Collecting head candidates...")
+        self._report_progress("head_dedup", 0.0, "Collecting head candidates...")
         candidates, candidates_names = self._collect_head_candidates()
         logger.info(f"✓ Found {len(candidates)} entity nodes")
         
@@ -6926,6 +7123,7 @@ class KTBuilder:
 
         # Phase 2: Exact match
         logger.info("\n[Phase 2/4] Exact match deduplication...")
+        self._report_progress("head_dedup", 0.1, "Exact match deduplication...")
         exact_merge_mapping, invalid_nodes = self._deduplicate_heads_exact(candidates)
         logger.info(f"✓ Identified {len(exact_merge_mapping)} exact matches")
         
@@ -6956,6 +7154,7 @@ class KTBuilder:
         
         if enable_semantic:
             logger.info("\n[Phase 3/4] Semantic deduplication (LLM-driven)...")
+            self._report_progress("head_dedup", 0.2, "Semantic deduplication (LLM-driven)...")
             
             remaining_nodes = [
                 node_id for node_id in candidates
@@ -6976,6 +7175,7 @@ class KTBuilder:
                         similarity_threshold=0.75  # Pre-filtering threshold
                     )
                     logger.info(f"✓ Generated {len(candidate_pairs)} candidate pairs")
+                    candidate_pairs = self._drop_resolved_pairs(candidate_pairs)
                 
                     # Record candidate pairs
                     if save_intermediate:
@@ -7059,6 +7259,7 @@ class KTBuilder:
         
         # Phase 4: Validation
         logger.info("\n[Phase 4/4] Validating graph integrity...")
+        self._report_progress("head_dedup", 0.9, "Validating graph integrity...")
         issues = self.validate_graph_integrity_with_alias(candidates_names)
         
         if any(v for v in issues.values() if v):
@@ -7367,6 +7568,59 @@ class KTBuilder:
         logger.info(f"✓ Exported {len(rows)} alias mappings to {output_path}")
 
 
+    def load_entity_resolver(self, graph_path: str) -> None:
+        """
+        Restore merge state for a graph loaded from graph_path.
+
+        Uses the union-find saved next to the graph, or rebuilds it from the
+        alias_of properties when no file exists (graphs saved before it was kept).
+        """
+        resolver = union_find.EntityUnionFind.load(union_find.resolver_path_for_graph(graph_path))
+        if resolver is None:
+            resolver = union_find.EntityUnionFind.from_alias_graph(self.graph)
+        self.entity_resolver = resolver
+        logger.info(f"Loaded entity resolver with {len(resolver.groups())} merged groups")
+
+    def save_entity_resolver(self, graph_path: str) -> str:
+        """Save the entity resolver alongside the graph file and return its path."""
+        resolver_path = union_find.resolver_path_for_graph(graph_path)
+        self.entity_resolver.save(resolver_path)
+        return resolver_path
+
+    def load_previous_build(self, graph_path: str) -> None:
+        """
+        Load the graph, entity resolver and chunks of an earlier build so new documents extend it.
+
+        node_counter continues after the highest saved entity_N / attr_N id,
+        so new nodes never reuse the id of a saved one.
+        """
+        graph_processor.load_graph_from_json(graph_path, graph=self.graph)
+        self.load_entity_resolver(graph_path)
+        self.all_chunks.update(self._load_saved_chunks(f"output/chunks/{self.dataset_name}.txt"))
+        counters = [
+            int(suffix)
+            for prefix, _, suffix in (str(node).rpartition("_") for node in self.graph.nodes())
+            if prefix in ("entity", "attr") and suffix.isdigit()
+        ]
+        self.node_counter = max(counters, default=-1) + 1
+        logger.info(f"Loaded previous build from {graph_path}: {self.graph.number_of_nodes()} nodes, "
+                    f"{len(self.all_chunks)} chunks, next node id {self.node_counter}")
+
+    def _new_documents(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Documents with a chunk not already saved.
+
+        Chunks are matched by the hash of their full text; chunks saved before
+        the hash file was kept are matched by their saved (single-line) text.
+        """
+        saved_hashes = set(self._load_chunk_hashes(f"output/chunks/{self.dataset_name}_hashes.txt").values())
+        saved_texts = set(self.all_chunks.values())
+
+        def is_saved(chunk: str) -> bool:
+            return self._chunk_hash(chunk) in saved_hashes or chunk.strip() in saved_texts
+
+        return [doc for doc in documents if not all(is_saved(chunk) for chunk in self._document_chunks(doc))]
+
     def build_knowledge_graph(self, corpus):
         logger.info(f"========{'Start Building':^20}========")
         logger.info(f"{'➖' * 30}")
@@ -7374,18 +7628,26 @@ class KTBuilder:
         with open(corpus, 'r', encoding='utf-8') as f:
             documents = json_repair.load(f)
         
+        json_output_path = f"output/graphs/{self.dataset_name}_new.json"
+        # Incremental mode extends the saved graph with the documents it does not hold yet
+        if getattr(self.config.tree_comm, "incremental", False) and os.path.exists(json_output_path):
+            self.load_previous_build(json_output_path)
+            new_documents = self._new_documents(documents)
+            logger.info(f"Incremental build: {len(new_documents)}/{len(documents)} documents are new")
+            documents = new_documents
+        
         self.process_all_documents(documents)
         
         logger.info(f"All Process finished, token cost: {self.token_len}")
         
+        self._report_progress("saving", 0.0, "Saving chunks and graph...")
         self.save_chunks_to_file()
         
-        output = self.format_output()
-        
-        json_output_path = f"output/graphs/{self.dataset_name}_new.json"
         os.makedirs("output/graphs", exist_ok=True)
-        with open(json_output_path, 'w', encoding='utf-8') as f:
-            json.dump(output, f, ensure_ascii=False, indent=2)
+        # Streamed edge by edge; format_output() would hold every record in memory
+        graph_processor.save_graph_to_json(self.graph, json_output_path)
         logger.info(f"Graph saved to {json_output_path}")
+        self.save_entity_resolver(json_output_path)
+        self._report_progress("saving", 1.0, f"Graph saved to {json_output_path}")
         
-        return output
+        return self.graph
@@ -0,0 +1,212 @@
+"""
+Compact BM25 inverted index over node texts.
+
+Postings are stored as flat numpy arrays (CSR layout): for term t, the node
+indices are postings[offsets[t]:offsets[t + 1]] (sorted ascending) with their
+term frequencies in tfs at the same positions. The whole index is saved as a
+single .npz file, so loading is a handful of array reads instead of
+unpickling a dict of sets.
+
+Queries are scored with BM25 using MaxScore-style early termination: terms
+are processed in decreasing order of their score upper bound, and once the
+remaining terms can no longer lift a new node into the top-k they are only
+used to rescore nodes that are already candidates.
+"""
+
+import math
+import os
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from models.retriever.keyword_extractor import ENGLISH_STOPWORDS, tokenize
+from utils.logger import logger
+
+__all__ = ["BM25Index", "index_terms"]
+
+INDEX_FORMAT_VERSION = 1
+
+
+def index_terms(text: str, min_length: int = 3) -> List[str]:
+    """Lowercased index terms of `text` (stopwords and short tokens dropped)"""
+    return [
+        token for token in (t.lower() for t in tokenize(text))
+        if len(token) >= min_length and token not in ENGLISH_STOPWORDS
+    ]
+
+
+class BM25Index:
+    """Inverted index with BM25 ranking over a fixed set of documents (graph nodes)"""
+
+    def __init__(self, node_ids: List[str], terms: List[str], offsets: np.ndarray, postings: np.ndarray,
+                 tfs: np.ndarray, doc_lengths: np.ndarray, k1: float = 1.2, b: float = 0.75):
+        self.node_ids = list(node_ids)
+        self.terms = list(terms)
+        self.offsets = offsets
+        self.postings = postings
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+
+        self._term_ids: Dict[str, int] = {term: i for i, term in enumerate(self.terms)}
+        avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        # Per-document BM25 length normalization, k1 * (1 - b + b * |d| / avgdl)
+        if avg_length > 0:
+            self._length_norm = (k1 * (1.0 - b + b * doc_lengths / avg_length)).astype(np.float32)
+        else:
+            self._length_norm = np.full(len(doc_lengths), k1, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._term_ids
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self.terms)
+
+    @classmethod
+    def build(cls, node_texts: Dict[str, str], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        """
+        Build the index from a mapping of node id to node text.
+
+        Args:
+            node_texts: Node id -> text (name and description)
+            k1: BM25 term-frequency saturation
+            b: BM25 length normalization strength
+        """
+        node_ids = sorted(node_texts)
+        term_postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = np.zeros(len(node_ids), dtype=np.int32)
+
+        for doc_index, node in enumerate(node_ids):
+            counts = Counter(index_terms(node_texts[node] or ""))
+            doc_lengths[doc_index] = sum(counts.values())
+            for term, tf in counts.items():
+                term_postings.setdefault(term, []).append((doc_index, tf))
+
+        terms = sorted(term_postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(term_postings[term])
+
+        postings = np.empty(int(offsets[-1]), dtype=np.int32)
+        tfs = np.empty(int(offsets[-1]), dtype=np.uint16)
+        for i, term in enumerate(terms):
+            # Documents are visited in index order, so postings are already sorted
+            entries = term_postings[term]
+            start, end = offsets[i], offsets[i + 1]
+            postings[start:end] = [doc for doc, _ in entries]
+            tfs[start:end] = [min(tf, np.iinfo(np.uint16).max) for _, tf in entries]
+
+        return cls(node_ids, terms, offsets, postings, tfs, doc_lengths, k1=k1, b=b)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            version=np.array([INDEX_FORMAT_VERSION]),
+            params=np.array([self.k1, self.b], dtype=np.float64),
+            node_ids=np.array(self.node_ids, dtype=str),
+            terms=np.array(self.terms, dtype=str),
+            offsets=self.offsets,
+            postings=self.postings,
+            tfs=self.tfs,
+            doc_lengths=self.doc_lengths,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        """Load an index saved with save(); returns None if missing or from another format version"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"][0]) != INDEX_FORMAT_VERSION:
+                logger.warning(f"Ignoring BM25 index {path} with format version {int(data['version'][0])}")
+                return None
+            k1, b = (float(x) for x in data["params"])
+            return cls(
+                data["node_ids"].tolist(),
+                data["terms"].tolist(),
+                data["offsets"],
+                data["postings"],
+                data["tfs"],
+                data["doc_lengths"],
+                k1=k1,
+                b=b,
+            )
+
+    def _idf(self, document_frequency: int) -> float:
+        n = len(self.node_ids)
+        return math.log(1.0 + (n - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def _term_scores(self, term_id: int) -> Tuple[np.ndarray, np.ndarray, float]:
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        docs = self.postings[start:end]
+        tf = self.tfs[start:end].astype(np.float32)
+        idf = self._idf(len(docs))
+        scores = idf * tf * (self.k1 + 1.0) / (tf + self._length_norm[docs])
+        return docs, scores, idf
+
+    def search(self, query_terms: Iterable[str], top_k: int = 50) -> List[Tuple[str, float]]:
+        """
+        Rank nodes for the query terms with BM25.
+
+        Args:
+            query_terms: Raw keywords or phrases; they are tokenized like the indexed text
+            top_k: Number of results to return
+
+        Returns:
+            (node_id, score) pairs, best first; ties are broken by node id
+        """
+        term_ids = []
+        seen = set()
+        for keyword in query_terms:
+            for term in index_terms(keyword):
+                term_id = self._term_ids.get(term)
+                if term_id is not None and term_id not in seen:
+                    seen.add(term_id)
+                    term_ids.append(term_id)
+        if not term_ids or top_k <= 0:
+            return []
+
+        # Upper bound of a term's contribution: idf * (k1 + 1), since tf / (tf + norm) < 1
+        bounds = {
+            term_id: self._idf(int(self.offsets[term_id + 1] - self.offsets[term_id])) * (self.k1 + 1.0)
+            for term_id in term_ids
+        }
+        term_ids.sort(key=lambda term_id: bounds[term_id], reverse=True)
+        remaining_bound = [0.0] * (len(term_ids) + 1)
+        for i in range(len(term_ids) - 1, -1, -1):
+            remaining_bound[i] = remaining_bound[i + 1] + bounds[term_ids[i]]
+
+        candidates = np.empty(0, dtype=np.int32)
+        candidate_scores = np.empty(0, dtype=np.float32)
+        for position, term_id in enumerate(term_ids):
+            docs, scores, _ = self._term_scores(term_id)
+
+            if len(candidates) >= top_k:
+                kth_score = np.partition(candidate_scores, len(candidate_scores) - top_k)[-top_k]
+                if remaining_bound[position] < kth_score:
+                    # Remaining terms cannot promote new nodes into the top-k: only rescore candidates
+                    found = np.searchsorted(docs, candidates)
+                    found_clipped = np.minimum(found, len(docs) - 1)
+                    hit = (found < len(docs)) & (docs[found_clipped] == candidates)
+                    candidate_scores[hit] += scores[found_clipped[hit]]
+                    continue
+
+            merged = np.concatenate([candidates, docs])
+            merged_scores = np.concatenate([candidate_scores, scores])
+            candidates, inverse = np.unique(merged, return_inverse=True)
+            candidate_scores = np.zeros(len(candidates), dtype=np.float32)
+            np.add.at(candidate_scores, inverse, merged_scores)
+
+        k = min(top_k, len(candidates))
+        # Sort by score descending, then by node index for deterministic ties
+        order = np.lexsort((candidates, -candidate_scores))[:k]
+        return [(self.node_ids[candidates[i]], float(candidate_scores[i])) for i in order]
@@ -1,23 +1,32 @@
+from __future__ import annotations
+
 import os
 import pickle
 import threading
 import time
 from functools import lru_cache
-from typing import Dict, List, Optional, Set, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
 
-import faiss
 import numpy as np
-import spacy
-import torch
-import torch.nn.functional as F
 import concurrent.futures
-from sentence_transformers import SentenceTransformer
 
+from models.retriever.bm25_index import BM25Index
 from models.retriever.faiss_filter import DualFAISSRetriever
-from utils import graph_processor
+from models.retriever.keyword_extractor import create_keyword_extractor, load_spacy_model
+from utils import graph_backend
 from utils import call_llm_api
+from utils import union_find
+from utils.lazy_import import lazy_import
 from utils.logger import logger
 
+# Heavy dependencies are imported on first use to keep CLI/API startup fast
+faiss = lazy_import("faiss")
+torch = lazy_import("torch")
+F = lazy_import("torch.nn.functional")
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
 try:
     from config import get_config
 except ImportError:
@@ -54,10 +63,18 @@ class KTRetriever:
             recall_paths = recall_paths if recall_paths != 2 else config.retrieval.recall_paths
             schema_path = schema_path or config.get_dataset_config(dataset).schema_path
             mode = mode if mode != "agent" else config.triggers.mode
-            qa_encoder = qa_encoder or SentenceTransformer(config.embeddings.model_name)
         
-        self.graph = graph_processor.load_graph_from_json(json_path)
-        self.qa_encoder = qa_encoder or SentenceTransformer('all-MiniLM-L6-v2')
+        # "compact" keeps the graph in arrays for a fraction of networkx's memory
+        backend = config.retrieval.graph_backend if config else "networkx"
+        self.graph = graph_backend.load_graph(json_path, backend)
+        # Merge state saved alongside the graph; older graphs fall back to alias_of properties
+        self.entity_resolver = union_find.EntityUnionFind.load(union_find.resolver_path_for_graph(json_path))
+        if self.entity_resolver is None:
+            self.entity_resolver = union_find.EntityUnionFind.from_alias_graph(self.graph)
+        if qa_encoder is None:
+            from sentence_transformers import SentenceTransformer
+            qa_encoder = SentenceTransformer(config.embeddings.model_name if config else 'all-MiniLM-L6-v2')
+        self.qa_encoder = qa_encoder
 
         self.llm_client = call_llm_api.LLMCompletionCall()
         
@@ -78,7 +95,15 @@ class KTRetriever:
         os.makedirs(cache_dir, exist_ok=True)
         self.debug_mode = True
 
-        self.nlp = spacy.load("en_core_web_lg")
+        # spaCy is only loaded when the spacy extractor first needs it; the fast
+        # extractor builds its gazetteer from node names on first query
+        retrieval_config = getattr(config, "retrieval", None)
+        self.keyword_extractor = create_keyword_extractor(
+            getattr(retrieval_config, "keyword_extractor", "fast"),
+            spacy_model=getattr(retrieval_config, "spacy_model", "en_core_web_lg"),
+            graph=self.graph,
+            cache_size=getattr(retrieval_config, "keyword_cache_size", 1024)
+        )
         
         self.faiss_retriever = DualFAISSRetriever(dataset, self.graph, cache_dir=cache_dir, device=self.device)
         
@@ -143,6 +168,11 @@ class KTRetriever:
             except Exception as e:
                 self.enable_performance_optimizations = False
 
+    @property
+    def nlp(self):
+        """spaCy pipeline, loaded on first access"""
+        return load_spacy_model(getattr(getattr(self.config, "retrieval", None), "spacy_model", "en_core_web_lg"))
+
     def build_indices(self):
         """Build all FAISS indices for efficient retrieval."""
         self.faiss_retriever.build_indices()
@@ -738,12 +768,27 @@ class KTRetriever:
             search_k = min(self.top_k, len(filtered_node_embeddings))
             _, indices = temp_index.search(question_embed.reshape(1, -1), search_k)
             
-            top_filtered_nodes = [filtered_node_map[idx] for idx in indices[0] if idx in filtered_node_map]
+            top_filtered_nodes = self._resolve_aliases(
+                filtered_node_map[idx] for idx in indices[0] if idx in filtered_node_map
+            )
         else:
             top_filtered_nodes = filtered_nodes[:self.top_k]
         
         return {"top_nodes": top_filtered_nodes}
 
+    def _resolve_aliases(self, nodes) -> List[str]:
+        """Replace alias nodes with their representatives, keeping first-occurrence order without duplicates."""
+        resolved = []
+        seen = set()
+        for node in nodes:
+            representative = self.entity_resolver.find(node)
+            if representative not in self.graph:
+                representative = node
+            if representative not in seen:
+                seen.add(representative)
+                resolved.append(representative)
+        return resolved
+
     def _get_one_hop_triples_from_nodes(self, node_list: list) -> list:
 
         one_hop_triples = []
@@ -862,11 +907,6 @@ class KTRetriever:
                 keyword_future = executor.submit(self._keyword_strategy, question, question_embed)
             else:
                 keyword_future = None
-
-            if question:
-                path_future = executor.submit(self._path_strategy, question, question_embed)
-            else:
-                path_future = None
             
             try:
                 results['faiss_nodes'] = faiss_node_future.result()
@@ -885,12 +925,6 @@ class KTRetriever:
                     results['keywords'] = keyword_results.get('keywords', [])
                 except Exception as e:
                     logger.error(f"Keyword strategy failed: {e}")
-            
-            if path_future:
-                try:
-                    results['path_triples'] = path_future.result()
-                except Exception as e:
-                    logger.error(f"Path strategy failed: {e}")
         
         return results
 
@@ -935,17 +969,8 @@ class KTRetriever:
                 self.faiss_search_cache = {}
             self.faiss_search_cache[search_key] = (D_relations, I_relations)
         
-        relations = []
-        for idx in I_relations[0]:
-            if idx == -1:
-                continue
-            try:
-                relation = self.faiss_retriever.relation_map[str(idx)]
-                relations.append(relation)
-            except KeyError:
-                continue
-        
-        return relations
+        relation_vocab = self.faiss_retriever.relation_vocab
+        return [relation_vocab[idx] for idx in I_relations[0] if 0 <= idx < len(relation_vocab)]
 
     def _keyword_strategy(self, question: str, question_embed: torch.Tensor) -> Dict:
         """Execute keyword extraction and search strategy."""
@@ -957,11 +982,6 @@ class KTRetriever:
             'nodes': keyword_nodes
         }
 
-    def _path_strategy(self, question: str):
-        """Execute path-based search strategy."""
-        self._extract_query_keywords(question)
-        return
-
     def _node_relation_retrieval(self, question_embed: torch.Tensor, question: str = "") -> Dict:
         overall_start = time.time()
 
@@ -1041,7 +1061,9 @@ class KTRetriever:
                 )
 
             candidate_nodes.sort(key=lambda x: x[1], reverse=True)
-            top_nodes = [node for node, score in candidate_nodes[:self.top_k] if score > 0.05]
+            top_nodes = self._resolve_aliases(
+                node for node, score in candidate_nodes if score > 0.05
+            )[:self.top_k]
 
             all_relations = future_faiss_relations.result()
 
@@ -1094,11 +1116,8 @@ class KTRetriever:
         _, I_relations = self.faiss_retriever.relation_index.search(
             q_embed.reshape(1, -1), self.top_k
         )
-        return [
-            self.faiss_retriever.relation_map[str(idx)]
-            for idx in I_relations[0]
-            if idx != -1 and str(idx) in self.faiss_retriever.relation_map
-        ]
+        relation_vocab = self.faiss_retriever.relation_vocab
+        return [relation_vocab[idx] for idx in I_relations[0] if 0 <= idx < len(relation_vocab)]
 
     def _get_keyword_based_nodes(self, future_keywords) -> List[str]:
         keywords = future_keywords.result()
@@ -1128,15 +1147,21 @@ class KTRetriever:
 
     def _get_relation_matched_triples(self, top_nodes: List[str], relations: List[str]) -> List[Tuple]:
 
-        top_node_set = set(top_nodes)
+        # Only edges incident to a top node can match, so scan those instead of every edge
+        top_node_set = {node for node in top_nodes if node in self.graph}
         relation_set = set(relations)
 
-        return [
-            (u, data.get('relation'), v) 
-            for u, v, data in self.graph.edges(data=True) 
-            if data.get('relation') in relation_set and 
-               (u in top_node_set or v in top_node_set)
+        triples = [
+            (u, data.get('relation'), v)
+            for u, v, data in self.graph.out_edges(top_node_set, data=True)
+            if data.get('relation') in relation_set
         ]
+        triples.extend(
+            (u, data.get('relation'), v)
+            for u, v, data in self.graph.in_edges(top_node_set, data=True)
+            if u not in top_node_set and data.get('relation') in relation_set
+        )
+        return triples
 
     def _triple_only_retrieval(self, question_embed: torch.Tensor) -> Dict:
         """
@@ -1814,7 +1839,7 @@ class KTRetriever:
 
     def _enhance_query_with_entities(self, question: str) -> str:
         """
-        Enhance query by extracting entities and relations using spaCy NER and dependency parsing.
+        Enhance query with entities and key terms from the configured keyword extractor.
         With caching for performance optimization.
         
         Args:
@@ -1825,18 +1850,7 @@ class KTRetriever:
         """
         
         try:
-            doc = self.nlp(question)
-            
-            entities = []
-            for ent in doc.ents:
-                entities.append(ent.text)
-            
-            key_phrases = []
-            for token in doc:
-                if token.pos_ in ['NOUN', 'PROPN', 'VERB', 'ADJ'] and not token.is_stop:
-                    key_phrases.append(token.text)
-                    if len(key_phrases) >= 5:  
-                        break
+            entities, key_phrases = self.keyword_extractor.entities_and_key_terms(question, max_terms=5)
             
             enhanced_parts = [question]
             if entities:
@@ -2060,8 +2074,9 @@ class KTRetriever:
 
     def _extract_query_keywords(self, question: str) -> List[str]:
         """
-        Automatically extract keywords from the question using spaCy NER and POS tagging.
-        Optimized for single-query scenarios.
+        Automatically extract keywords from the question with the configured extractor
+        (gazetteer-based fast extractor, spaCy NER and POS tagging, or the simple
+        tokenizer). Results are memoized per question.
         
         Args:
             question: Input question
@@ -2070,24 +2085,7 @@ class KTRetriever:
             List of automatically discovered keywords
         """
         try:
-            doc = self.nlp(question.lower())
-            keywords = []
-            
-            for token in doc:
-                if (not token.is_stop and len(token.text) > 2):
-                    if token.ent_type_: 
-                        keywords.append(token.text.lower())
-                    elif token.pos_ in ['NOUN', 'PROPN', 'ADJ']:
-                        keywords.append(token.text.lower())
-                    elif token.pos_ == 'VERB':
-                        keywords.append(token.text.lower())
-
-            for ent in doc.ents:
-                if len(ent.text) > 2:
-                    keywords.append(ent.text.lower())
-            
-            unique_keywords = list(set(keywords))
-            return unique_keywords
+            return self.keyword_extractor.extract(question)
             
         except Exception as e:
             logger.error(f"Error extracting keywords: {str(e)}")
@@ -2095,11 +2093,9 @@ class KTRetriever:
 
     def _keyword_based_node_search(self, keywords: List[str]) -> List[str]:
         """
-        Optimized keyword-based node search with text indexing and early termination.
-        Optimized for single-query scenarios.
+        Keyword-based node search ranked by BM25 over the node text index.
+        Returns at most retrieval.keyword_top_k nodes, best first, in a deterministic order.
         """
-        overall_start = time.time()
-        
         if not keywords:
             return []
         
@@ -2110,21 +2106,9 @@ class KTRetriever:
                 logger.warning("Node text index not found. This should be built during initialization.")
                 return []
             
-            relevant_nodes = set()
-            max_nodes_per_keyword = 50  
-            
-            for keyword in keywords:
-                if keyword in self._node_text_index:
-                    keyword_nodes = self._node_text_index[keyword]
-                    if len(keyword_nodes) > max_nodes_per_keyword:
-                        keyword_nodes = set(list(keyword_nodes)[:max_nodes_per_keyword])
-                    relevant_nodes.update(keyword_nodes)
-                else:
-                    continue
-                
-                if len(relevant_nodes) > 200: 
-                    break
-            return list(relevant_nodes)
+            top_k = getattr(getattr(self.config, "retrieval", None), "keyword_top_k", 200)
+            ranked = self._node_text_index.search(keywords, top_k=top_k)
+            return [node for node, _ in ranked]
         else:
             result = self._keyword_based_node_search_original(keywords)
             return result
@@ -2148,72 +2132,51 @@ class KTRetriever:
         
         return relevant_nodes
     
+    def _node_text_index_path(self) -> str:
+        return f"{self.cache_dir}/{self.dataset}/node_text_index.npz"
+
     def _build_node_text_index(self):
         """
-        Build inverted index for node texts to speed up keyword search.
-        Optimized to use precomputed node texts and persistent caching.
+        Build the BM25 inverted index over node texts used by keyword search.
+        Uses precomputed node texts and is persisted as a compact .npz file.
         """
         if self._load_node_text_index():
             logger.info("Loaded node text index from cache")
             return
         
         start_time = time.time()
-        logger.info("Building optimized node text index for keyword search...")
-        self._node_text_index = {}
+        logger.info("Building BM25 node text index for keyword search...")
         
         if hasattr(self, '_node_text_cache') and self._node_text_cache:
-            node_texts = self._node_text_cache
+            node_texts = dict(self._node_text_cache)
         else:
             node_texts = {}
-            for node in self.graph.nodes():
-                node_texts[node] = self._get_node_text(node)
-        
-        total_nodes = len(node_texts)
-        processed_nodes = 0
+        # Nodes whose text could not be extracted are still indexed (with no terms) so the
+        # index covers the whole graph
+        for node in self.graph.nodes():
+            if node not in node_texts:
+                node_texts[node] = ""
         
-        for node, node_text in node_texts.items():
-            try:
-                node_text_lower = node_text.lower()
-                words = set(node_text_lower.split())
-                
-                for word in words:
-                    if len(word) > 2: 
-                        if word not in self._node_text_index:
-                            self._node_text_index[word] = set()
-                        self._node_text_index[word].add(node)
-                
-                processed_nodes += 1
-                if processed_nodes % 1000 == 0:
-                    logger.info(f"Indexed {processed_nodes}/{total_nodes} nodes")
-
-            except Exception as e:
-                logger.error(f"Error indexing node {node}: {str(e)}")
-                continue
+        self._node_text_index = BM25Index.build(node_texts)
         
         end_time = time.time()
-        logger.info(f"Time taken to build node text index: {end_time - start_time} seconds")
+        logger.info(f"Time taken to build node text index: {end_time - start_time} seconds "
+                    f"({len(self._node_text_index)} nodes, {self._node_text_index.vocabulary_size} terms)")
 
         self._save_node_text_index()
 
     def _save_node_text_index(self):
         """Save node text index to disk cache"""
-        cache_path = f"{self.cache_dir}/{self.dataset}/node_text_index.pkl"
+        cache_path = self._node_text_index_path()
         try:
-            if not self._node_text_index:
+            if self._node_text_index is None or not len(self._node_text_index):
                 logger.warning("No node text index to save!")
                 return False
-                
-            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
             
-            serializable_index = {}
-            for word, nodes in self._node_text_index.items():
-                serializable_index[word] = list(nodes)
-            
-            with open(cache_path, 'wb') as f:
-                pickle.dump(serializable_index, f)
+            self._node_text_index.save(cache_path)
             
             file_size = os.path.getsize(cache_path)
-            logger.info(f"Saved node text index with {len(serializable_index)} words to {cache_path} (size: {file_size} bytes)")
+            logger.info(f"Saved node text index with {self._node_text_index.vocabulary_size} terms to {cache_path} (size: {file_size} bytes)")
             return True
                 
         except Exception as e:
@@ -2222,34 +2185,28 @@ class KTRetriever:
 
     def _load_node_text_index(self):
         """Load node text index from disk cache"""
-        cache_path = f"{self.cache_dir}/{self.dataset}/node_text_index.pkl"
+        cache_path = self._node_text_index_path()
         if os.path.exists(cache_path):
             try:
                 file_size = os.path.getsize(cache_path)
-                if file_size < 1000: 
-                    logger.warning(f"Cache file too small ({file_size} bytes), likely empty or corrupted")
+                index = BM25Index.load(cache_path)
+                if index is None or not len(index):
+                    logger.warning("Loaded index is empty or outdated")
                     return False
                 
-                with open(cache_path, 'rb') as f:
-                    serializable_index = pickle.load(f)
-                
-                if not serializable_index:
-                    logger.warning("Loaded index is empty")
-                    return False
-                
-                self._node_text_index = {}
-                for word, nodes in serializable_index.items():
-                    self._node_text_index[word] = set(nodes)
+                self._node_text_index = index
                 
                 if not self._check_text_index_consistency():
                     logger.info("Text index inconsistent with current graph, will rebuild")
+                    self._node_text_index = None
                     return False
                 
-                logger.info(f"Loaded node text index with {len(self._node_text_index)} words from {cache_path} (file size: {file_size} bytes)")
+                logger.info(f"Loaded node text index with {index.vocabulary_size} terms from {cache_path} (file size: {file_size} bytes)")
                 return True
                 
             except Exception as e:
                 logger.error(f"Error loading node text index: {e}")
+                self._node_text_index = None
                 try:
                     os.remove(cache_path)
                     logger.info(f"Removed corrupted cache file: {cache_path}")
@@ -2262,9 +2219,7 @@ class KTRetriever:
     def _check_text_index_consistency(self):
         """Check if the loaded text index is consistent with current graph"""
         try:
-            indexed_nodes = set()
-            for nodes in self._node_text_index.values():
-                indexed_nodes.update(nodes)
+            indexed_nodes = set(self._node_text_index.node_ids)
             
             current_nodes = set(self.graph.nodes())
             missing_nodes = current_nodes - indexed_nodes
@@ -2273,8 +2228,9 @@ class KTRetriever:
                 return False
             
             extra_nodes = indexed_nodes - current_nodes
-            if len(extra_nodes) > len(current_nodes) * 0.1:  # Allow 10% tolerance
-                logger.warning(f"Text index has too many extra nodes: {len(extra_nodes)} extra vs {len(current_nodes)} current")
+            if extra_nodes:
+                # Ranked results must only contain live nodes
+                logger.warning(f"Text index has {len(extra_nodes)} nodes not in the current graph")
                 return False
             
             return True
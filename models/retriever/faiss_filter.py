@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import json
 import os
 import time
@@ -5,14 +7,16 @@ from collections import defaultdict
 from itertools import combinations
 from typing import Dict, List, Set, Tuple
 
-import faiss
 import networkx as nx
 import numpy as np
-import torch
-import torch.nn.functional as F
-from sentence_transformers import SentenceTransformer
 
+from utils.lazy_import import lazy_import
 from utils.logger import logger
+from utils.vocabulary import Vocabulary, relation_vocabulary
+
+faiss = lazy_import("faiss")
+torch = lazy_import("torch")
+F = lazy_import("torch.nn.functional")
 
 class DualFAISSRetriever:
     def __init__(self, dataset, graph: nx.MultiDiGraph, model_name: str = "all-MiniLM-L6-v2", cache_dir: str = "retriever/faiss_cache_new", device: str = None):
@@ -21,6 +25,8 @@ class DualFAISSRetriever:
         :param model_name: embedding model
         :param cache_dir: cache directory for FAISS indices
         """
+        from sentence_transformers import SentenceTransformer
+
         self.graph = graph
         self.model = SentenceTransformer(model_name)
         self.cache_dir = cache_dir
@@ -54,6 +60,8 @@ class DualFAISSRetriever:
         # Initialize map attributes to prevent AttributeError
         self.node_map = {}
         self.relation_map = {}
+        # FAISS row id of the relation index -> relation; relation_map is its on-disk form
+        self.relation_vocab = Vocabulary()
         self.triple_map = {}
         self.comm_map = {}
         
@@ -974,9 +982,8 @@ class DualFAISSRetriever:
         
     def _build_relation_index(self):
         """Build FAISS index for all relations and cache embeddings"""
-        relations = sorted(list({
-            data['relation'] for _, _, data in self.graph.edges(data=True) if 'relation' in data
-        }))
+        self.relation_vocab = relation_vocabulary(self.graph)
+        relations = self.relation_vocab.values
                 
         embeddings = self.model.encode(relations, convert_to_tensor=True)
 
@@ -1084,6 +1091,7 @@ class DualFAISSRetriever:
             self.relation_index = faiss.read_index(relation_path)
             with open(f"{self.cache_dir}/{self.dataset}/relation_map.json", 'r') as f:
                 self.relation_map = json.load(f)
+            self.relation_vocab = Vocabulary(self.relation_map[str(i)] for i in range(len(self.relation_map)))
         
         if os.path.exists(triple_path):
             self.triple_index = faiss.read_index(triple_path)
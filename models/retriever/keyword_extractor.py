@@ -0,0 +1,426 @@
+"""
+Query keyword extraction for KTRetriever.
+
+All extractors share the same interface (extract, entities_and_key_terms):
+- FastKeywordExtractor: regex tokenizer + stopwords + a gazetteer of graph node
+  names matched with Aho-Corasick. Sub-millisecond per query (default).
+- SpacyKeywordExtractor: NER + POS tagging with a spaCy pipeline. The model is
+  loaded on first use and shared process-wide.
+- SimpleKeywordExtractor: tokenizer + stopwords only, no graph or model needed.
+
+Chinese text has no spaces: keyword candidates split CJK runs at common
+function words (CHINESE_STOPWORDS), except inside gazetteer names and common
+words that contain one (目的, 是非), and gazetteer matches next to CJK
+characters count as whole words.
+
+create_keyword_extractor wraps the chosen extractor in a per-query LRU cache,
+since the same question and sub-questions are extracted repeatedly.
+"""
+
+import re
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.logger import logger
+
+__all__ = [
+    "ENGLISH_STOPWORDS",
+    "CHINESE_KEEP_WORDS",
+    "CHINESE_STOPWORDS",
+    "AhoCorasickMatcher",
+    "CachedKeywordExtractor",
+    "FastKeywordExtractor",
+    "SimpleKeywordExtractor",
+    "SpacyKeywordExtractor",
+    "collect_gazetteer_names",
+    "create_keyword_extractor",
+    "load_spacy_model",
+    "segment_cjk",
+    "tokenize",
+]
+
+ENGLISH_STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further had has
+have having he her here hers herself him himself his how i if in into is it its itself just me more
+most my myself no nor not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom whose why will
+with would you your yours yourself yourselves may might must shall yet ever also many much
+""".split())
+
+# Question words, particles and conjunctions
+CHINESE_STOPWORDS = frozenset("""
+的 吗 呢 吧 啊 是 和 与 什么 哪些 哪个 哪里 如何 怎么 怎样 为什么 多少 是否 可以 能否 这个 那个 这些 那些
+以及 还是 或者 但是 可是 于是 就是 只是 关于 通过 进行 一个 一些 我们 你们 他们 它们 请问 有哪些 有什么
+之间 其中 主要
+""".split())
+
+# Words containing a single-character stopword; matched before the stopwords so they stay whole
+CHINESE_KEEP_WORDS = frozenset("""
+目的 标的 的士 是非 实事求是 吗啡 酒吧 网吧 吧台 呢绒 和平 和谐 总和 温和 缓和 柔和 饱和 中和 调和 参与 给与
+""".split())
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9\-'_.]*[A-Za-z0-9]|[A-Za-z0-9]|[一-鿿]+")
+
+
+def _cjk_segment_pattern(names: Iterable[str] = ()) -> "re.Pattern":
+    """Names, words to keep, then stopwords, each longest first; the leftmost match wins"""
+    def alternatives(words):
+        return "|".join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+    groups = [("keep", CHINESE_KEEP_WORDS), ("stop", CHINESE_STOPWORDS)]
+    if names:
+        groups.insert(0, ("name", names))
+    return re.compile("|".join(f"(?P<{group}>{alternatives(words)})" for group, words in groups))
+
+
+_CJK_SEGMENT_PATTERN = _cjk_segment_pattern()
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into word tokens (latin words/numbers, runs of CJK characters)"""
+    return _TOKEN_PATTERN.findall(text)
+
+
+def _is_cjk(char: str) -> bool:
+    return "一" <= char <= "鿿"
+
+
+def segment_cjk(token: str, names: Iterable[str] = ()) -> List[str]:
+    """
+    Split a run of CJK characters at Chinese stopwords; other tokens are returned as-is
+
+    CHINESE_KEEP_WORDS are never split, and `names` (e.g. gazetteer matches)
+    become pieces of their own.
+    """
+    if not token or not _is_cjk(token[0]):
+        return [token]
+    names = [name for name in names if name and _is_cjk(name[0])]
+    pattern = _cjk_segment_pattern(names) if names else _CJK_SEGMENT_PATTERN
+    pieces, start = [], 0
+    for match in pattern.finditer(token):
+        if match.lastgroup == "stop":
+            pieces.append(token[start:match.start()])
+        elif match.lastgroup == "name":
+            pieces.extend([token[start:match.start()], match.group()])
+        else:
+            continue
+        start = match.end()
+    pieces.append(token[start:])
+    return [piece for piece in pieces if piece]
+
+
+_spacy_models: Dict[str, object] = {}
+_spacy_lock = threading.Lock()
+
+
+def load_spacy_model(model_name: str = "en_core_web_lg"):
+    """Load a spaCy pipeline once per process and return the shared instance"""
+    nlp = _spacy_models.get(model_name)
+    if nlp is None:
+        with _spacy_lock:
+            nlp = _spacy_models.get(model_name)
+            if nlp is None:
+                import spacy
+
+                logger.info(f"Loading spaCy model {model_name}...")
+                nlp = spacy.load(model_name)
+                _spacy_models[model_name] = nlp
+    return nlp
+
+
+class SpacyKeywordExtractor:
+    """Keyword extraction with spaCy NER and POS tagging"""
+
+    name = "spacy"
+
+    def __init__(self, model_name: str = "en_core_web_lg"):
+        self.model_name = model_name
+
+    @property
+    def nlp(self):
+        return load_spacy_model(self.model_name)
+
+    def extract(self, question: str) -> List[str]:
+        doc = self.nlp(question.lower())
+        keywords = []
+
+        for token in doc:
+            if (not token.is_stop and len(token.text) > 2):
+                if token.ent_type_:
+                    keywords.append(token.text.lower())
+                elif token.pos_ in ['NOUN', 'PROPN', 'ADJ']:
+                    keywords.append(token.text.lower())
+                elif token.pos_ == 'VERB':
+                    keywords.append(token.text.lower())
+
+        for ent in doc.ents:
+            if len(ent.text) > 2:
+                keywords.append(ent.text.lower())
+
+        return list(set(keywords))
+
+    def entities_and_key_terms(self, question: str, max_terms: int = 5):
+        doc = self.nlp(question)
+        entities = [ent.text for ent in doc.ents]
+
+        key_phrases = []
+        for token in doc:
+            if token.pos_ in ['NOUN', 'PROPN', 'VERB', 'ADJ'] and not token.is_stop:
+                key_phrases.append(token.text)
+                if len(key_phrases) >= max_terms:
+                    break
+        return entities, key_phrases
+
+
+class SimpleKeywordExtractor:
+    """Model-free keyword extraction: tokenize, lowercase, drop stopwords and short tokens"""
+
+    name = "simple"
+
+    def __init__(self, stopwords=ENGLISH_STOPWORDS, min_length: int = 3):
+        self.stopwords = stopwords
+        self.min_length = min_length
+
+    def _whole_words(self, question: str) -> List[str]:
+        """Names found in the question, kept whole by segment_cjk"""
+        return []
+
+    def _content_tokens(self, question: str) -> List[str]:
+        names = self._whole_words(question)
+        # Two CJK characters already make a word
+        return [
+            token for raw_token in tokenize(question) for token in segment_cjk(raw_token, names)
+            if len(token) >= (2 if _is_cjk(token[0]) else self.min_length) and token.lower() not in self.stopwords
+        ]
+
+    def extract(self, question: str) -> List[str]:
+        return list({token.lower() for token in self._content_tokens(question)})
+
+    def entities_and_key_terms(self, question: str, max_terms: int = 5):
+        raw_tokens = tokenize(question)
+        # Capitalized content words after the first word are the closest cheap proxy for named entities
+        entities = [
+            token for token in raw_tokens[1:]
+            if token[0].isupper() and token.lower() not in self.stopwords
+        ]
+        return entities, self._content_tokens(question)[:max_terms]
+
+
+class AhoCorasickMatcher:
+    """
+    Pure-Python Aho-Corasick automaton over lowercased text.
+
+    Finds every occurrence of every pattern in a single pass over the text,
+    independent of the number of patterns. Only whole-word matches are reported.
+    """
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        self._patterns: List[str] = []
+        self._built = False
+        for pattern in patterns:
+            self.add(pattern)
+        self.build()
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def add(self, pattern: str) -> None:
+        pattern = pattern.lower()
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(len(self._patterns))
+        self._patterns.append(pattern)
+        self._built = False
+
+    def build(self) -> None:
+        """Compute failure links breadth-first"""
+        queue = deque()
+        for next_state in self._goto[0].values():
+            self._fail[next_state] = 0
+            queue.append(next_state)
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield (start, end, pattern) for whole-word matches in `text` (case-insensitive)"""
+        if not self._built:
+            self.build()
+        text = text.lower()
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern_id in self._output[state]:
+                pattern = self._patterns[pattern_id]
+                start, end = index - len(pattern) + 1, index + 1
+                if _is_word_boundary(text, start - 1, start) and _is_word_boundary(text, end, end - 1):
+                    yield start, end, pattern
+
+
+def _is_word_boundary(text: str, index: int, inner: int) -> bool:
+    """Whether a match whose edge character is text[inner] may end next to text[index]"""
+    if index < 0 or index >= len(text):
+        return True
+    char = text[index]
+    # CJK text has no spaces, so a CJK character on either side of the edge separates words
+    return not char.isalnum() or _is_cjk(char) or _is_cjk(text[inner])
+
+
+def collect_gazetteer_names(graph, max_words: int = 6, max_chars: int = 64) -> List[str]:
+    """Collect entity-like node names from a graph for the gazetteer"""
+    names = set()
+    for _, data in graph.nodes(data=True):
+        properties = data.get("properties") if isinstance(data.get("properties"), dict) else data
+        name = properties.get("name", "")
+        if isinstance(name, list):
+            name = ", ".join(str(item) for item in name)
+        if not isinstance(name, str):
+            continue
+        name = name.strip().lower()
+        if len(name) < 2 or len(name) > max_chars or len(name.split()) > max_words:
+            continue
+        if name in ENGLISH_STOPWORDS:
+            continue
+        names.add(name)
+    return sorted(names)
+
+
+class FastKeywordExtractor(SimpleKeywordExtractor):
+    """
+    Tokenizer + stopwords, plus whole-phrase matches against graph node names.
+
+    The gazetteer recovers entity names that token filtering would break up or
+    drop (multi-word names, names containing stopwords, short acronyms).
+    """
+
+    name = "fast"
+
+    def __init__(self, graph=None, names: Optional[Iterable[str]] = None,
+                 stopwords=ENGLISH_STOPWORDS, min_length: int = 3):
+        super().__init__(stopwords=stopwords, min_length=min_length)
+        self._graph = graph
+        self._names = names
+        self._matcher: Optional[AhoCorasickMatcher] = None
+        self._matcher_lock = threading.Lock()
+
+    @property
+    def matcher(self) -> AhoCorasickMatcher:
+        """Gazetteer automaton, built on first use from the graph node names"""
+        if self._matcher is None:
+            with self._matcher_lock:
+                if self._matcher is None:
+                    names = self._names
+                    if names is None:
+                        names = collect_gazetteer_names(self._graph) if self._graph is not None else []
+                    self._matcher = AhoCorasickMatcher(names)
+                    logger.info(f"Built keyword gazetteer with {len(self._matcher)} node names")
+        return self._matcher
+
+    def gazetteer_matches(self, question: str) -> List[Tuple[int, int, str]]:
+        """Longest non-overlapping gazetteer matches, left to right"""
+        matches = sorted(self.matcher.iter_matches(question), key=lambda m: (m[0], -(m[1] - m[0])))
+        selected = []
+        last_end = -1
+        for start, end, pattern in matches:
+            if start >= last_end:
+                selected.append((start, end, pattern))
+                last_end = end
+        return selected
+
+    def _whole_words(self, question: str) -> List[str]:
+        return [phrase for _, _, phrase in self.gazetteer_matches(question)]
+
+    def extract(self, question: str) -> List[str]:
+        keywords = set(super().extract(question))
+        for _, _, phrase in self.gazetteer_matches(question):
+            keywords.add(phrase)
+            keywords.update(
+                word for word in phrase.split()
+                if len(word) >= self.min_length and word not in self.stopwords
+            )
+        return sorted(keywords)
+
+    def entities_and_key_terms(self, question: str, max_terms: int = 5):
+        entities = [question[start:end] for start, end, _ in self.gazetteer_matches(question)]
+        if not entities:
+            entities, _ = super().entities_and_key_terms(question, max_terms)
+        return entities, self._content_tokens(question)[:max_terms]
+
+
+class CachedKeywordExtractor:
+    """Memoize an extractor per query string (thread-safe LRU)"""
+
+    def __init__(self, extractor, maxsize: int = 1024):
+        self.extractor = extractor
+        self._extract = lru_cache(maxsize=maxsize)(lambda q: tuple(extractor.extract(q)))
+        self._entities_and_key_terms = lru_cache(maxsize=maxsize)(
+            lambda q, n: tuple(map(tuple, extractor.entities_and_key_terms(q, max_terms=n)))
+        )
+
+    @property
+    def name(self) -> str:
+        return self.extractor.name
+
+    def extract(self, question: str) -> List[str]:
+        return list(self._extract(question))
+
+    def entities_and_key_terms(self, question: str, max_terms: int = 5):
+        entities, key_terms = self._entities_and_key_terms(question, max_terms)
+        return list(entities), list(key_terms)
+
+    def cache_info(self):
+        return self._extract.cache_info()
+
+    def cache_clear(self) -> None:
+        self._extract.cache_clear()
+        self._entities_and_key_terms.cache_clear()
+
+
+def create_keyword_extractor(kind: str = "fast", spacy_model: str = "en_core_web_lg",
+                             graph=None, cache_size: int = 1024):
+    """
+    Build the keyword extractor selected by `retrieval.keyword_extractor`.
+
+    Args:
+        kind: "fast", "spacy" or "simple"
+        spacy_model: spaCy pipeline name used by the spacy extractor
+        graph: Knowledge graph whose node names feed the fast extractor's gazetteer
+        cache_size: Number of queries memoized; 0 disables caching
+    """
+    if kind == "simple":
+        extractor = SimpleKeywordExtractor()
+    elif kind == "spacy":
+        extractor = SpacyKeywordExtractor(spacy_model)
+    else:
+        if kind != "fast":
+            logger.warning(f"Unknown keyword extractor '{kind}', falling back to fast")
+        extractor = FastKeywordExtractor(graph=graph)
+
+    if cache_size and cache_size > 0:
+        return CachedKeywordExtractor(extractor, maxsize=cache_size)
+    return extractor
@@ -25,6 +25,8 @@ from config import ConfigManager, get_config
 from models.constructor.kt_gen import KTBuilder
 from utils import graph_processor
 from utils import call_llm_api
+from utils import union_find
+from utils import vocabulary
 from utils.logger import logger
 
 
@@ -43,6 +45,11 @@ class OfflineSemanticDeduper(KTBuilder):
         self.llm_client = call_llm_api.LLMCompletionCall()
         self.all_chunks: Dict[str, str] = {}
         self._semantic_dedup_embedder = None
+        self._prepare_cache = None
+        self.entity_resolver = union_find.EntityUnionFind()
+        self.graph_snapshot = None
+        self.relation_vocab = vocabulary.Vocabulary()
+        self.label_vocab = vocabulary.Vocabulary()
         self.preloaded_keyword_clusters = None  # For loading keyword dedup cluster results
         self.preloaded_edge_clusters = None  # For loading edge dedup cluster results
 
@@ -52,6 +59,8 @@ class OfflineSemanticDeduper(KTBuilder):
     _deduplicate_keyword_nodes = KTBuilder._deduplicate_keyword_nodes
     _semantic_dedup_enabled = KTBuilder._semantic_dedup_enabled
     deduplicate_heads = KTBuilder.deduplicate_heads  # Head entity deduplication
+    load_entity_resolver = KTBuilder.load_entity_resolver
+    save_entity_resolver = KTBuilder.save_entity_resolver
     
     def load_keyword_cluster_results(self, cluster_file: Path) -> None:
         """Load previously saved keyword clustering results from intermediate results file."""
@@ -166,9 +175,9 @@ def _build_keyword_mapping(graph: nx.MultiDiGraph) -> Dict[str, str]:
 
 def _parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Offline semantic deduplication for Youtu-GraphRAG graphs")
-    parser.add_argument("--graph", required=True, type=Path, help="Path to the input graph JSON file")
+    parser.add_argument("--graph", required=True, type=Path, help="Path to the input graph file (.json or compact .npz)")
     parser.add_argument("--chunks", required=True, type=Path, help="Path to the chunk file or directory")
-    parser.add_argument("--output", required=True, type=Path, help="Where to save the deduplicated graph JSON")
+    parser.add_argument("--output", required=True, type=Path, help="Where to save the deduplicated graph (.json or compact .npz)")
     parser.add_argument(
         "--config",
         type=Path,
@@ -215,7 +224,8 @@ def main() -> None:
         logger.info("Edge cluster results loaded. Will skip edge clustering phase and only run semantic dedup.")
 
     logger.info("Loading graph from %s", args.graph)
-    deduper.graph = graph_processor.load_graph_from_json(str(args.graph))
+    deduper.graph = graph_processor.load_graph(str(args.graph))
+    deduper.load_entity_resolver(str(args.graph))
 
     logger.info("Loading chunk contexts from %s", args.chunks)
     deduper.all_chunks = _load_chunk_mapping(args.chunks)
@@ -273,7 +283,8 @@ def main() -> None:
     )
 
     args.output.parent.mkdir(parents=True, exist_ok=True)
-    graph_processor.save_graph_to_json(deduper.graph, str(args.output))
+    graph_processor.save_graph(deduper.graph, str(args.output))
+    deduper.save_entity_resolver(str(args.output))
     logger.info("Deduplicated graph written to %s", args.output)
 
 
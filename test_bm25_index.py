@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for models/retriever/bm25_index.py
+
+Checks BM25 ranking against a brute-force scorer, deterministic tie-breaking
+and the .npz round trip.
+"""
+
+import os
+import random
+import tempfile
+
+from models.retriever.bm25_index import BM25Index, index_terms
+
+
+def brute_force_bm25(index: BM25Index, keywords, top_k: int):
+    terms = {term for keyword in keywords for term in index_terms(keyword)}
+    scores = {}
+    for term_id, term in enumerate(index.terms):
+        if term not in terms:
+            continue
+        docs, term_scores, _ = index._term_scores(term_id)
+        for doc, score in zip(docs, term_scores):
+            scores[doc] = scores.get(doc, 0.0) + float(score)
+    ranked = sorted(((index.node_ids[doc], score) for doc, score in scores.items()), key=lambda x: (-x[1], x[0]))
+    return ranked[:top_k]
+
+
+def test_ranking_prefers_rare_and_repeated_terms():
+    index = BM25Index.build({
+        "entity_0": "Magic angle effect in MRI imaging",
+        "entity_1": "MRI scanner MRI coil MRI sequence",
+        "entity_2": "Prolonged TE value reduces magic angle artifacts",
+        "entity_3": "Patient positioning",
+    })
+
+    ranked = [node for node, _ in index.search(["magic angle"], top_k=10)]
+    assert set(ranked) == {"entity_0", "entity_2"}
+
+    ranked = [node for node, _ in index.search(["mri"], top_k=10)]
+    assert ranked[0] == "entity_1"
+    assert index.search(["unknown"], top_k=10) == []
+    return True
+
+
+def test_matches_brute_force_with_early_termination():
+    rng = random.Random(7)
+    vocabulary = [f"term{i}" for i in range(400)]
+    node_texts = {
+        f"node_{i}": " ".join(rng.choice(vocabulary[:20] if rng.random() < 0.4 else vocabulary)
+                              for _ in range(rng.randint(2, 15)))
+        for i in range(3000)
+    }
+    index = BM25Index.build(node_texts)
+    keywords = ["term1", "term250 term399", "term3", "term77"]
+
+    for top_k in (1, 10, 50):
+        fast = index.search(keywords, top_k=top_k)
+        expected = brute_force_bm25(index, keywords, top_k)
+        assert [node for node, _ in fast] == [node for node, _ in expected]
+        assert all(abs(a[1] - b[1]) < 1e-4 for a, b in zip(fast, expected))
+    return True
+
+
+def test_ties_are_deterministic():
+    index = BM25Index.build({"b": "apple", "a": "apple", "c": "apple"})
+    assert [node for node, _ in index.search(["apple"], top_k=2)] == ["a", "b"]
+    return True
+
+
+def test_save_and_load_round_trip():
+    index = BM25Index.build({"entity_0": "Barack Obama", "entity_1": "Honolulu Hawaii", "entity_2": ""})
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "node_text_index.npz")
+        index.save(path)
+        loaded = BM25Index.load(path)
+
+    assert loaded.node_ids == index.node_ids
+    assert loaded.terms == index.terms
+    assert loaded.search(["obama"], top_k=5) == index.search(["obama"], top_k=5)
+    assert BM25Index.load(os.path.join(tmpdir, "missing.npz")) is None
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("ranking", test_ranking_prefers_rare_and_repeated_terms()),
+        ("matches brute force", test_matches_brute_force_with_early_termination()),
+        ("deterministic ties", test_ties_are_deterministic()),
+        ("save/load round trip", test_save_and_load_round_trip()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
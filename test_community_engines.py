@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script for the community detection engines in utils/tree_comm.py
+
+Checks that the louvain and minibatch_kmeans engines recover planted
+communities from node embeddings and graph structure, that the sparse
+similarity graph combines kNN semantic and structural edges, and that the
+sparse top-k refinement similarity matches the dense computation.
+"""
+
+import networkx as nx
+import numpy as np
+
+from utils.tree_comm import FastTreeComm, jaccard_top_k, louvain_partition, similarity_graph
+
+
+def make_tree_comm(engine, n_topics=4, per_topic=12):
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(n_topics, 16))
+    graph = nx.MultiDiGraph()
+    embeddings = {}
+    for topic in range(n_topics):
+        members = [f"entity_{topic * per_topic + index}" for index in range(per_topic)]
+        for node in members:
+            graph.add_node(node, label="entity", level=2, properties={"name": node})
+            embeddings[node] = centers[topic] + 0.1 * rng.normal(size=16)
+        for head, tail in zip(members, members[1:]):
+            graph.add_edge(head, tail, relation="related_to")
+
+    tree_comm = object.__new__(FastTreeComm)
+    tree_comm.graph = graph
+    tree_comm.node_list = list(graph.nodes())
+    tree_comm.semantic_cache = embeddings
+    tree_comm.struct_weight = 0.3
+    tree_comm.community_engine = engine
+    tree_comm.louvain_resolution = 1.0
+    tree_comm.community_knn_k = 5
+    tree_comm.community_knn_threshold = 0.5
+    tree_comm.sim_top_k = 20
+    tree_comm.degree_cache = {node: graph.degree(node) for node in tree_comm.node_list}
+    tree_comm.adjacency_sparse = tree_comm._build_sparse_adjacency()
+    return tree_comm
+
+
+def topics_of(communities, per_topic=12):
+    return sorted(sorted({int(node.split("_")[1]) // per_topic for node in members}) for members in communities.values())
+
+
+def test_similarity_graph():
+    embeddings = np.array([[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]])
+    adjacency = np.zeros((3, 3))
+    adjacency[0, 2] = 1
+    weights = similarity_graph(embeddings, adjacency, struct_weight=0.3, knn_k=1, knn_threshold=0.5).toarray()
+
+    assert np.allclose(weights, weights.T)
+    # Nodes 0 and 1 are semantic neighbours, 0 and 2 are only linked in the graph
+    assert np.isclose(weights[0, 1], 0.7 * 0.9 / np.linalg.norm([0.9, 0.1]), atol=1e-5)
+    assert np.isclose(weights[0, 2], 0.3)
+    assert weights[1, 2] == 0 and np.all(np.diag(weights) == 0)
+    return True
+
+
+def test_louvain_partition_isolated_nodes():
+    weights = similarity_graph(np.eye(3), np.zeros((3, 3)), knn_k=2, knn_threshold=0.5)
+    assert louvain_partition(weights) == [[0], [1], [2]]
+    return True
+
+
+def dense_sim_matrix(tree_comm, level_nodes):
+    """The combined similarity as computed before it was sparse"""
+    embeddings = np.array([tree_comm.semantic_cache[node] for node in level_nodes])
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    adjacency = tree_comm._level_adjacency(level_nodes).toarray()
+    intersection = adjacency @ adjacency.T
+    degrees = adjacency.sum(axis=1)
+    jaccard = intersection / (degrees[:, None] + degrees - intersection + 1e-9)
+    return tree_comm.struct_weight * jaccard + (1 - tree_comm.struct_weight) * embeddings @ embeddings.T
+
+
+def test_sparse_sim_matrix():
+    tree_comm = make_tree_comm("kmeans", n_topics=3, per_topic=6)
+    level_nodes = list(tree_comm.graph.nodes())
+    dense = dense_sim_matrix(tree_comm, level_nodes)
+    np.fill_diagonal(dense, 0)
+
+    # With top_k covering every node the sparse matrix is the dense one
+    full = tree_comm._compute_sim_matrix(level_nodes, top_k=len(level_nodes)).toarray()
+    assert np.allclose(full, dense, atol=1e-5)
+
+    # Each node keeps at least its top_k most similar nodes (the matrix is symmetrized)
+    top = tree_comm._compute_sim_matrix(level_nodes, top_k=3).toarray()
+    assert np.allclose(top, top.T)
+    for row in range(len(level_nodes)):
+        best = np.argsort(-dense[row])[:3]
+        assert np.allclose(top[row, best], dense[row, best], atol=1e-5)
+    assert np.count_nonzero(top) < np.count_nonzero(full)
+    return True
+
+
+def test_jaccard_top_k_blocks():
+    rng = np.random.default_rng(1)
+    adjacency = (rng.random((30, 30)) < 0.2).astype(float)
+    one_block = jaccard_top_k(adjacency, 4)
+    many_blocks = jaccard_top_k(adjacency, 4, block_rows=7)
+    assert all(np.array_equal(a, b) for a, b in zip(one_block, many_blocks))
+    assert np.all(np.bincount(one_block[0], minlength=30) <= 4)
+    return True
+
+
+def test_engines_recover_topics():
+    for engine in ("louvain", "minibatch_kmeans", "kmeans"):
+        tree_comm = make_tree_comm(engine)
+        level_nodes = list(tree_comm.graph.nodes())
+        communities = tree_comm.detect_communities(level_nodes)
+
+        assert sorted(node for members in communities.values() for node in members) == sorted(level_nodes)
+        # No community mixes topics
+        assert all(len(topics) == 1 for topics in topics_of(communities)), engine
+    assert sorted(map(tuple, topics_of(make_tree_comm("louvain").detect_communities(level_nodes)))) == [
+        (0,), (1,), (2,), (3,)
+    ]
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("similarity graph", test_similarity_graph()),
+        ("louvain partition isolated nodes", test_louvain_partition_isolated_nodes()),
+        ("sparse sim matrix", test_sparse_sim_matrix()),
+        ("jaccard top-k blocks", test_jaccard_top_k_blocks()),
+        ("engines recover topics", test_engines_recover_topics()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script for community naming in utils/tree_comm.py
+
+Checks that FastTreeComm.create_super_nodes packs communities into prompts
+by size and token budget, names tiny communities without the LLM, reuses
+names cached by member set, and falls back when a batch fails.
+"""
+
+import json
+import os
+import re
+import tempfile
+import threading
+
+import networkx as nx
+
+from utils.tree_comm import FastTreeComm
+
+
+class RecordingLLMClient:
+    """Answers naming prompts with "<center> group" and records every prompt"""
+
+    def __init__(self, fail_ids=()):
+        self.prompts = []
+        self.fail_ids = set(fail_ids)
+        self.lock = threading.Lock()
+
+    def call_api(self, content):
+        with self.lock:
+            self.prompts.append(content)
+        batch = json.loads(re.search(r"Communities data: (\[.*\])", content).group(1))
+        if any(info["id"] in self.fail_ids for info in batch):
+            raise RuntimeError("LLM unavailable")
+        return json.dumps([{"id": info["id"], "name": f"{info['center']} group", "summary": "s"} for info in batch])
+
+
+def make_tree_comm(llm_client, cache_path, **naming):
+    graph = nx.MultiDiGraph()
+    for index in range(40):
+        graph.add_node(f"entity_{index}", label="entity", level=2, properties={"name": f"E{index}"})
+    tree_comm = object.__new__(FastTreeComm)
+    tree_comm.graph = graph
+    tree_comm.node_names = {node: data["properties"]["name"] for node, data in graph.nodes(data=True)}
+    tree_comm.llm_client = llm_client
+    tree_comm.naming_max_workers = naming.get("max_workers", 4)
+    tree_comm.naming_token_budget = naming.get("token_budget", 10000)
+    tree_comm.naming_max_batch_size = naming.get("max_batch_size", 3)
+    tree_comm.naming_min_llm_size = naming.get("min_llm_size", 3)
+    tree_comm.naming_cache_path = cache_path
+    return tree_comm
+
+
+def make_communities():
+    # Sizes 3, 3, 4, 4, 5, 2, 2 (members of at most 5 use the first member as center)
+    sizes = [3, 3, 4, 4, 5, 2, 2]
+    communities, start = {}, 0
+    for comm_id, size in enumerate(sizes):
+        communities[comm_id] = [f"entity_{index}" for index in range(start, start + size)]
+        start += size
+    return communities
+
+
+def community_names(graph):
+    return {node: data["properties"]["name"] for node, data in graph.nodes(data=True) if data.get("label") == "community"}
+
+
+def test_batches_fallback_and_cache():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_path = os.path.join(tmp_dir, "community_names.json")
+        client = RecordingLLMClient()
+        tree_comm = make_tree_comm(client, cache_path)
+        super_nodes = tree_comm.create_super_nodes(make_communities())
+
+        names = community_names(tree_comm.graph)
+        assert len(super_nodes) == 7
+        # 5 communities of >= 3 members in batches of at most 3; the two pairs skip the LLM
+        assert len(client.prompts) == 2
+        assert names["comm_4_0"] == "E0 group"
+        assert names["comm_4_5"] == "E19"
+        assert tree_comm.graph.nodes["comm_4_5"]["properties"]["description"] == "Community of 2 members: E19, E20"
+        assert tree_comm.graph.has_edge("entity_19", "comm_4_5")
+
+        # A second run with the same member sets is served from the cache
+        client = RecordingLLMClient()
+        tree_comm = make_tree_comm(client, cache_path)
+        tree_comm.create_super_nodes(make_communities())
+        assert client.prompts == []
+        assert community_names(tree_comm.graph) == names
+    return True
+
+
+def test_token_budget_and_failed_batches():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = RecordingLLMClient(fail_ids={0})
+        tree_comm = make_tree_comm(client, os.path.join(tmp_dir, "names.json"), token_budget=1, max_batch_size=10)
+        tree_comm.create_super_nodes(make_communities())
+        names = community_names(tree_comm.graph)
+
+    # A budget smaller than one community still sends one community per prompt
+    assert len(client.prompts) == 5
+    # The failed community falls back to its center member's name
+    assert names["comm_4_0"] == "E0"
+    assert names["comm_4_1"] == "E3 group"
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("batches, fallback and cache", test_batches_fallback_and_cache()),
+        ("token budget and failed batches", test_token_budget_and_failed_batches()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test script for utils/embedding_store.py
+
+Checks that embeddings are keyed by text content, encoded once in batches
+of the configured size, reloaded from disk by a new store with memory-mapped
+vectors, that shards are compacted (including the older npz format), that
+open_store releases stores nobody holds, and that FastTreeComm reads triple
+embeddings through the store.
+"""
+
+import gc
+import os
+import tempfile
+
+import networkx as nx
+import numpy as np
+
+from utils import embedding_store
+from utils.embedding_store import CachedEncoder, EmbeddingStore, open_store, text_key
+from utils.tree_comm import FastTreeComm
+
+
+class CountingModel:
+    """Deterministic 4-d embeddings; records the texts of every encode call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.calls.append(list(texts))
+        return np.array([[len(text), text.count("a"), text.count("b"), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_encode_once_in_batches():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model = CountingModel()
+        store = EmbeddingStore(tmp_dir, "demo/model")
+        texts = ["a", "ab", "a", "abb", "b", "bb", "ab"]
+        embeddings = store.encode(texts, model.encode, batch_size=2)
+
+        assert embeddings.shape == (7, 4)
+        assert np.array_equal(embeddings[0], embeddings[2]) and np.array_equal(embeddings[1], embeddings[6])
+        # 5 unique texts in batches of at most 2
+        assert [len(call) for call in model.calls] == [2, 2, 1]
+
+        store.encode(["ab", "abb"], model.encode)
+        assert len(model.calls) == 3
+        store.encode(["ab", "aab"], model.encode)
+        assert model.calls[-1] == ["aab"]
+        # Two flushes, each a keys file and a vectors file
+        assert len(os.listdir(os.path.join(tmp_dir, "demo_model"))) == 4
+    return True
+
+
+def test_store_persists_across_runs():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        first = CountingModel()
+        expected = CachedEncoder(first, EmbeddingStore(tmp_dir, "m"), batch_size=8).encode(["x", "ya", "zab"])
+
+        second = CountingModel()
+        encoder = CachedEncoder(second, EmbeddingStore(tmp_dir, "m"))
+        assert np.array_equal(encoder.encode(["zab", "x", "ya"]), expected[[2, 0, 1]])
+        assert second.calls == []
+
+        normalized = encoder.encode(["zab"], normalize_embeddings=True)
+        assert np.isclose(np.linalg.norm(normalized[0]), 1.0)
+        assert encoder.encode("x").shape == (4,)
+
+        # Other models have their own vectors
+        assert len(EmbeddingStore(tmp_dir, "other")) == 0
+    return True
+
+
+def test_vectors_are_memory_mapped():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        EmbeddingStore(tmp_dir, "m").encode(["x", "ya"], CountingModel().encode)
+        store = EmbeddingStore(tmp_dir, "m")
+        assert all(isinstance(shard.vectors, np.memmap) for shard in store._shards)
+        assert np.array_equal(store.get("ya"), [2, 1, 0, 1]) and store.get("zz") is None
+    return True
+
+
+def test_compaction():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model = CountingModel()
+        store = EmbeddingStore(tmp_dir, "m", max_shards=3)
+        texts = ["a" * length + "b" * count for length in range(1, 6) for count in range(3)]
+        for text in texts:
+            store.encode([text], model.encode)
+            assert len(store._shards) <= 3
+        expected = model.encode(texts)
+
+        reloaded = EmbeddingStore(tmp_dir, "m", max_shards=3)
+        assert len(reloaded) == len(texts)
+        assert np.array_equal(reloaded.encode(texts, model.encode), expected)
+        assert len(model.calls) == len(texts) + 1
+        assert len(os.listdir(os.path.join(tmp_dir, "m"))) == 2 * len(reloaded._shards)
+    return True
+
+
+def test_legacy_npz_shards():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.makedirs(os.path.join(tmp_dir, "m"))
+        vectors = CountingModel().encode(["b", "a"])
+        np.savez(os.path.join(tmp_dir, "m", "shard_000000.npz"),
+                 keys=np.array([text_key("b"), text_key("a")], dtype="S16"), vectors=vectors)
+
+        store = EmbeddingStore(tmp_dir, "m")
+        assert np.array_equal(store.get("a"), vectors[1]) and np.array_equal(store.get("b"), vectors[0])
+        # Rewritten in the current format
+        assert sorted(os.listdir(os.path.join(tmp_dir, "m"))) == ["shard_000001.keys.npy", "shard_000001.vectors.npy"]
+    return True
+
+
+def test_open_store_releases_unused_stores():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = open_store(tmp_dir, "m")
+        assert open_store(tmp_dir, "m") is store
+        del store
+        gc.collect()
+        assert (os.path.abspath(tmp_dir), "m") not in embedding_store._stores
+    return True
+
+
+def test_tree_comm_uses_store():
+    graph = nx.MultiDiGraph()
+    graph.add_node("entity_1", properties={"name": "MRI"})
+    graph.add_node("entity_2", properties={"name": "CT"})
+    graph.add_edge("entity_1", "entity_2", relation="related_to")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        embeddings = []
+        for _ in range(2):
+            tree_comm = object.__new__(FastTreeComm)
+            tree_comm.graph = graph
+            tree_comm.model = CountingModel()
+            tree_comm.node_names = {"entity_1": "MRI", "entity_2": "CT"}
+            tree_comm.triple_strings_cache = {"entity_1": ["MRI related_to CT"], "entity_2": []}
+            tree_comm.semantic_cache = {}
+            tree_comm.embedding_batch_size = 1
+            tree_comm.embedding_store = EmbeddingStore(tmp_dir, "all-MiniLM-L6-v2")
+            embeddings.append(tree_comm.get_triple_embeddings_batch(["entity_1", "entity_2"]))
+
+            if len(embeddings) == 1:
+                assert tree_comm.model.calls == [["MRI related_to CT"], ["CT"]]
+            else:
+                # The second run only reads the store
+                assert tree_comm.model.calls == []
+        assert np.array_equal(embeddings[0], embeddings[1])
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("encode once in batches", test_encode_once_in_batches()),
+        ("store persists across runs", test_store_persists_across_runs()),
+        ("vectors are memory-mapped", test_vectors_are_memory_mapped()),
+        ("compaction", test_compaction()),
+        ("legacy npz shards", test_legacy_npz_shards()),
+        ("open_store releases unused stores", test_open_store_releases_unused_stores()),
+        ("tree comm uses store", test_tree_comm_uses_store()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
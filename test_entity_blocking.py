@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test script for utils/entity_blocking.py
+
+Checks that near-duplicate names collide in LSH blocks, that type and
+block-size limits are respected, and that blocked scoring agrees with the
+exhaustive pair search.
+"""
+
+import numpy as np
+
+from utils.entity_blocking import BlockingEntity, EntityBlocker, char_ngrams
+from utils.similarity_search import top_scored_pairs
+
+
+def names_of(result, entities):
+    return {(entities[i].name, entities[j].name) for i, j in result.pairs()}
+
+
+def test_similar_names_share_a_block():
+    entities = [
+        BlockingEntity("entity_0", "New York City"),
+        BlockingEntity("entity_1", "new york  city"),
+        BlockingEntity("entity_2", "Barack Obama"),
+        BlockingEntity("entity_3", "Obama Barack"),
+        BlockingEntity("entity_4", "Microsoft"),
+        BlockingEntity("entity_5", ""),
+    ]
+    result = EntityBlocker(use_chunk_blocks=False).build(entities)
+
+    pairs = names_of(result, entities)
+    assert ("New York City", "new york  city") in pairs
+    assert ("Barack Obama", "Obama Barack") in pairs
+    assert not any("Microsoft" in pair or "" in pair for pair in pairs)
+    assert all(i < j for i, j in result.pairs())
+    return True
+
+
+def test_chunk_blocks_and_type_filter():
+    entities = [
+        BlockingEntity("entity_0", "Paris", "location", ("chunk_a",)),
+        BlockingEntity("entity_1", "City of Light", "location", ("chunk_a",)),
+        BlockingEntity("entity_2", "Paris Hilton", "person", ("chunk_a",)),
+        BlockingEntity("entity_3", "Seine", None, ("chunk_a", "chunk_a")),
+    ]
+    result = EntityBlocker().build(entities)
+
+    pairs = names_of(result, entities)
+    assert ("Paris", "City of Light") in pairs
+    # Known, different types never pair up; unknown types pair with anything
+    assert ("Paris", "Paris Hilton") not in pairs
+    assert ("Paris", "Seine") in pairs and ("Paris Hilton", "Seine") in pairs
+    assert result.stats["pairs_before_type_filter"] > result.stats["candidate_pairs"]
+    return True
+
+
+def test_oversized_blocks_are_skipped():
+    entities = [BlockingEntity(f"entity_{i}", f"unrelated name {i * 7919}", None, ("shared",)) for i in range(30)]
+    result = EntityBlocker(max_block_size=10, bands=8, num_perm=16).build(entities)
+
+    chunk_stats = result.stats["blocks"]["chunk"]
+    assert chunk_stats["oversized_skipped"] == 1
+    assert chunk_stats["comparisons"] == 0
+    assert len(result) < 30 * 29 // 2
+    return True
+
+
+def test_minhash_is_deterministic():
+    first, second = EntityBlocker(seed=1), EntityBlocker(seed=1)
+    assert np.array_equal(first.minhash("Albert Einstein"), second.minhash("Albert Einstein"))
+    assert first.minhash("   ") is None
+    assert char_ngrams("ab", 3) == ["#ab", "ab#"]
+
+    signatures, valid = first.minhash_batch(["Albert Einstein", "", "Einstein"])
+    assert valid.tolist() == [True, False, True]
+    assert np.array_equal(signatures[0], first.minhash("Albert Einstein"))
+    return True
+
+
+def test_blocked_scoring_matches_exhaustive_on_blocked_pairs():
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(12, 8))
+    left, right = np.triu_indices(12, k=1)
+    scored = top_scored_pairs(embeddings, left, right, threshold=-1.0, max_pairs=200)
+
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    expected = sorted(
+        ((i, j, float(normalized[i] @ normalized[j])) for i, j in zip(left.tolist(), right.tolist())),
+        key=lambda p: (-p[2], p[0], p[1])
+    )
+    assert [(i, j) for i, j, _ in scored] == [(i, j) for i, j, _ in expected]
+    assert top_scored_pairs(embeddings, [], [], threshold=0.0, max_pairs=10) == []
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("similar names share a block", test_similar_names_share_a_block()),
+        ("chunk blocks and type filter", test_chunk_blocks_and_type_filter()),
+        ("oversized blocks skipped", test_oversized_blocks_are_skipped()),
+        ("deterministic minhash", test_minhash_is_deterministic()),
+        ("blocked scoring", test_blocked_scoring_matches_exhaustive_on_blocked_pairs()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script for utils/graph_backend.py
+
+Checks that CompactGraph answers the networkx read API used by retrieval
+(nodes, edges, neighbors, in/out edges, get_edge_data, subgraph) exactly like
+a networkx MultiDiGraph built from the same data, that the KTRetriever and
+DualFAISSRetriever graph helpers give the same results on both backends, and
+that graph files load into either backend.
+"""
+
+import os
+import random
+import tempfile
+
+import networkx as nx
+
+from models.retriever.enhanced_kt_retriever import KTRetriever
+from models.retriever.faiss_filter import DualFAISSRetriever
+from utils import graph_processor
+from utils.graph_backend import CompactGraph, load_graph
+
+
+def make_graph(seed=1, node_count=40, edge_count=200):
+    rng = random.Random(seed)
+    graph = nx.MultiDiGraph()
+    for index in range(node_count):
+        properties = {"name": f"node {index}", "schema_type": rng.choice(["drug", "disease"])}
+        if index % 3:
+            properties["description"] = f"description {index}"
+        graph.add_node(f"entity_{index}", label=rng.choice(["entity", "attribute"]), level=rng.choice([1, 2]),
+                       properties=properties)
+    for _ in range(edge_count):
+        extra = {"source_chunks": [f"c{rng.randrange(5)}"]} if rng.random() < 0.2 else {}
+        graph.add_edge(f"entity_{rng.randrange(node_count)}", f"entity_{rng.randrange(node_count)}",
+                       relation=rng.choice(["treats", "causes", "has_attribute"]), **extra)
+    return graph
+
+
+def as_sorted(items):
+    return sorted(repr(item) for item in items)
+
+
+def test_matches_networkx_read_api():
+    graph = make_graph()
+    compact = CompactGraph.from_networkx(graph)
+
+    assert (compact.number_of_nodes(), compact.number_of_edges()) == (graph.number_of_nodes(), graph.number_of_edges())
+    assert list(compact.nodes(data=True)) == list(graph.nodes(data=True))
+    assert as_sorted(compact.edges(data=True, keys=True)) == as_sorted(graph.edges(data=True, keys=True))
+    for node in graph:
+        assert compact.nodes[node] == graph.nodes[node]
+        assert as_sorted(compact.out_edges(node, data=True, keys=True)) == as_sorted(graph.out_edges(node, data=True, keys=True))
+        assert as_sorted(compact.in_edges(node, data=True)) == as_sorted(graph.in_edges(node, data=True))
+        assert sorted(compact.neighbors(node)) == sorted(graph.neighbors(node))
+        assert sorted(compact.predecessors(node)) == sorted(graph.predecessors(node))
+        for other in list(graph)[:10]:
+            assert compact.get_edge_data(node, other) == graph.get_edge_data(node, other)
+
+    members = list(graph)[:12]
+    assert as_sorted(compact.subgraph(members).edges(data=True)) == as_sorted(graph.subgraph(members).edges(data=True))
+    assert "entity_0" in compact and "missing" not in compact and ["unhashable"] not in compact
+    return True
+
+
+def test_retriever_graph_helpers():
+    graph = make_graph(seed=3)
+    nodes = list(graph)
+    results = []
+    for backend_graph in (graph, CompactGraph.from_networkx(graph)):
+        kt_retriever = object.__new__(KTRetriever)
+        kt_retriever.graph = backend_graph
+        kt_retriever.top_k = 1000
+        faiss_retriever = object.__new__(DualFAISSRetriever)
+        faiss_retriever.graph = backend_graph
+        faiss_retriever.node_id_to_embedding = {node: index for index, node in enumerate(nodes)}
+
+        results.append((
+            [kt_retriever._get_node_name(node) for node in nodes + ["missing"]],
+            kt_retriever._get_one_hop_triples_from_nodes(nodes[:5]),
+            kt_retriever._filter_nodes_by_schema_type(["drug"]),
+            sorted(kt_retriever._get_relation_matched_triples(nodes[:5], ["treats", "causes"])),
+            sorted(kt_retriever._optimized_neighbor_expansion(nodes[:3], None)),
+            [sorted(faiss_retriever._collect_neighbor_triples(node)) for node in nodes[:5]],
+            [faiss_retriever._get_node_text(node) for node in nodes],
+        ))
+    assert results[0] == results[1]
+    assert results[0][0][-1] == "missing"
+    return True
+
+
+def test_append_after_queries():
+    compact = CompactGraph()
+    compact.add_node("a", label="entity", properties={"name": "A"})
+    compact.add_edge("a", "b", relation="r")
+    assert list(compact.neighbors("a")) == ["b"]
+    # b was created by the edge without attributes; re-adding sets them
+    assert compact.nodes["b"] == {}
+    compact.add_node("b", label="entity", level=2, properties={"name": "B", "extra": 1}, embedding=[0.1])
+    compact.add_edge("b", "c", relation="r")
+    compact.add_edge("a", "b", relation="r", weight=2)
+
+    assert compact.nodes["b"] == {"label": "entity", "level": 2, "properties": {"name": "B", "extra": 1}, "embedding": [0.1]}
+    assert compact.get_edge_data("a", "b") == {0: {"relation": "r"}, 1: {"relation": "r", "weight": 2}}
+    assert list(compact.in_edges("c")) == [("b", "c")]
+    assert compact.out_degree("a") == 2 and compact.in_degree("b") == 2
+    return True
+
+
+def test_load_into_either_backend():
+    graph = make_graph(seed=2)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in ("graph.json", "graph.npz"):
+            path = os.path.join(tmp_dir, name)
+            graph_processor.save_graph(graph, path)
+            from_networkx = load_graph(path, "networkx")
+            from_compact = load_graph(path, "compact")
+            assert isinstance(from_compact, CompactGraph)
+            assert list(from_compact.nodes(data=True)) == list(from_networkx.nodes(data=True)), name
+            assert as_sorted(from_compact.edges(data=True)) == as_sorted(from_networkx.edges(data=True)), name
+
+        try:
+            load_graph(os.path.join(tmp_dir, "graph.json"), "igraph")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Unknown backend accepted")
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("matches networkx read API", test_matches_networkx_read_api()),
+        ("retriever graph helpers", test_retriever_graph_helpers()),
+        ("append after queries", test_append_after_queries()),
+        ("load into either backend", test_load_into_either_backend()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
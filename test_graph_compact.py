@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test script for the compact graph format in utils/graph_processor.py
+
+Checks that a graph survives a save/load round trip with node ids and edge
+attributes intact, that converting legacy JSON gives the same graph as
+loading the JSON, and that the compact file is much smaller.
+"""
+
+import json
+import os
+import tempfile
+
+import networkx as nx
+
+from utils import graph_processor
+
+
+def edge_set(graph):
+    return sorted(
+        (u, v, json.dumps(data, sort_keys=True, ensure_ascii=False)) for u, v, data in graph.edges(data=True)
+    )
+
+
+def make_graph():
+    graph = nx.MultiDiGraph()
+    graph.add_node("entity_1", label="entity", level=2, properties={"name": "MRI", "chunk id": "c1"})
+    graph.add_node("entity_2", label="entity", level=2,
+                   properties={"name": "磁共振", "node_role": "alias", "alias_of": "entity_1"})
+    graph.add_node("attribute_3", label="attribute", level=1, properties={"name": "field: 1.5T"})
+    graph.add_node("community_4", label="community", level=4, properties={"name": "Imaging", "members": ["entity_1"]},
+                   embedding_id=7)
+    graph.add_edge("entity_1", "attribute_3", relation="has_attribute")
+    graph.add_edge("entity_1", "entity_2", relation="别名包括", source_chunks=["c1", "c2"])
+    graph.add_edge("entity_1", "entity_2", relation="related_to")
+    graph.add_edge("entity_1", "community_4", relation="member_of")
+    return graph
+
+
+def test_round_trip_keeps_ids_and_attributes():
+    graph = make_graph()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "graphs", "demo.npz")
+        graph_processor.save_graph(graph, path)
+        loaded = graph_processor.load_graph(path)
+
+        assert list(loaded.nodes(data=True)) == list(graph.nodes(data=True))
+        assert edge_set(loaded) == edge_set(graph)
+
+        # An edge without a relation comes back with relation None
+        graph.add_edge("entity_2", "entity_2")
+        graph_processor.save_graph(graph, path)
+        loaded = graph_processor.load_graph(path)
+    assert loaded.get_edge_data("entity_2", "entity_2")[0] == {"relation": None}
+    return True
+
+
+def test_convert_legacy_json():
+    graph = make_graph()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, "demo.json")
+        npz_path = os.path.join(tmp_dir, "demo.npz")
+        graph_processor.save_graph_to_json(graph, json_path)
+        from_json = graph_processor.load_graph_from_json(json_path)
+        converted = graph_processor.convert_json_to_compact(json_path, npz_path)
+        from_npz = graph_processor.load_graph_compact(npz_path)
+
+    assert list(from_npz.nodes(data=True)) == list(from_json.nodes(data=True))
+    assert edge_set(from_npz) == edge_set(from_json) == edge_set(converted)
+    return True
+
+
+def test_compact_file_is_smaller():
+    graph = nx.MultiDiGraph()
+    description = "a fairly long description that the JSON format repeats on every edge " * 3
+    for index in range(300):
+        graph.add_node(f"entity_{index}", label="entity", level=2,
+                       properties={"name": f"entity {index}", "description": description})
+    for index in range(300):
+        for offset in (1, 2, 3, 5, 8):
+            graph.add_edge(f"entity_{index}", f"entity_{(index + offset) % 300}", relation="related_to")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, "demo.json")
+        npz_path = os.path.join(tmp_dir, "demo.npz")
+        graph_processor.save_graph(graph, json_path)
+        graph_processor.save_graph(graph, npz_path)
+        assert os.path.getsize(npz_path) * 10 < os.path.getsize(json_path)
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("round trip keeps ids and attributes", test_round_trip_keeps_ids_and_attributes()),
+        ("convert legacy JSON", test_convert_legacy_json()),
+        ("compact file is smaller", test_compact_file_is_smaller()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test script for streaming JSON graph I/O in utils/graph_processor.py
+
+Checks that the streamed writer produces exactly what json.dump(indent=2)
+used to, and that the incremental reader returns the same records as
+json.load even when records span many read chunks.
+"""
+
+import io
+import json
+import os
+import tempfile
+
+import networkx as nx
+
+from utils import graph_processor
+
+
+def make_graph():
+    graph = nx.MultiDiGraph()
+    graph.add_node("entity_1", label="entity", level=2,
+                   properties={"name": "MRI", "description": "line one\nline two, \"quoted\" ]"})
+    graph.add_node("entity_2", label="entity", level=2, properties={"name": "磁共振", "score": 0.25})
+    graph.add_node("attribute_3", label="attribute", level=1, properties={"name": "field: [1.5T]", "count": 3})
+    graph.add_edge("entity_1", "entity_2", relation="别名包括")
+    graph.add_edge("entity_1", "attribute_3", relation="has_attribute")
+    graph.add_edge("entity_2", "attribute_3", relation="has_attribute")
+    return graph
+
+
+def test_streamed_writer_matches_json_dump():
+    graph = make_graph()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "graph.json")
+        for current in (graph, nx.MultiDiGraph()):
+            graph_processor.save_graph_to_json(current, path)
+            with open(path, encoding="utf-8") as f:
+                written = f.read()
+            expected = json.dumps(list(graph_processor.iter_relationships(current)), ensure_ascii=False, indent=2)
+            assert written == expected
+    return True
+
+
+def test_incremental_reader_matches_json_load():
+    records = list(graph_processor.iter_relationships(make_graph()))
+    text = json.dumps(records, ensure_ascii=False, indent=2)
+    for chunk_size in (1, 7, 64, 1 << 20):
+        parsed = list(graph_processor._iter_json_array_stdlib(io.StringIO(text), chunk_size=chunk_size))
+        assert parsed == records
+    # Numbers cut at a chunk boundary are not yielded early
+    assert list(graph_processor._iter_json_array_stdlib(io.StringIO("[12345, 6]"), chunk_size=3)) == [12345, 6]
+    assert list(graph_processor._iter_json_array_stdlib(io.StringIO(" [ ] "), chunk_size=2)) == []
+
+    for broken in ('{"a": 1}', '[{"a": 1}', ""):
+        try:
+            list(graph_processor._iter_json_array_stdlib(io.StringIO(broken), chunk_size=4))
+        except ValueError:
+            continue
+        raise AssertionError(f"Accepted malformed input {broken!r}")
+    return True
+
+
+def test_load_after_streamed_save():
+    graph = make_graph()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "graph.json")
+        graph_processor.save_graph_to_json(graph, path)
+        loaded = graph_processor.load_graph_from_json(path)
+
+    assert sorted(data["properties"]["name"] for _, data in loaded.nodes(data=True)) == ["MRI", "field: [1.5T]", "磁共振"]
+    assert loaded.number_of_edges() == 3
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("streamed writer matches json.dump", test_streamed_writer_matches_json_dump()),
+        ("incremental reader matches json.load", test_incremental_reader_matches_json_load()),
+        ("load after streamed save", test_load_after_streamed_save()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
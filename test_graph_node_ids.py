@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for node id persistence in utils/graph_processor.py
+
+Checks that construction-time node ids survive JSON and compact save/load
+round trips (including after nodes are removed), and that older JSON files
+without ids still load with ids derived from (label, name).
+"""
+
+import json
+import os
+import tempfile
+
+import networkx as nx
+
+from utils import graph_processor
+
+
+def make_graph():
+    graph = nx.MultiDiGraph()
+    graph.add_node("entity_5", label="entity", level=2, properties={"name": "MRI"})
+    graph.add_node("entity_9", label="entity", level=2, properties={"name": "CT"})
+    # Same label and name as entity_5 but a distinct node
+    graph.add_node("entity_12", label="entity", level=2, properties={"name": "MRI"})
+    graph.add_node("attr_6", label="attribute", level=1, properties={"name": "field: 1.5T"})
+    graph.add_node("comm_4_0", label="community", level=4, properties={"name": "Imaging"})
+    graph.add_node("kw_0_scanner", label="keyword", level=3, properties={"name": "scanner"})
+    graph.add_edge("entity_5", "attr_6", relation="has_attribute")
+    graph.add_edge("entity_5", "entity_9", relation="related_to")
+    graph.add_edge("entity_12", "entity_9", relation="related_to")
+    graph.add_edge("entity_5", "comm_4_0", relation="member_of")
+    graph.add_edge("kw_0_scanner", "comm_4_0", relation="keyword_of")
+    return graph
+
+
+def test_ids_survive_round_trips():
+    graph = make_graph()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in ("graph.json", "graph.npz"):
+            path = os.path.join(tmp_dir, name)
+            graph_processor.save_graph(graph, path)
+            loaded = graph_processor.load_graph(path)
+            assert set(loaded.nodes()) == set(graph.nodes()), name
+            assert sorted(loaded.edges()) == sorted(graph.edges()), name
+
+        # Removing a node does not shift the ids of the others
+        graph.remove_node("attr_6")
+        path = os.path.join(tmp_dir, "graph.json")
+        graph_processor.save_graph(graph, path)
+        loaded = graph_processor.load_graph(path)
+    assert set(loaded.nodes()) == {"entity_5", "entity_9", "entity_12", "comm_4_0", "kw_0_scanner"}
+    return True
+
+
+def test_legacy_json_without_ids():
+    records = [
+        {
+            "start_node": {"label": "entity", "properties": {"name": "MRI"}},
+            "relation": "related_to",
+            "end_node": {"label": "entity", "properties": {"name": "CT"}},
+        },
+        {
+            "start_node": {"label": "entity", "properties": {"name": "MRI"}},
+            "relation": "has_attribute",
+            "end_node": {"label": "attribute", "properties": {"name": "field: 1.5T"}},
+        },
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "legacy.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(records, f)
+        loaded = graph_processor.load_graph_from_json(path)
+
+    assert sorted(loaded.nodes()) == ["attribute_2", "entity_0", "entity_1"]
+    assert loaded.nodes["attribute_2"]["level"] == 1
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("ids survive round trips", test_ids_survive_round_trips()),
+        ("legacy JSON without ids", test_legacy_json_without_ids()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
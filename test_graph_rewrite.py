@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script for utils/graph_rewrite.py
+
+Checks that bulk rewriting remaps endpoints, merges identical triples with
+their source chunks, drops self-loops created by the merge, and adds alias
+edges for replaced nodes.
+"""
+
+import networkx as nx
+
+from utils.graph_rewrite import rewrite_edges
+
+
+def triples(graph):
+    return sorted((u, data.get("relation"), v) for u, v, data in graph.edges(data=True))
+
+
+def make_graph():
+    graph = nx.MultiDiGraph()
+    graph.add_nodes_from(["A", "A2", "B", "C"])
+    graph.add_edge("A", "B", relation="treats", source_chunks=["c1"], weight=1)
+    graph.add_edge("A2", "B", relation="treats", source_chunks=["c2", "c1"], weight=2)
+    graph.add_edge("C", "A2", relation="causes", source_chunks=["c3"])
+    graph.add_edge("A2", "A", relation="related_to")
+    graph.add_edge("C", "C", relation="self")
+    return graph
+
+
+def test_remap_merge_and_drop_self_loops():
+    graph = make_graph()
+    stats = rewrite_edges(graph, {"A2": "A"})
+
+    assert triples(graph) == [("A", "treats", "B"), ("C", "causes", "A"), ("C", "self", "C")]
+    merged = next(data for _, _, data in graph.edges(data=True) if data["relation"] == "treats")
+    # The edge already at the representative keeps its data; chunks are merged
+    assert merged["weight"] == 1
+    assert merged["source_chunks"] == ["c1", "c2"]
+    assert stats == {
+        "edges_remapped": 3,
+        "edges_removed": 3,
+        "edges_added": 1,
+        "edges_merged": 1,
+        "self_loops_dropped": 1,
+        "alias_edges_added": 0,
+    }
+    # Nodes are left to the caller
+    assert "A2" in graph
+    return True
+
+
+def test_alias_edges_for_replaced_nodes():
+    graph = make_graph()
+    graph.add_edge("A", "A2", relation="等同于")
+    stats = rewrite_edges(graph, {"A2": "A"}, alias_relation="等同于", alias_relations=("别名包括",))
+
+    # The existing alias edge is kept and no second one is added
+    assert ("A", "等同于", "A2") in triples(graph)
+    assert sum(1 for _, _, data in graph.edges(data=True) if data["relation"] == "等同于") == 1
+    assert stats["alias_edges_added"] == 0
+
+    graph = make_graph()
+    stats = rewrite_edges(graph, {"A2": "A"}, alias_relation="等同于")
+    assert ("A", "等同于", "A2") in triples(graph)
+    assert stats["alias_edges_added"] == 1
+    return True
+
+
+def test_empty_mapping_keeps_graph():
+    graph = make_graph()
+    before = triples(graph)
+    stats = rewrite_edges(graph, {})
+    assert triples(graph) == before
+    assert stats["edges_remapped"] == 0
+
+    empty = nx.MultiDiGraph()
+    assert rewrite_edges(empty, {"x": "y"})["edges_remapped"] == 0
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("remap, merge and drop self-loops", test_remap_merge_and_drop_self_loops()),
+        ("alias edges for replaced nodes", test_alias_edges_for_replaced_nodes()),
+        ("empty mapping keeps graph", test_empty_mapping_keeps_graph()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test script for utils/graph_snapshot.py
+
+Checks that a snapshot keeps the sorted node ids and edge descriptors used
+in LLM cache keys and does not change when the live graph is modified.
+"""
+
+import json
+
+import networkx as nx
+
+from utils.graph_snapshot import GraphSnapshot
+
+
+def make_graph():
+    graph = nx.MultiDiGraph()
+    graph.add_node("entity_2", properties={"name": "磁共振"})
+    graph.add_node("entity_1", properties={"name": "MRI"})
+    graph.add_edge("entity_2", "entity_1", relation="等同于")
+    graph.add_edge("entity_1", "entity_2", relation="related_to")
+    return graph
+
+
+def test_snapshot_contents():
+    snapshot = GraphSnapshot.from_graph(make_graph())
+
+    assert (snapshot.node_count, snapshot.edge_count) == (2, 2)
+    assert json.loads(snapshot.nodes_json) == ["entity_1", "entity_2"]
+    assert json.loads(snapshot.edges_json) == [
+        "entity_1(MRI)-entity_2(磁共振)  -0",
+        "entity_2(磁共振)-entity_1(MRI)  -0",
+    ]
+    # Non-ASCII names are kept as-is, as in the cache key JSON
+    assert "磁共振" in snapshot.edges_json
+    return True
+
+
+def test_snapshot_is_frozen():
+    graph = make_graph()
+    snapshot = GraphSnapshot.from_graph(graph)
+    digest = snapshot.digest
+
+    graph.add_node("entity_3", properties={"name": "CT"})
+    graph.remove_edge("entity_1", "entity_2")
+
+    assert snapshot.node_count == 2 and snapshot.edge_count == 2
+    assert snapshot.digest == digest
+    assert GraphSnapshot.from_graph(graph).digest != digest
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("snapshot contents", test_snapshot_contents()),
+        ("snapshot is frozen", test_snapshot_is_frozen()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
@@ -50,8 +50,6 @@ def test_methods_exist():
         '_collect_node_context',
         '_parse_coreference_response',
         '_merge_head_nodes',
-        '_reassign_outgoing_edges',
-        '_reassign_incoming_edges',
         '_find_similar_edge',
         '_merge_edge_chunks',
         '_merge_node_properties',
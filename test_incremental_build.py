@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test script for incremental builds in models/constructor/kt_gen.py
+
+Saves a small graph and chunk file as an earlier build would, loads them
+into a builder, and checks that node ids continue after the saved ones and
+that only documents whose chunks were not saved are selected for extraction,
+including documents whose text spans several lines.
+"""
+
+import os
+import tempfile
+import threading
+
+import networkx as nx
+
+from models.constructor.kt_gen import KTBuilder
+from utils import graph_processor
+
+
+def make_builder(dataset_name, datasets_no_chunk=()):
+    builder = object.__new__(KTBuilder)
+    builder.graph = nx.MultiDiGraph()
+    builder.all_chunks = {}
+    builder.dataset_name = dataset_name
+    builder.datasets_no_chunk = list(datasets_no_chunk)
+    builder.node_counter = 0
+    builder.lock = threading.Lock()
+    return builder
+
+
+def test_load_previous_build():
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            os.makedirs("output/graphs")
+            os.makedirs("output/chunks")
+            graph = nx.MultiDiGraph()
+            graph.add_node("entity_3", label="entity", level=2, properties={"name": "MRI", "chunk id": "c1"})
+            graph.add_node("attr_7", label="attribute", level=1, properties={"name": "imaging"})
+            graph.add_node("comm_4_12", label="community", level=4, properties={"name": "Imaging"})
+            graph.add_edge("entity_3", "attr_7", relation="has_attribute")
+            graph.add_edge("entity_3", "comm_4_12", relation="member_of")
+            graph_processor.save_graph_to_json(graph, "output/graphs/demo_new.json")
+            with open("output/chunks/demo.txt", "w", encoding="utf-8") as f:
+                f.write("id: c1\tChunk: MRI is an imaging method\n")
+
+            builder = make_builder("demo")
+            builder.load_previous_build("output/graphs/demo_new.json")
+
+            assert sorted(builder.graph.nodes()) == ["attr_7", "comm_4_12", "entity_3"]
+            assert builder.graph.nodes["comm_4_12"]["level"] == 4
+            # Community ids do not take part in node_counter
+            assert builder.node_counter == 8
+            assert builder.all_chunks == {"c1": "MRI is an imaging method"}
+            new_documents = builder._new_documents(["MRI is an imaging method", "CT uses X-rays"])
+            assert new_documents == ["CT uses X-rays"]
+        finally:
+            os.chdir(cwd)
+    return True
+
+
+def test_multi_line_documents():
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            os.makedirs("output/graphs")
+            graph_processor.save_graph_to_json(nx.MultiDiGraph(), "output/graphs/hotpot_new.json")
+            document = {"title": "MRI", "text": "Line one.\nLine two."}
+            first = make_builder("hotpot", datasets_no_chunk=["hotpot"])
+            first.chunk_text(document)
+            first.save_chunks_to_file()
+
+            builder = make_builder("hotpot", datasets_no_chunk=["hotpot"])
+            builder.load_previous_build("output/graphs/hotpot_new.json")
+            # The chunk file only keeps the first line of the chunk
+            assert list(builder.all_chunks.values()) == ["MRI Line one."]
+            other = {"title": "MRI", "text": "Line one.\nLine three."}
+            assert builder._new_documents([document, other]) == [other]
+
+            # Saving again keeps the hash of the full text for the reloaded chunk
+            builder.save_chunks_to_file()
+            assert make_builder("hotpot", datasets_no_chunk=["hotpot"])._new_documents([document]) == []
+        finally:
+            os.chdir(cwd)
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("load previous build", test_load_previous_build()),
+        ("multi-line documents", test_multi_line_documents()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
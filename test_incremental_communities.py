@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test script for incremental community maintenance in utils/tree_comm.py
+
+Builds communities over three topics, then adds entities: one close to an
+existing community, a new topic, and enough entities of another topic to
+drift its size. Checks that only the new and re-clustered communities are
+named, and that the undrifted community keeps its name and gains a member.
+"""
+
+import json
+import re
+
+import networkx as nx
+import numpy as np
+
+from utils.tree_comm import FastTreeComm
+
+DIM = 16
+CENTERS = np.random.default_rng(0).normal(size=(5, DIM))
+
+
+class NamingClient:
+    """Names each community "<center> group" and records the community ids of every prompt"""
+
+    def __init__(self):
+        self.named = []
+
+    def call_api(self, content):
+        batch = json.loads(re.search(r"Communities data: (\[.*\])", content).group(1))
+        self.named.extend(info["id"] for info in batch)
+        return json.dumps([{"id": info["id"], "name": f"{info['center']} group", "summary": "s"} for info in batch])
+
+
+def add_topic_nodes(graph, embeddings, topic, count, rng):
+    start = len(level_nodes(graph))
+    for index in range(start, start + count):
+        node = f"entity_{index}"
+        graph.add_node(node, label="entity", level=2, properties={"name": f"T{topic}-{index}"})
+        embeddings[node] = CENTERS[topic] + 0.1 * rng.normal(size=DIM)
+        if index > start:
+            graph.add_edge(f"entity_{start}", node, relation="related_to")
+
+
+def make_tree_comm(graph, embeddings, client):
+    tree_comm = object.__new__(FastTreeComm)
+    tree_comm.graph = graph
+    tree_comm.node_list = list(graph.nodes())
+    tree_comm.node_names = {node: data["properties"]["name"] for node, data in graph.nodes(data=True)}
+    tree_comm.degree_cache = {node: graph.degree(node) for node in tree_comm.node_list}
+    tree_comm.semantic_cache = dict(embeddings)
+    tree_comm.struct_weight = 0.3
+    tree_comm.community_engine = "louvain"
+    tree_comm.louvain_resolution = 1.0
+    tree_comm.community_knn_k = 5
+    tree_comm.community_knn_threshold = 0.5
+    tree_comm.adjacency_sparse = tree_comm._build_sparse_adjacency()
+    tree_comm.llm_client = client
+    tree_comm.naming_max_workers = 2
+    tree_comm.naming_token_budget = 10000
+    tree_comm.naming_max_batch_size = 10
+    tree_comm.naming_min_llm_size = 3
+    tree_comm.naming_cache_path = ""
+    tree_comm.incremental_assign_threshold = 0.5
+    tree_comm.incremental_size_drift = 0.5
+    tree_comm.incremental_cohesion_drift = 0.1
+    return tree_comm
+
+
+def level_nodes(graph):
+    return [node for node, data in graph.nodes(data=True) if data["level"] == 2]
+
+
+def community_of(graph, node):
+    return [v for _, v, relation in graph.out_edges(node, data="relation") if relation == "member_of"]
+
+
+def test_incremental_update():
+    rng = np.random.default_rng(1)
+    graph, embeddings = nx.MultiDiGraph(), {}
+    for topic in range(3):
+        add_topic_nodes(graph, embeddings, topic, 6, rng)
+
+    tree_comm = make_tree_comm(graph, embeddings, NamingClient())
+    communities = tree_comm.detect_communities(level_nodes(graph))
+    tree_comm.create_super_nodes_with_keywords(communities)
+    tree_comm.record_community_stats(communities)
+    assert len(communities) == 3 and "entity_6" in communities[1]
+    topic0_comm = community_of(graph, "entity_0")[0]
+    topic0_name = graph.nodes[topic0_comm]["properties"]["name"]
+    assert graph.nodes[topic0_comm]["properties"]["clustered_size"] == 6
+
+    add_topic_nodes(graph, embeddings, 0, 1, rng)   # entity_18 joins topic 0
+    add_topic_nodes(graph, embeddings, 3, 4, rng)   # entity_19..22: a new topic
+    add_topic_nodes(graph, embeddings, 1, 4, rng)   # entity_23..26: topic 1 grows 6 -> 10
+    client = NamingClient()
+    tree_comm = make_tree_comm(graph, embeddings, client)
+    super_nodes, keyword_mapping = tree_comm.update_communities(level_nodes(graph))
+
+    # Topic 0 kept its community and name, topic 2 was untouched
+    assert community_of(graph, "entity_18") == [topic0_comm]
+    assert graph.nodes[topic0_comm]["properties"]["name"] == topic0_name
+    assert len(graph.nodes[topic0_comm]["properties"]["members"]) == 7
+    # Only the new topic and the re-clustered topic 1 were named, under fresh ids
+    rebuilt = sorted(f"comm_4_{comm_id}" for comm_id in client.named)
+    assert rebuilt == sorted(super_nodes) and all(int(comm_id) >= 3 for comm_id in client.named)
+    assert community_of(graph, "entity_19")[0] in rebuilt and community_of(graph, "entity_6")[0] in rebuilt
+    assert {keyword.split("_")[1] for keyword in keyword_mapping} == {str(comm_id) for comm_id in client.named}
+    assert "comm_4_1" not in graph and not any(node.startswith("kw_1_") for node in graph)
+
+    for node in level_nodes(graph):
+        assert len(community_of(graph, node)) == 1, node
+    assert community_of(graph, "entity_19") != community_of(graph, "entity_23")
+    return True
+
+
+def test_no_communities_yet():
+    graph, embeddings = nx.MultiDiGraph(), {}
+    add_topic_nodes(graph, embeddings, 0, 4, np.random.default_rng(2))
+    tree_comm = make_tree_comm(graph, embeddings, NamingClient())
+    assert tree_comm.update_communities(level_nodes(graph)) is None
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("incremental update", test_incremental_update()),
+        ("no communities yet", test_no_communities_yet()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
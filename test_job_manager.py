@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script for utils/job_manager.py
+
+Runs small in-process jobs to verify progress reporting, cancellation and
+persistence of job state across manager restarts, and that the backend's
+job manager honours construction.max_concurrent_jobs.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+from utils.job_manager import JobManager
+
+
+def wait_for(manager: JobManager, job_id: str, statuses, timeout: float = 5.0) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not reach {statuses}: {manager.get(job_id)}")
+
+
+def test_job_succeeds_with_progress():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = JobManager(jobs_dir=tmpdir)
+
+        def target(progress, cancel_event):
+            progress("extraction", 50, "half way")
+            return {"answer": 42}
+
+        job_id = manager.submit("construction", {"dataset_name": "demo"}, target)
+        job = wait_for(manager, job_id, ("succeeded",))
+
+        assert job["result"] == {"answer": 42}
+        assert job["progress"] == 100.0
+        assert job["stage"] == "extraction"
+
+        with open(os.path.join(tmpdir, f"{job_id}.json"), "r", encoding="utf-8") as f:
+            assert json.load(f)["status"] == "succeeded"
+        manager.shutdown(wait=True)
+    return True
+
+
+def test_job_failure_is_recorded():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = JobManager(jobs_dir=tmpdir)
+
+        def target(progress, cancel_event):
+            raise ValueError("bad corpus")
+
+        job_id = manager.submit("construction", {"dataset_name": "demo"}, target)
+        job = wait_for(manager, job_id, ("failed",))
+        assert "bad corpus" in job["error"]
+        manager.shutdown(wait=True)
+    return True
+
+
+def test_cancel_running_and_queued_jobs():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = JobManager(jobs_dir=tmpdir, max_concurrent_jobs=1)
+        started = threading.Event()
+
+        def slow_target(progress, cancel_event):
+            started.set()
+            while not cancel_event.is_set():
+                time.sleep(0.01)
+            raise RuntimeError("stopped")
+
+        running_id = manager.submit("construction", {"dataset_name": "a"}, slow_target)
+        queued_id = manager.submit("construction", {"dataset_name": "b"}, slow_target)
+        assert started.wait(5.0)
+
+        assert manager.find_active("construction", dataset_name="a")["job_id"] == running_id
+        assert manager.cancel(queued_id)
+        assert manager.get(queued_id)["status"] == "cancelled"
+
+        assert manager.cancel(running_id)
+        wait_for(manager, running_id, ("cancelled",))
+        assert not manager.cancel(running_id)
+        assert manager.find_active("construction", dataset_name="a") is None
+        manager.shutdown(wait=True)
+    return True
+
+
+def test_unfinished_jobs_are_interrupted_on_restart():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        record = {"job_id": "abc123", "kind": "construction", "params": {}, "status": "running",
+                  "stage": "extraction", "progress": 30.0, "created_at": "2025-01-01T00:00:00"}
+        with open(os.path.join(tmpdir, "abc123.json"), "w", encoding="utf-8") as f:
+            json.dump(record, f)
+
+        manager = JobManager(jobs_dir=tmpdir)
+        job = manager.get("abc123")
+        assert job["status"] == "interrupted"
+        assert [j["job_id"] for j in manager.list_jobs("construction")] == ["abc123"]
+        manager.shutdown(wait=True)
+    return True
+
+
+def test_backend_job_manager_reads_config():
+    import backend
+
+    # get_config is only bound when the GraphRAG components import
+    saved = backend.config, backend.job_manager, getattr(backend, "get_config", None)
+    requested = []
+
+    def fake_get_config(path=None):
+        requested.append(path)
+        return SimpleNamespace(construction=SimpleNamespace(max_concurrent_jobs=3))
+
+    try:
+        # No request has loaded the config yet when the first job is submitted
+        backend.config, backend.job_manager, backend.get_config = None, None, fake_get_config
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cwd = os.getcwd()
+            os.chdir(tmpdir)
+            try:
+                manager = backend.get_job_manager()
+            finally:
+                os.chdir(cwd)
+        assert requested == ["config/base_config.yaml"]
+        assert manager.max_concurrent_jobs == 3
+        assert backend.get_job_manager() is manager
+    finally:
+        backend.config, backend.job_manager, backend.get_config = saved
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("success with progress", test_job_succeeds_with_progress()),
+        ("failure recorded", test_job_failure_is_recorded()),
+        ("cancel running and queued", test_cancel_running_and_queued_jobs()),
+        ("interrupted on restart", test_unfinished_jobs_are_interrupted_on_restart()),
+        ("backend job manager reads config", test_backend_job_manager_reads_config()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test script for models/retriever/keyword_extractor.py and utils/lazy_import.py
+
+The simple extractor must work without spaCy, and lazily imported modules
+must not be loaded until first attribute access.
+"""
+
+import sys
+
+import networkx as nx
+
+from models.retriever.keyword_extractor import (
+    AhoCorasickMatcher,
+    FastKeywordExtractor,
+    SimpleKeywordExtractor,
+    create_keyword_extractor,
+    segment_cjk,
+)
+from utils.lazy_import import is_loaded, lazy_import
+
+
+def test_simple_extractor_drops_stopwords():
+    extractor = SimpleKeywordExtractor()
+    keywords = extractor.extract("Who is the director of the movie Inception?")
+
+    assert "director" in keywords
+    assert "movie" in keywords
+    assert "inception" in keywords
+    assert "the" not in keywords
+    assert "who" not in keywords
+    return True
+
+
+def test_simple_extractor_key_terms():
+    extractor = SimpleKeywordExtractor()
+    entities, key_terms = extractor.entities_and_key_terms("Where was Barack Obama born?", max_terms=2)
+
+    assert entities == ["Barack", "Obama"]
+    assert key_terms == ["Barack", "Obama"]
+    return True
+
+
+def test_aho_corasick_whole_word_matches():
+    matcher = AhoCorasickMatcher(["new york", "new york city", "york", "he", "uk"])
+    matches = list(matcher.iter_matches("ushers in New York City, the UK; yorkshire"))
+
+    assert (10, 18, "new york") in matches
+    assert (10, 23, "new york city") in matches
+    assert (29, 31, "uk") in matches
+    # "he" inside "ushers" and "york" inside "yorkshire" are not whole words
+    assert all(pattern != "he" for _, _, pattern in matches)
+    assert sum(1 for _, _, pattern in matches if pattern == "york") == 1
+    return True
+
+
+def test_fast_extractor_uses_gazetteer():
+    graph = nx.MultiDiGraph()
+    for i, name in enumerate(["Barack Obama", "The Lord of the Rings", "UK", "the"]):
+        graph.add_node(f"entity_{i}", label="entity", properties={"name": name})
+
+    extractor = FastKeywordExtractor(graph=graph)
+    question = "Did Barack Obama read The Lord of the Rings in the UK?"
+    keywords = extractor.extract(question)
+
+    assert "barack obama" in keywords
+    assert "the lord of the rings" in keywords
+    assert "uk" in keywords
+    assert "lord" in keywords
+    assert "the" not in keywords
+
+    entities, _ = extractor.entities_and_key_terms(question)
+    assert entities == ["Barack Obama", "The Lord of the Rings", "UK"]
+    return True
+
+
+def test_fast_extractor_chinese_questions():
+    graph = nx.MultiDiGraph()
+    for i, name in enumerate(["磁共振成像", "TE参数"]):
+        graph.add_node(f"entity_{i}", label="entity", properties={"name": name})
+    extractor = FastKeywordExtractor(graph=graph)
+
+    # Gazetteer names inside CJK text are whole words; CJK runs split at function words
+    assert extractor.extract("什么是磁共振成像的原理") == ["原理", "磁共振成像"]
+    assert extractor.entities_and_key_terms("什么是磁共振成像的原理")[0] == ["磁共振成像"]
+    assert extractor.extract("TE参数如何设置?") == ["te参数", "参数", "设置"]
+    assert extractor.entities_and_key_terms("TE参数如何设置?")[0] == ["TE参数"]
+    # Latin names still need a word boundary against latin letters
+    assert list(AhoCorasickMatcher(["te"]).iter_matches("tea参数")) == []
+
+    # Single-character function words do not split words that contain them
+    assert segment_cjk("磁共振成像的目的是什么") == ["磁共振成像", "目的"]
+    assert segment_cjk("检查的目的和是非判断") == ["检查", "目的", "是非判断"]
+    # Gazetteer names stay whole even when they contain a stopword
+    assert FastKeywordExtractor(names=["是否认证"]).extract("产品是否认证的流程") == ["产品", "是否认证", "流程"]
+    return True
+
+
+def test_cached_extractor_memoizes_per_query():
+    extractor = create_keyword_extractor("simple", cache_size=16)
+    first = extractor.extract("Who founded the Ming dynasty?")
+    first.append("mutated")
+    second = extractor.extract("Who founded the Ming dynasty?")
+
+    assert "mutated" not in second
+    assert extractor.cache_info().hits == 1
+    return True
+
+
+def test_factory_selects_extractor():
+    assert create_keyword_extractor().name == "fast"
+    assert create_keyword_extractor("simple").name == "simple"
+    # Building the spacy extractor must not load spaCy yet
+    assert create_keyword_extractor("spacy").name == "spacy"
+    assert "spacy" not in sys.modules
+    return True
+
+
+def test_lazy_import_defers_loading():
+    module = lazy_import("colorsys")
+    sys.modules.pop("colorsys", None)
+
+    assert not is_loaded(module)
+    assert module.rgb_to_hsv(1.0, 0.0, 0.0)[0] == 0.0
+    assert is_loaded(module)
+    assert "colorsys" in sys.modules
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("simple extractor drops stopwords", test_simple_extractor_drops_stopwords()),
+        ("simple extractor key terms", test_simple_extractor_key_terms()),
+        ("aho-corasick whole word matches", test_aho_corasick_whole_word_matches()),
+        ("fast extractor uses gazetteer", test_fast_extractor_uses_gazetteer()),
+        ("fast extractor chinese questions", test_fast_extractor_chinese_questions()),
+        ("cached extractor memoizes per query", test_cached_extractor_memoizes_per_query()),
+        ("factory selects extractor", test_factory_selects_extractor()),
+        ("lazy import defers loading", test_lazy_import_defers_loading()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
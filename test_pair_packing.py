@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test script for utils/pair_packing.py
+
+Checks that packing covers every pair exactly once, respects the pack limits
+and keeps pairs that share entities together.
+"""
+
+import random
+
+from utils.pair_packing import pack_pairs
+
+
+def pack_entities(pairs, pack):
+    return {entity for index in pack for entity in pairs[index]}
+
+
+def test_every_pair_packed_once_within_limits():
+    rng = random.Random(5)
+    pairs = [(f"entity_{rng.randrange(60)}", f"entity_{rng.randrange(60, 120)}") for _ in range(400)]
+    packs = pack_pairs(pairs, max_entities=8, max_pairs=12)
+
+    assert sorted(index for pack in packs for index in pack) == list(range(len(pairs)))
+    assert all(len(pack) <= 12 for pack in packs)
+    assert all(len(pack_entities(pairs, pack)) <= 8 for pack in packs)
+    return True
+
+
+def test_components_share_packs_and_never_mix():
+    pairs = [("a", "b"), ("x", "y"), ("b", "c"), ("a", "c"), ("y", "z")]
+    packs = pack_pairs(pairs, max_entities=8, max_pairs=12)
+
+    assert sorted(sorted(pack) for pack in packs) == [[0, 2, 3], [1, 4]]
+    return True
+
+
+def test_hub_entity_is_split_across_packs():
+    pairs = [("hub", f"entity_{i}") for i in range(20)]
+    packs = pack_pairs(pairs, max_entities=5, max_pairs=12)
+
+    # 4 neighbours per pack plus the hub itself
+    assert [len(pack) for pack in packs] == [4, 4, 4, 4, 4]
+    assert all("hub" in pack_entities(pairs, pack) for pack in packs)
+    # Far fewer entity contexts than one prompt per pair (2 per pair)
+    assert sum(len(pack_entities(pairs, pack)) for pack in packs) < 2 * len(pairs)
+    return True
+
+
+def test_edge_cases():
+    assert pack_pairs([]) == []
+    assert pack_pairs([("a", "b")], max_entities=1, max_pairs=0) == [[0]]
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("every pair packed once", test_every_pair_packed_once_within_limits()),
+        ("components kept together", test_components_share_packs_and_never_mix()),
+        ("hub split across packs", test_hub_entity_is_split_across_packs()),
+        ("edge cases", test_edge_cases()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
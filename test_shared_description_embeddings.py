@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared description embedding pass in models/constructor/kt_gen.py
+
+Checks that _embed_unique_descriptions encodes each distinct candidate
+description once across all dedup groups, and that every group clusters on
+the rows of its own descriptions.
+"""
+
+import threading
+from types import SimpleNamespace
+
+import networkx as nx
+import numpy as np
+
+from models.constructor.kt_gen import KTBuilder
+
+
+class CountingEmbedder:
+    """Deterministic 3-d embeddings; records the texts of every encode call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, normalize_embeddings=False, **kwargs):
+        self.calls.append(list(texts))
+        embeddings = np.array([[len(text), text.count("a"), 1.0] for text in texts], dtype=np.float32)
+        if normalize_embeddings:
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings
+
+
+def make_builder(embedder):
+    builder = object.__new__(KTBuilder)
+    builder.graph = nx.MultiDiGraph()
+    builder.lock = threading.Lock()
+    builder.config = SimpleNamespace(construction=SimpleNamespace(
+        semantic_dedup=SimpleNamespace(use_embeddings=True, clustering_backend="auto")
+    ))
+    builder._semantic_dedup_embedder = embedder
+    return builder
+
+
+def make_groups():
+    return [
+        {"candidate_descriptions": ["aa", "bbb", "aa"], "config_params": {"threshold": 0.99}},
+        {"candidate_descriptions": ["only"], "config_params": {"threshold": 0.99}},
+        {"candidate_descriptions": ["bbb", "cab"], "config_params": {"threshold": 0.99}},
+    ]
+
+
+def test_unique_descriptions_encoded_once():
+    embedder = CountingEmbedder()
+    rows, embeddings = make_builder(embedder)._embed_unique_descriptions(make_groups())
+
+    # One call over the distinct descriptions of multi-candidate groups, in first-seen order
+    assert embedder.calls == [["aa", "bbb", "cab"]]
+    assert rows == {"aa": 0, "bbb": 1, "cab": 2}
+    expected = CountingEmbedder().encode(["aa", "bbb", "cab"], normalize_embeddings=True)
+    assert np.allclose(embeddings, expected)
+    return True
+
+
+def test_groups_cluster_on_their_rows():
+    embedder = CountingEmbedder()
+    builder = make_builder(embedder)
+    seen = []
+
+    def record(descriptions, threshold, embeddings=None):
+        seen.append((list(descriptions), embeddings))
+        return [list(range(len(descriptions)))]
+
+    builder._cluster_candidate_tails = record
+    groups = make_groups()
+    builder._apply_embedding_clustering_to_groups(groups)
+
+    assert len(embedder.calls) == 1
+    reference = CountingEmbedder()
+    for (descriptions, embeddings), group in zip(seen, groups):
+        assert descriptions == group["candidate_descriptions"]
+        if len(descriptions) == 1:
+            # Single-candidate groups keep the per-group fallback
+            assert embeddings is None
+        else:
+            assert np.allclose(embeddings, reference.encode(descriptions, normalize_embeddings=True))
+        assert group["initial_clusters"] == [list(range(len(descriptions)))]
+
+    # Duplicate descriptions end up in the same cluster
+    groups = make_groups()
+    make_builder(CountingEmbedder())._apply_embedding_clustering_to_groups(groups)
+    assert sorted(map(sorted, groups[0]["initial_clusters"])) == [[0, 2], [1]]
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("unique descriptions encoded once", test_unique_descriptions_encoded_once()),
+        ("groups cluster on their rows", test_groups_cluster_on_their_rows()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
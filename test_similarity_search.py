@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test script for utils/similarity_search.py
+
+Compares the tiled candidate search with the dense N×N cosine matrix it
+replaces in head deduplication.
+"""
+
+import numpy as np
+
+from utils.similarity_search import iter_similar_pairs, normalize_rows, top_similar_pairs
+
+
+def dense_reference(embeddings, threshold, max_pairs):
+    matrix = normalize_rows(embeddings)
+    sims = matrix @ matrix.T
+    pairs = [
+        (i, j, float(sims[i, j]))
+        for i in range(len(matrix)) for j in range(i + 1, len(matrix))
+        if sims[i, j] >= threshold
+    ]
+    pairs.sort(key=lambda p: (-p[2], p[0], p[1]))
+    return pairs[:max_pairs]
+
+
+def make_clustered_embeddings(n_clusters=30, per_cluster=8, dim=16, seed=3):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    points = [center + 0.15 * rng.normal(size=(per_cluster, dim)) for center in centers]
+    return np.vstack(points)
+
+
+def test_matches_dense_reference():
+    embeddings = make_clustered_embeddings()
+    expected = dense_reference(embeddings, threshold=0.9, max_pairs=100)
+    # A tiny tile budget forces many tiles
+    result = top_similar_pairs(embeddings, threshold=0.9, max_pairs=100, use_faiss=False, tile_bytes=4096)
+
+    assert [(i, j) for i, j, _ in result] == [(i, j) for i, j, _ in expected]
+    assert all(abs(a[2] - b[2]) < 1e-5 for a, b in zip(result, expected))
+    return True
+
+
+def test_pairs_are_unique_and_ordered():
+    embeddings = make_clustered_embeddings(n_clusters=5, per_cluster=20)
+    pairs = list(iter_similar_pairs(embeddings, threshold=0.8, use_faiss=False, tile_bytes=2048))
+
+    assert all(i < j for i, j, _ in pairs)
+    assert len(pairs) == len({(i, j) for i, j, _ in pairs})
+    return True
+
+
+def test_edge_cases():
+    assert top_similar_pairs(np.zeros((1, 4)), threshold=0.5, max_pairs=10) == []
+    assert top_similar_pairs(np.eye(3), threshold=0.5, max_pairs=0) == []
+    # Orthogonal and zero vectors never clear a positive threshold
+    assert top_similar_pairs(np.vstack([np.eye(3), np.zeros((1, 3))]), threshold=0.1, max_pairs=10) == []
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("matches dense reference", test_matches_dense_reference()),
+        ("pairs unique and ordered", test_pairs_are_unique_and_ordered()),
+        ("edge cases", test_edge_cases()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
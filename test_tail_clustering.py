@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test script for utils/tail_clustering.py
+
+Checks that every clustering tier returns the same format and recovers
+well-separated groups, and that "auto" picks the exact or graph tier by size.
+"""
+
+import numpy as np
+
+from utils.tail_clustering import cluster_embeddings, knn_threshold_edges
+
+
+def make_groups(n_groups=6, per_group=5, dim=24, noise=0.05, seed=11):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_groups, dim))
+    points = np.vstack([center + noise * rng.normal(size=(per_group, dim)) for center in centers])
+    order = rng.permutation(len(points))
+    labels = np.repeat(np.arange(n_groups), per_group)[order]
+    return points[order], labels
+
+
+def as_partition(clusters):
+    return sorted(tuple(cluster) for cluster in clusters)
+
+
+def expected_partition(labels):
+    groups = {}
+    for idx, label in enumerate(labels.tolist()):
+        groups.setdefault(label, []).append(idx)
+    return sorted(tuple(members) for members in groups.values())
+
+
+def test_all_methods_recover_groups():
+    embeddings, labels = make_groups()
+    expected = expected_partition(labels)
+
+    for method in ("exact", "graph", "hdbscan"):
+        clusters = cluster_embeddings(embeddings, threshold=0.9, method=method, knn_k=4, use_faiss=False)
+        assert as_partition(clusters) == expected, method
+        # Same output format everywhere: sorted members, clusters ordered by first member
+        assert all(cluster == sorted(cluster) for cluster in clusters)
+        assert [cluster[0] for cluster in clusters] == sorted(cluster[0] for cluster in clusters)
+    return True
+
+
+def test_auto_switches_to_graph_for_large_groups():
+    embeddings, labels = make_groups(n_groups=40, per_group=50, dim=32)
+    clusters = cluster_embeddings(embeddings, threshold=0.9, method="auto", exact_max_size=100, use_faiss=False)
+
+    assert as_partition(clusters) == expected_partition(labels)
+    assert sum(len(cluster) for cluster in clusters) == len(embeddings)
+    return True
+
+
+def test_knn_edges_respect_threshold_and_k():
+    embeddings, _ = make_groups(n_groups=3, per_group=10)
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    rows, cols = knn_threshold_edges(normalized, threshold=0.9, k=3, use_faiss=False, tile_bytes=256)
+
+    assert np.all(rows != cols)
+    assert np.bincount(rows, minlength=len(normalized)).max() <= 3
+    assert np.all(np.einsum("ij,ij->i", normalized[rows], normalized[cols]) >= 0.9)
+    return True
+
+
+def test_edge_cases():
+    assert cluster_embeddings(np.zeros((0, 4)), threshold=0.9) == [[]]
+    assert cluster_embeddings(np.ones((1, 4)), threshold=0.9) == [[0]]
+    # Orthogonal vectors never merge
+    assert cluster_embeddings(np.eye(4), threshold=0.5, method="graph", use_faiss=False) == [[0], [1], [2], [3]]
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("all methods recover groups", test_all_methods_recover_groups()),
+        ("auto switches to graph", test_auto_switches_to_graph_for_large_groups()),
+        ("kNN edges respect threshold and k", test_knn_edges_respect_threshold_and_k()),
+        ("edge cases", test_edge_cases()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for utils/union_find.py
+
+Checks that merges are transitive with caller-chosen representatives, that
+the structure survives a save/load round trip and can keep merging, and that
+it can be rebuilt from alias_of node properties.
+"""
+
+import os
+import random
+import tempfile
+
+import networkx as nx
+
+from utils.union_find import EntityUnionFind, resolver_path_for_graph
+
+
+def test_canonical_side_keeps_representative():
+    resolver = EntityUnionFind()
+    assert resolver.union("entity_3", "entity_1") == "entity_1"
+    assert resolver.union("entity_1", "entity_7") == "entity_7"
+    # entity_9 joins the set through a member; the set's representative wins
+    assert resolver.union("entity_9", "entity_3") == "entity_7"
+
+    assert all(resolver.find(node) == "entity_7" for node in ("entity_1", "entity_3", "entity_9"))
+    assert resolver.find("entity_unknown") == "entity_unknown"
+    assert resolver.connected("entity_1", "entity_9")
+    assert not resolver.connected("entity_1", "entity_unknown")
+    assert resolver.mapping() == {"entity_3": "entity_7", "entity_1": "entity_7", "entity_9": "entity_7"}
+    assert {rep: sorted(group) for rep, group in resolver.groups().items()} == {
+        "entity_7": ["entity_1", "entity_3", "entity_7", "entity_9"]
+    }
+    return True
+
+
+def test_matches_naive_components():
+    rng = random.Random(3)
+    ids = [f"entity_{i}" for i in range(300)]
+    resolver = EntityUnionFind(ids)
+    labels = {node: node for node in ids}
+    for _ in range(250):
+        a, b = rng.sample(ids, 2)
+        resolver.union(a, b)
+        old, new = labels[a], labels[b]
+        for node in ids:
+            if labels[node] == old:
+                labels[node] = new
+
+    assert all(resolver.find(node) == labels[node] for node in ids)
+    return True
+
+
+def test_save_load_then_merge_incrementally():
+    resolver = EntityUnionFind()
+    resolver.union("entity_2", "entity_1")
+    resolver.union("entity_3", "entity_2")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = resolver_path_for_graph(os.path.join(tmp_dir, "demo_new.json"))
+        assert path.endswith("demo_new_entity_resolution.npz")
+        resolver.save(path)
+        loaded = EntityUnionFind.load(path)
+        assert EntityUnionFind.load(os.path.join(tmp_dir, "missing.npz")) is None
+
+    assert loaded.mapping() == resolver.mapping()
+    # New entities merge into existing sets without rebuilding them
+    loaded.union("entity_10", "entity_3")
+    assert loaded.find("entity_10") == "entity_1"
+    assert len(loaded) == 4
+    return True
+
+
+def test_from_alias_graph():
+    graph = nx.MultiDiGraph()
+    graph.add_node("entity_1", label="entity", properties={"name": "MRI", "node_role": "representative"})
+    graph.add_node("entity_2", label="entity", properties={"name": "磁共振", "node_role": "alias", "alias_of": "entity_1"})
+    graph.add_node("entity_3", label="entity", properties={"name": "CT"})
+    graph.add_node("keyword_1", label="keyword", properties={"name": "MRI"})
+
+    resolver = EntityUnionFind.from_alias_graph(graph)
+    assert resolver.mapping() == {"entity_2": "entity_1"}
+    assert resolver.find("entity_3") == "entity_3"
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("canonical side keeps representative", test_canonical_side_keeps_representative()),
+        ("matches naive components", test_matches_naive_components()),
+        ("save/load then merge incrementally", test_save_load_then_merge_incrementally()),
+        ("rebuild from alias graph", test_from_alias_graph()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Test script for utils/vocabulary.py
+
+Checks that values get stable first-seen codes, that interning returns one
+shared object per value, and that relation vocabularies built from networkx
+and compact graphs agree.
+"""
+
+import networkx as nx
+
+from utils.graph_backend import CompactGraph
+from utils.vocabulary import Vocabulary, relation_vocabulary
+
+
+def test_codes_and_interning():
+    vocab = Vocabulary(["treats", "causes"])
+    assert vocab.code("causes") == 1
+    assert vocab.code("has_attribute") == 2
+    assert vocab.get("unknown") is None and "unknown" not in vocab
+    assert vocab[2] == "has_attribute" and len(vocab) == 3
+    assert vocab.code(None) == 3 and vocab[3] is None
+
+    # Equal strings built separately collapse to one object
+    first = vocab.intern("".join(["tre", "ats"]))
+    second = vocab.intern("".join(["trea", "ts"]))
+    assert first is second is vocab[0]
+    # Unhashable values pass through unchanged and are not added
+    value = ["not", "a", "relation"]
+    assert vocab.intern(value) is value and len(vocab) == 4
+    return True
+
+
+def test_relation_vocabulary_from_graphs():
+    graph = nx.MultiDiGraph()
+    graph.add_edge("a", "b", relation="treats")
+    graph.add_edge("b", "c", relation="causes")
+    graph.add_edge("a", "c", relation="treats")
+    graph.add_edge("c", "a")
+
+    expected = ["causes", "treats"]
+    assert relation_vocabulary(graph).values == expected
+    assert relation_vocabulary(CompactGraph.from_networkx(graph)).values == expected
+    return True
+
+
+if __name__ == "__main__":
+    results = [
+        ("codes and interning", test_codes_and_interning()),
+        ("relation vocabulary from graphs", test_relation_vocabulary_from_graphs()),
+    ]
+    for name, result in results:
+        print(f"{'✅' if result else '❌'} {name}")
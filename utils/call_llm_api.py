@@ -4,7 +4,6 @@ import json
 import requests
 import re
 
-from openai import OpenAI
 from dotenv import load_dotenv
 
 from utils.logger import logger
@@ -30,6 +29,8 @@ class LLMCompletionCall:
         if not self.llm_api_key:
             raise ValueError("LLM API key not provided")
         
+        # openai is slow to import; defer it until a client is actually needed
+        from openai import OpenAI
         self.client = OpenAI(base_url=self.llm_base_url, api_key=self.llm_api_key)
         
         logger.debug(f"Initialized LLM client: model={self.llm_model}, base_url={self.llm_base_url}")
@@ -0,0 +1,316 @@
+"""
+Persistent embedding store keyed by text content.
+
+Encoding every node's triple text (Tree-Comm) or every candidate
+description (semantic dedup) is the slowest local step of a build, and the
+same texts come back on every rerun. The store maps sha256(text) to its
+vector, one directory per embedding model:
+
+    <root>/<model>/shard_000000.keys.npy      sorted S16 digests
+    <root>/<model>/shard_000000.vectors.npy   float32 rows in key order
+
+Only the keys are read into memory; vectors are memory-mapped and looked up
+by binary search over each shard's keys. New vectors are appended as a new
+shard on flush, so saving never rewrites what is already on disk, and once
+a model has more than max_shards shards they are compacted into one. Files
+are written to a temporary name and moved into place (keys last), so an
+interrupted run loses at most its unsaved vectors. Shards in the earlier
+single-file format (shard_000000.npz) are still read and are rewritten in
+the current format by the next compaction.
+
+CachedEncoder wraps a SentenceTransformer-like model so existing
+`encode(texts, normalize_embeddings=...)` callers read through the store
+and only encode the texts it does not hold, in batches of `batch_size`.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import weakref
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.logger import logger
+
+__all__ = ["EmbeddingStore", "CachedEncoder", "open_store", "text_key"]
+
+SHARD_PREFIX = "shard_"
+KEYS_SUFFIX = ".keys.npy"
+VECTORS_SUFFIX = ".vectors.npy"
+LEGACY_SUFFIX = ".npz"
+MAX_SHARDS = 8
+COMPACT_CHUNK_ROWS = 65536
+
+
+def text_key(text: str) -> bytes:
+    """16-byte content hash of `text`"""
+    return hashlib.sha256(text.encode("utf-8")).digest()[:16]
+
+
+def _model_dir_name(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", model_name).strip("_") or "default"
+
+
+def _shard_index(name: str) -> int:
+    return int(name[len(SHARD_PREFIX):len(SHARD_PREFIX) + 6])
+
+
+class _Shard:
+    """Sorted keys in memory, vectors memory-mapped (or in memory for legacy npz shards)"""
+
+    def __init__(self, name: str, keys: np.ndarray, vectors: np.ndarray):
+        order = np.argsort(keys, kind="stable")
+        if np.any(order != np.arange(len(order))):
+            keys, vectors = keys[order], np.asarray(vectors)[order]
+        self.name = name
+        self.keys = keys
+        self.vectors = vectors
+
+    def rows(self, keys: np.ndarray) -> np.ndarray:
+        """Row of each key in this shard, -1 where it is absent"""
+        if not len(self.keys):
+            return np.full(len(keys), -1)
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[positions] == keys, positions, -1)
+
+
+class EmbeddingStore:
+    """Text -> embedding vectors for one model, persisted as append-only, periodically compacted shards"""
+
+    def __init__(self, root: Optional[str], model_name: str, max_shards: int = MAX_SHARDS):
+        self.model_name = model_name
+        self.path = os.path.join(root, _model_dir_name(model_name)) if root else None
+        self.max_shards = max(1, int(max_shards))
+        self._shards: List[_Shard] = []
+        self._pending: Dict[bytes, np.ndarray] = {}
+        self._lock = threading.RLock()
+        if self.path:
+            self._load()
+
+    def _shard_names(self) -> List[str]:
+        """Shard names on disk, oldest first: "shard_000003.keys.npy" or legacy "shard_000001.npz" """
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            (name for name in os.listdir(self.path)
+             if name.startswith(SHARD_PREFIX) and name.endswith((KEYS_SUFFIX, LEGACY_SUFFIX))
+             and ".tmp" not in name),
+            key=_shard_index,
+        )
+
+    def _open_shard(self, name: str) -> _Shard:
+        path = os.path.join(self.path, name)
+        if name.endswith(LEGACY_SUFFIX):
+            with np.load(path) as data:
+                return _Shard(name, data["keys"], data["vectors"].astype(np.float32, copy=False))
+        vectors_path = path[:-len(KEYS_SUFFIX)] + VECTORS_SUFFIX
+        return _Shard(name, np.load(path), np.load(vectors_path, mmap_mode="r"))
+
+    def _load(self) -> None:
+        for name in self._shard_names():
+            try:
+                self._shards.append(self._open_shard(name))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable embedding shard {name}: {type(e).__name__}: {e}")
+        if self._shards:
+            logger.info(f"Indexed {len(self)} cached embeddings for {self.model_name} "
+                        f"in {len(self._shards)} shards at {self.path}")
+        if len(self._shards) > self.max_shards or any(shard.name.endswith(LEGACY_SUFFIX) for shard in self._shards):
+            self.compact()
+
+    def _locate(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(shard index, row) of each key, newest shard first; shard index -1 where no shard holds it"""
+        shard_ids = np.full(len(keys), -1)
+        rows = np.full(len(keys), -1)
+        for shard_id in range(len(self._shards) - 1, -1, -1):
+            todo = np.flatnonzero(shard_ids < 0)
+            if not len(todo):
+                break
+            found = self._shards[shard_id].rows(keys[todo])
+            hit = found >= 0
+            shard_ids[todo[hit]] = shard_id
+            rows[todo[hit]] = found[hit]
+        return shard_ids, rows
+
+    def _gather(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        """Vector of each key (None where the store does not hold it)"""
+        with self._lock:
+            result = [self._pending.get(key) for key in keys]
+            todo = [index for index, vector in enumerate(result) if vector is None]
+            if todo and self._shards:
+                shard_ids, rows = self._locate(np.array([keys[index] for index in todo], dtype="S16"))
+                for shard_id in np.unique(shard_ids[shard_ids >= 0]):
+                    members = np.flatnonzero(shard_ids == shard_id)
+                    vectors = np.asarray(self._shards[shard_id].vectors[rows[members]])
+                    for member, vector in zip(members, vectors):
+                        result[todo[member]] = vector
+            return result
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        return self._gather([text_key(text)])[0]
+
+    def put_many(self, texts: Sequence[str], vectors) -> None:
+        keys = [text_key(text) for text in texts]
+        present = self._gather(keys)
+        with self._lock:
+            for key, vector, existing in zip(keys, vectors, present):
+                if existing is None and key not in self._pending:
+                    self._pending[key] = np.asarray(vector, dtype=np.float32)
+
+    def encode(self, texts: Sequence[str], encode_batch: Callable[[List[str]], np.ndarray],
+               batch_size: int = 128) -> np.ndarray:
+        """
+        Embeddings of `texts` (one row each), encoding only the unique texts not yet stored
+
+        encode_batch receives at most batch_size texts and returns one row per
+        text. New vectors are flushed to disk once all batches are done.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        keys = [text_key(text) for text in texts]
+        vectors = self._gather(keys)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            batch_size = max(1, int(batch_size))
+            logger.info(f"Encoding {len(missing)}/{len(texts)} texts not in the embedding store")
+            encoded = {}
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                batch_vectors = np.asarray(encode_batch(batch), dtype=np.float32)
+                if batch_vectors.ndim != 2 or batch_vectors.shape[0] != len(batch):
+                    raise ValueError(f"Encoder returned shape {batch_vectors.shape} for {len(batch)} texts")
+                self.put_many(batch, batch_vectors)
+                encoded.update(zip(batch, batch_vectors))
+            self.flush()
+            vectors = [encoded[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return np.stack(vectors)
+
+    def _write_shard(self, keys: np.ndarray, vectors: np.ndarray) -> Optional[str]:
+        """Write keys (sorted) and their vectors as the next shard; returns its keys file name"""
+        names = self._shard_names()
+        index = _shard_index(names[-1]) + 1 if names else 0
+        base = os.path.join(self.path, f"{SHARD_PREFIX}{index:06d}")
+        try:
+            for suffix, array in ((VECTORS_SUFFIX, vectors), (KEYS_SUFFIX, keys)):
+                tmp_path = f"{base}.tmp{suffix}"
+                np.save(tmp_path, array)
+                os.replace(tmp_path, base + suffix)
+        except OSError as e:
+            logger.warning(f"Failed to save embedding shard {base}: {e}")
+            return None
+        return os.path.basename(base) + KEYS_SUFFIX
+
+    def flush(self) -> None:
+        """Write vectors added since the last flush as a new shard, compacting when there are too many"""
+        with self._lock:
+            if not self.path or not self._pending:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            keys = np.array(list(self._pending), dtype="S16")
+            order = np.argsort(keys)
+            vectors = np.stack(list(self._pending.values()))[order]
+            name = self._write_shard(keys[order], vectors)
+            if name is None:
+                return
+            self._pending = {}
+            self._shards.append(self._open_shard(name))
+            if len(self._shards) > self.max_shards:
+                self.compact()
+
+    def compact(self) -> None:
+        """Merge all shards into one, keeping the newest vector of each key"""
+        with self._lock:
+            if not self.path or len(self._shards) < 2 and not any(
+                    shard.name.endswith(LEGACY_SUFFIX) for shard in self._shards):
+                return
+            all_keys = np.concatenate([shard.keys for shard in self._shards])
+            sources = np.concatenate([np.full(len(shard.keys), shard_id) for shard_id, shard in enumerate(self._shards)])
+            source_rows = np.concatenate([np.arange(len(shard.keys)) for shard in self._shards])
+            # Newest shard first, so unique() keeps its copy of a key
+            newest_first = np.lexsort((-sources, all_keys))
+            keys, first = np.unique(all_keys[newest_first], return_index=True)
+            picked = newest_first[first]
+            dim = self._shards[0].vectors.shape[1]
+
+            names = self._shard_names()
+            index = _shard_index(names[-1]) + 1 if names else 0
+            base = os.path.join(self.path, f"{SHARD_PREFIX}{index:06d}")
+            tmp_vectors = f"{base}.tmp{VECTORS_SUFFIX}"
+            try:
+                # Written chunk by chunk into a memory-mapped file, never held in memory whole
+                out = np.lib.format.open_memmap(tmp_vectors, mode="w+", dtype=np.float32, shape=(len(keys), dim))
+                for start in range(0, len(keys), COMPACT_CHUNK_ROWS):
+                    chunk = picked[start:start + COMPACT_CHUNK_ROWS]
+                    for shard_id in np.unique(sources[chunk]):
+                        members = np.flatnonzero(sources[chunk] == shard_id)
+                        out[start + members] = self._shards[shard_id].vectors[source_rows[chunk[members]]]
+                out.flush()
+                del out
+                os.replace(tmp_vectors, base + VECTORS_SUFFIX)
+                tmp_keys = f"{base}.tmp{KEYS_SUFFIX}"
+                np.save(tmp_keys, keys)
+                os.replace(tmp_keys, base + KEYS_SUFFIX)
+            except OSError as e:
+                logger.warning(f"Failed to compact embedding shards in {self.path}: {e}")
+                return
+
+            old_names = [shard.name for shard in self._shards]
+            self._shards = [self._open_shard(os.path.basename(base) + KEYS_SUFFIX)]
+            for name in old_names:
+                path = os.path.join(self.path, name)
+                paths = [path] if name.endswith(LEGACY_SUFFIX) else [path, path[:-len(KEYS_SUFFIX)] + VECTORS_SUFFIX]
+                for old_path in paths:
+                    try:
+                        os.remove(old_path)
+                    except OSError as e:
+                        logger.warning(f"Failed to remove compacted embedding shard {old_path}: {e}")
+            logger.info(f"Compacted {len(old_names)} embedding shards for {self.model_name} into one ({len(keys)} vectors)")
+
+    def __contains__(self, text: str) -> bool:
+        return self.get(text) is not None
+
+    def __len__(self) -> int:
+        return sum(len(shard.keys) for shard in self._shards) + len(self._pending)
+
+    def __repr__(self) -> str:
+        return f"EmbeddingStore(model={self.model_name!r}, size={len(self)}, path={self.path!r})"
+
+
+class CachedEncoder:
+    """SentenceTransformer-compatible `encode` that reads through an EmbeddingStore"""
+
+    def __init__(self, model, store: EmbeddingStore, batch_size: int = 128):
+        self.model = model
+        self.store = store
+        self.batch_size = max(1, int(batch_size))
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+
+    def encode(self, texts, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        embeddings = self.store.encode([texts] if single else list(texts), self._encode_batch, self.batch_size)
+        if normalize_embeddings and embeddings.size:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            embeddings = embeddings / norms
+        return embeddings[0] if single else embeddings
+
+
+# Stores are only shared while something holds them, so a long-running server
+# releases a store's key index once the builds using it are done
+_stores: "weakref.WeakValueDictionary[tuple, EmbeddingStore]" = weakref.WeakValueDictionary()
+_stores_lock = threading.Lock()
+
+
+def open_store(root: Optional[str], model_name: str) -> EmbeddingStore:
+    """Shared store per (root, model) within the process, so builders and dedup reuse loaded keys"""
+    with _stores_lock:
+        key = (os.path.abspath(root) if root else None, model_name)
+        store = _stores.get(key)
+        if store is None:
+            store = EmbeddingStore(root, model_name)
+            _stores[key] = store
+        return store
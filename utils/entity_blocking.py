@@ -0,0 +1,224 @@
+"""
+Blocking for entity resolution (head deduplication).
+
+Instead of comparing every entity with every other, entities are grouped into
+blocks and only pairs that share at least one block are compared:
+- name blocks: MinHash signatures of character n-grams, split into LSH bands;
+  names with high n-gram Jaccard similarity collide in at least one band
+- chunk blocks: entities extracted from the same text chunk
+Pairs whose known schema_type values differ are dropped afterwards. Blocks
+larger than max_block_size are skipped, since they are too generic to be
+informative and would bring back quadratic cost.
+"""
+
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.logger import logger
+
+__all__ = ["BlockingEntity", "BlockingResult", "EntityBlocker", "char_ngrams"]
+
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def char_ngrams(name: str, n: int = 3) -> List[str]:
+    """Character n-grams of a normalized name, padded so short names still produce grams"""
+    normalized = " ".join(name.lower().split())
+    if not normalized:
+        return []
+    padded = f"#{normalized}#"
+    if len(padded) <= n:
+        return [padded]
+    return [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+
+@dataclass
+class BlockingEntity:
+    node_id: str
+    name: str
+    schema_type: Optional[str] = None
+    chunk_ids: Tuple[str, ...] = ()
+
+
+@dataclass
+class BlockingResult:
+    """Candidate pairs as index arrays into the input entity list (left < right)"""
+    left: np.ndarray
+    right: np.ndarray
+    stats: Dict = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.left)
+
+    def pairs(self) -> Iterable[Tuple[int, int]]:
+        return zip(self.left.tolist(), self.right.tolist())
+
+
+class EntityBlocker:
+    """Build candidate pairs from MinHash-LSH name blocks and shared-chunk blocks"""
+
+    def __init__(self, ngram_size: int = 3, num_perm: int = 64, bands: int = 16,
+                 use_chunk_blocks: bool = True, require_same_type: bool = True,
+                 max_block_size: int = 200, seed: int = 42):
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.ngram_size = ngram_size
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.use_chunk_blocks = use_chunk_blocks
+        self.require_same_type = require_same_type
+        self.max_block_size = max_block_size
+
+        rng = np.random.default_rng(seed)
+        self._hash_a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+        self._hash_b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "EntityBlocker":
+        config = config or {}
+        return cls(
+            ngram_size=config.get("ngram_size", 3),
+            num_perm=config.get("num_perm", 64),
+            bands=config.get("bands", 16),
+            use_chunk_blocks=config.get("use_chunk_blocks", True),
+            require_same_type=config.get("require_same_type", True),
+            max_block_size=config.get("max_block_size", 200),
+        )
+
+    def minhash(self, name: str) -> Optional[np.ndarray]:
+        """MinHash signature (num_perm values) of the name's character n-grams"""
+        signatures, valid = self.minhash_batch([name])
+        return signatures[0] if valid[0] else None
+
+    def minhash_batch(self, names: Sequence[str], batch_entities: int = 8192) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        MinHash signatures for many names at once.
+
+        Returns:
+            (signatures of shape (len(names), num_perm), boolean mask of names that had n-grams)
+        """
+        signatures = np.zeros((len(names), self.num_perm), dtype=np.int64)
+        valid = np.zeros(len(names), dtype=bool)
+        for batch_start in range(0, len(names), batch_entities):
+            batch = names[batch_start:batch_start + batch_entities]
+            gram_hashes, owners = [], []
+            for offset, name in enumerate(batch):
+                grams = char_ngrams(name, self.ngram_size)
+                if grams:
+                    # crc32 is stable across processes, unlike hash()
+                    gram_hashes.extend(zlib.crc32(g.encode("utf-8")) for g in grams)
+                    owners.extend([offset] * len(grams))
+            if not gram_hashes:
+                continue
+            values = np.asarray(gram_hashes, dtype=np.int64) % _MERSENNE_PRIME
+            owners = np.asarray(owners, dtype=np.int64)
+            hashed = (np.outer(values, self._hash_a) + self._hash_b) % _MERSENNE_PRIME
+            # Grams are grouped by owner, so a segmented min gives each name's signature
+            segment_starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+            rows = batch_start + owners[segment_starts]
+            signatures[rows] = np.minimum.reduceat(hashed, segment_starts, axis=0)
+            valid[rows] = True
+        return signatures, valid
+
+    @staticmethod
+    def _group(keys: np.ndarray, members: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Group members by equal key.
+
+        Returns:
+            (members ordered block by block, size of each block)
+        """
+        _, inverse, sizes = np.unique(keys, return_inverse=True, return_counts=True)
+        return members[np.argsort(inverse, kind="stable")], sizes
+
+    def _name_blocks(self, entities: Sequence[BlockingEntity]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        signatures, valid = self.minhash_batch([entity.name for entity in entities])
+        members = np.flatnonzero(valid)
+        signatures = signatures[valid]
+        groups = []
+        r = self.rows_per_band
+        for band in range(self.bands):
+            band_rows = np.ascontiguousarray(signatures[:, band * r:(band + 1) * r])
+            # View each band row as one opaque value so np.unique groups identical bands
+            keys = band_rows.view(np.dtype((np.void, band_rows.dtype.itemsize * r))).ravel()
+            groups.append(self._group(keys, members))
+        return groups
+
+    def _chunk_blocks(self, entities: Sequence[BlockingEntity]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        chunk_keys: Dict[str, int] = {}
+        keys, members = [], []
+        for index, entity in enumerate(entities):
+            for chunk_id in set(entity.chunk_ids):
+                keys.append(chunk_keys.setdefault(chunk_id, len(chunk_keys)))
+                members.append(index)
+        if not keys:
+            return []
+        return [self._group(np.asarray(keys, dtype=np.int64), np.asarray(members, dtype=np.int64))]
+
+    def _encoded_pairs(self, ordered: np.ndarray, sizes: np.ndarray, n: int) -> List[np.ndarray]:
+        """Encode every within-block pair (i < j) as i * n + j, one size class at a time"""
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        parts = []
+        for size in np.unique(sizes[(sizes >= 2) & (sizes <= self.max_block_size)]).tolist():
+            block_starts = starts[sizes == size]
+            blocks = np.sort(ordered[block_starts[:, None] + np.arange(size)], axis=1)
+            upper_i, upper_j = np.triu_indices(size, k=1)
+            parts.append((blocks[:, upper_i] * n + blocks[:, upper_j]).ravel())
+        return parts
+
+    def build(self, entities: Sequence[BlockingEntity]) -> BlockingResult:
+        """Return deduplicated candidate pairs and block-size statistics"""
+        n = len(entities)
+        stats: Dict = {"entities": n, "all_pairs": n * (n - 1) // 2, "blocks": {}}
+        encoded_parts = []
+
+        block_sources = [("name_lsh", self._name_blocks(entities))]
+        if self.use_chunk_blocks:
+            block_sources.append(("chunk", self._chunk_blocks(entities)))
+
+        for kind, groups in block_sources:
+            sizes = np.concatenate([s for _, s in groups]) if groups else np.empty(0, dtype=np.int64)
+            usable = sizes[(sizes >= 2) & (sizes <= self.max_block_size)]
+            stats["blocks"][kind] = {
+                "blocks": int(len(sizes)),
+                "non_singleton": int((sizes >= 2).sum()),
+                "oversized_skipped": int((sizes > self.max_block_size).sum()),
+                "max_size": int(sizes.max()) if len(sizes) else 0,
+                "mean_size": round(float(usable.mean()), 2) if len(usable) else 0.0,
+                "p95_size": int(np.percentile(usable, 95)) if len(usable) else 0,
+                "comparisons": int((usable * (usable - 1) // 2).sum()),
+            }
+            for ordered, group_sizes in groups:
+                encoded_parts.extend(self._encoded_pairs(ordered, group_sizes, n))
+
+        if encoded_parts:
+            encoded = np.unique(np.concatenate(encoded_parts))
+        else:
+            encoded = np.empty(0, dtype=np.int64)
+        left, right = encoded // max(n, 1), encoded % max(n, 1)
+        stats["pairs_before_type_filter"] = int(len(encoded))
+
+        if self.require_same_type and len(encoded):
+            type_codes: Dict[str, int] = {}
+            # -1 marks an unknown type, which is compatible with every type
+            codes = np.array([
+                type_codes.setdefault(entity.schema_type, len(type_codes)) if entity.schema_type else -1
+                for entity in entities
+            ], dtype=np.int64)
+            left_codes, right_codes = codes[left], codes[right]
+            keep = (left_codes < 0) | (right_codes < 0) | (left_codes == right_codes)
+            left, right = left[keep], right[keep]
+
+        stats["candidate_pairs"] = int(len(left))
+        stats["reduction_ratio"] = (
+            round(1.0 - len(left) / stats["all_pairs"], 6) if stats["all_pairs"] else 0.0
+        )
+        logger.info(
+            f"Blocking: {n} entities -> {len(left)} candidate pairs "
+            f"(of {stats['all_pairs']} possible, reduction {stats['reduction_ratio']:.4%})"
+        )
+        return BlockingResult(left=left, right=right, stats=stats)
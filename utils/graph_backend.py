@@ -0,0 +1,384 @@
+"""
+Graph storage backends.
+
+Pipelines use the networkx MultiDiGraph API as the graph interface: add_node /
+add_edge, nodes[n] for properties, edges(data=True), neighbors, in_edges and
+out_edges, get_edge_data. networkx is the default backend. It keeps a dict per
+node, per adjacency entry and per edge, which is what makes multi-million
+edge graphs take tens of GB.
+
+CompactGraph implements the same API on arrays:
+
+- node ids are interned to dense integers
+- labels and relations are stored as codes into a Vocabulary (utils/vocabulary.py)
+- node properties are stored column-wise, one list per property key
+- edges are three flat int arrays (head, tail, relation), indexed as CSR
+  (by head) and CSC (by tail) the first time they are queried
+
+It is append-only: nodes and edges can be added (re-adding a node replaces
+its attributes) but not removed. This makes it a fit for loading and
+serving graphs (retrieval) but not for dedup passes that rewrite the graph.
+Attribute dicts returned by nodes[n] and edges(data=True) are built on
+access; modifying them does not change the graph.
+
+The backend is chosen with `retrieval.graph_backend` ("networkx" or
+"compact") and graphs are loaded with load_graph(path, backend).
+"""
+
+from array import array
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+
+from utils import graph_processor
+from utils.vocabulary import Vocabulary
+
+__all__ = ["CompactGraph", "GRAPH_BACKENDS", "load_graph"]
+
+GRAPH_BACKENDS = ("networkx", "compact")
+
+_MISSING = object()
+_NO_CODE = -1
+
+
+class _NodeView:
+    """Subset of networkx's NodeView: nodes(), nodes(data=...), nodes[n], nodes.get(n), iteration, membership"""
+
+    __slots__ = ("_graph",)
+
+    def __init__(self, graph: "CompactGraph"):
+        self._graph = graph
+
+    def __call__(self, data=False, default=None):
+        graph = self._graph
+        if data is False:
+            return iter(graph._ids)
+        if data is True:
+            return ((node, graph._node_attrs(index)) for index, node in enumerate(graph._ids))
+        return ((node, graph._node_attrs(index).get(data, default)) for index, node in enumerate(graph._ids))
+
+    def __getitem__(self, node) -> dict:
+        return self._graph._node_attrs(self._graph._index[node])
+
+    def get(self, node, default=None):
+        index = self._graph._index.get(node)
+        return default if index is None else self._graph._node_attrs(index)
+
+    def __iter__(self) -> Iterator:
+        return iter(self._graph._ids)
+
+    def __contains__(self, node) -> bool:
+        return node in self._graph._index
+
+    def __len__(self) -> int:
+        return len(self._graph._ids)
+
+
+class _EdgeView:
+    """Subset of networkx's OutMultiEdgeView: edges(nbunch, data, keys), iteration, len"""
+
+    __slots__ = ("_graph",)
+
+    def __init__(self, graph: "CompactGraph"):
+        self._graph = graph
+
+    def __call__(self, nbunch=None, data=False, keys=False, default=None):
+        return self._graph.out_edges(nbunch, data=data, keys=keys, default=default)
+
+    def __iter__(self) -> Iterator:
+        return self._graph.out_edges()
+
+    def __len__(self) -> int:
+        return self._graph.number_of_edges()
+
+
+class CompactGraph:
+    """Append-only, array-backed directed multigraph with networkx's read API"""
+
+    def __init__(self):
+        self._ids: List[Hashable] = []
+        self._index: Dict[Hashable, int] = {}
+        self.label_vocab = Vocabulary()
+        self._node_label = array("i")
+        self._node_level = array("i")
+        self._has_properties = bytearray()
+        # property key -> values aligned with node indices (_MISSING where absent)
+        self._property_columns: Dict[str, list] = {}
+        self._node_extra: Dict[int, dict] = {}
+
+        self.relation_vocab = Vocabulary()
+        self._edge_head = array("i")
+        self._edge_tail = array("i")
+        self._edge_relation = array("i")
+        self._edge_extra: Dict[int, dict] = {}
+        self._csr: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None
+
+        self.nodes = _NodeView(self)
+        self.edges = _EdgeView(self)
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    def _add_node_index(self, node) -> int:
+        index = self._index.get(node)
+        if index is None:
+            index = len(self._ids)
+            self._index[node] = index
+            self._ids.append(node)
+            self._node_label.append(_NO_CODE)
+            self._node_level.append(_NO_CODE)
+            self._has_properties.append(0)
+            for column in self._property_columns.values():
+                column.append(_MISSING)
+            self._csr = None
+        return index
+
+    def add_node(self, node_for_adding, **attr):
+        """Add a node, or replace the attributes of an existing one"""
+        index = self._add_node_index(node_for_adding)
+        self._node_label[index] = self.label_vocab.code(attr.pop("label")) if "label" in attr else _NO_CODE
+        level = attr.pop("level", None)
+        self._node_level[index] = int(level) if level is not None else _NO_CODE
+
+        properties = attr.pop("properties", _MISSING)
+        self._has_properties[index] = properties is not _MISSING
+        for column in self._property_columns.values():
+            column[index] = _MISSING
+        if properties is not _MISSING:
+            for key, value in (properties or {}).items():
+                column = self._property_columns.get(key)
+                if column is None:
+                    column = self._property_columns[key] = [_MISSING] * len(self._ids)
+                column[index] = value
+
+        if attr:
+            self._node_extra[index] = attr
+        else:
+            self._node_extra.pop(index, None)
+
+    def add_nodes_from(self, nodes_for_adding: Iterable, **attr):
+        for item in nodes_for_adding:
+            if isinstance(item, tuple) and len(item) == 2 and isinstance(item[1], dict):
+                self.add_node(item[0], **{**attr, **item[1]})
+            else:
+                self.add_node(item, **attr)
+
+    def add_edge(self, u_for_edge, v_for_edge, **attr):
+        """Add an edge; unknown endpoints are added without attributes. Keys are not returned."""
+        self._edge_head.append(self._add_node_index(u_for_edge))
+        self._edge_tail.append(self._add_node_index(v_for_edge))
+        self._edge_relation.append(self.relation_vocab.code(attr.pop("relation")) if "relation" in attr else _NO_CODE)
+        if attr:
+            self._edge_extra[len(self._edge_head) - 1] = attr
+        self._csr = None
+
+    def add_edges_from(self, ebunch_to_add: Iterable, **attr):
+        for edge in ebunch_to_add:
+            if len(edge) == 3:
+                u, v, data = edge
+                self.add_edge(u, v, **{**attr, **data})
+            else:
+                u, v = edge
+                self.add_edge(u, v, **attr)
+
+    @classmethod
+    def from_networkx(cls, graph: nx.MultiDiGraph) -> "CompactGraph":
+        compact = cls()
+        compact.add_nodes_from(graph.nodes(data=True))
+        compact.add_edges_from(graph.edges(data=True))
+        return compact
+
+    def to_networkx(self) -> nx.MultiDiGraph:
+        graph = nx.MultiDiGraph()
+        graph.add_nodes_from(self.nodes(data=True))
+        graph.add_edges_from(self.edges(data=True))
+        return graph
+
+    # ------------------------------------------------------------------
+    # Attribute access
+    # ------------------------------------------------------------------
+
+    def _node_attrs(self, index: int) -> dict:
+        attrs = {}
+        label = self._node_label[index]
+        if label != _NO_CODE:
+            attrs["label"] = self.label_vocab[label]
+        level = self._node_level[index]
+        if level != _NO_CODE:
+            attrs["level"] = level
+        if self._has_properties[index]:
+            attrs["properties"] = {
+                key: column[index] for key, column in self._property_columns.items() if column[index] is not _MISSING
+            }
+        extra = self._node_extra.get(index)
+        if extra:
+            attrs.update(extra)
+        return attrs
+
+    def _edge_attrs(self, edge: int) -> dict:
+        relation = self._edge_relation[edge]
+        attrs = {"relation": self.relation_vocab[relation]} if relation != _NO_CODE else {}
+        extra = self._edge_extra.get(edge)
+        if extra:
+            attrs.update(extra)
+        return attrs
+
+    # ------------------------------------------------------------------
+    # Structure queries
+    # ------------------------------------------------------------------
+
+    def _adjacency(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(out_offsets, out_edges, in_offsets, in_edges); edge ids grouped by head / tail in insertion order"""
+        if self._csr is None:
+            node_count = len(self._ids)
+            heads = np.frombuffer(self._edge_head, dtype=np.int32) if self._edge_head else np.empty(0, np.int32)
+            tails = np.frombuffer(self._edge_tail, dtype=np.int32) if self._edge_tail else np.empty(0, np.int32)
+            out_edges = np.argsort(heads, kind="stable").astype(np.int32)
+            in_edges = np.argsort(tails, kind="stable").astype(np.int32)
+            out_offsets = np.zeros(node_count + 1, dtype=np.int64)
+            in_offsets = np.zeros(node_count + 1, dtype=np.int64)
+            np.cumsum(np.bincount(heads, minlength=node_count), out=out_offsets[1:])
+            np.cumsum(np.bincount(tails, minlength=node_count), out=in_offsets[1:])
+            self._csr = (out_offsets, out_edges, in_offsets, in_edges)
+        return self._csr
+
+    def _out_edge_ids(self, index: int) -> List[int]:
+        out_offsets, out_edges, _, _ = self._adjacency()
+        return out_edges[out_offsets[index]:out_offsets[index + 1]].tolist()
+
+    def _in_edge_ids(self, index: int) -> List[int]:
+        _, _, in_offsets, in_edges = self._adjacency()
+        return in_edges[in_offsets[index]:in_offsets[index + 1]].tolist()
+
+    def _node_indices(self, nbunch) -> Iterable[int]:
+        if nbunch is None:
+            return range(len(self._ids))
+        if nbunch in self:
+            return (self._index[nbunch],)
+        return [self._index[node] for node in nbunch if node in self._index]
+
+    def _iter_edges(self, nbunch, data, keys, default, incoming: bool) -> Iterator[tuple]:
+        for index in self._node_indices(nbunch):
+            edge_ids = self._in_edge_ids(index) if incoming else self._out_edge_ids(index)
+            seen: Dict[Tuple[int, int], int] = {}
+            for edge in edge_ids:
+                u, v = self._ids[self._edge_head[edge]], self._ids[self._edge_tail[edge]]
+                item: tuple = (u, v)
+                if keys:
+                    pair = (self._edge_head[edge], self._edge_tail[edge])
+                    key = seen[pair] = seen.get(pair, -1) + 1
+                    item += (key,)
+                if data is True:
+                    item += (self._edge_attrs(edge),)
+                elif data is not False:
+                    item += (self._edge_attrs(edge).get(data, default),)
+                yield item
+
+    def out_edges(self, nbunch=None, data=False, keys=False, default=None) -> Iterator[tuple]:
+        return self._iter_edges(nbunch, data, keys, default, incoming=False)
+
+    def in_edges(self, nbunch=None, data=False, keys=False, default=None) -> Iterator[tuple]:
+        return self._iter_edges(nbunch, data, keys, default, incoming=True)
+
+    def successors(self, n) -> Iterator:
+        heads_to = dict.fromkeys(self._edge_tail[edge] for edge in self._out_edge_ids(self._index[n]))
+        return (self._ids[index] for index in heads_to)
+
+    neighbors = successors
+
+    def predecessors(self, n) -> Iterator:
+        tails_from = dict.fromkeys(self._edge_head[edge] for edge in self._in_edge_ids(self._index[n]))
+        return (self._ids[index] for index in tails_from)
+
+    def get_edge_data(self, u, v, key=None, default=None):
+        """{key: attrs} of all u->v edges (keys in insertion order), or attrs of one key"""
+        if u not in self._index or v not in self._index:
+            return default
+        target = self._index[v]
+        matches = {
+            position: self._edge_attrs(edge)
+            for position, edge in enumerate(
+                edge for edge in self._out_edge_ids(self._index[u]) if self._edge_tail[edge] == target
+            )
+        }
+        if not matches:
+            return default
+        if key is None:
+            return matches
+        return matches.get(key, default)
+
+    def has_node(self, n) -> bool:
+        return n in self._index
+
+    def has_edge(self, u, v, key=None) -> bool:
+        return self.get_edge_data(u, v, key=key) is not None
+
+    def out_degree(self, n) -> int:
+        out_offsets = self._adjacency()[0]
+        index = self._index[n]
+        return int(out_offsets[index + 1] - out_offsets[index])
+
+    def in_degree(self, n) -> int:
+        in_offsets = self._adjacency()[2]
+        index = self._index[n]
+        return int(in_offsets[index + 1] - in_offsets[index])
+
+    def number_of_nodes(self) -> int:
+        return len(self._ids)
+
+    def number_of_edges(self) -> int:
+        return len(self._edge_head)
+
+    def subgraph(self, nodes: Iterable) -> nx.MultiDiGraph:
+        """Induced subgraph, materialized as a networkx graph (not a view)"""
+        keep = {self._index[node] for node in nodes if node in self._index}
+        graph = nx.MultiDiGraph()
+        graph.add_nodes_from((self._ids[index], self._node_attrs(index)) for index in sorted(keep))
+        for index in sorted(keep):
+            for edge in self._out_edge_ids(index):
+                if self._edge_tail[edge] in keep:
+                    graph.add_edge(self._ids[index], self._ids[self._edge_tail[edge]], **self._edge_attrs(edge))
+        return graph
+
+    def is_directed(self) -> bool:
+        return True
+
+    def is_multigraph(self) -> bool:
+        return True
+
+    def __contains__(self, n) -> bool:
+        try:
+            return n in self._index
+        except TypeError:
+            return False
+
+    def __iter__(self) -> Iterator:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __repr__(self) -> str:
+        return f"CompactGraph(nodes={self.number_of_nodes()}, edges={self.number_of_edges()})"
+
+
+def load_graph(input_path: str, backend: str = "networkx"):
+    """
+    Load a graph file (.json, compact .npz or .graphml) into the given backend
+
+    The compact backend reads JSON records straight into arrays, without
+    building a networkx graph first.
+    """
+    if backend not in GRAPH_BACKENDS:
+        raise ValueError(f"Unknown graph backend '{backend}', expected one of {GRAPH_BACKENDS}")
+    if backend == "networkx":
+        if input_path.endswith(('.npz', '.graphml')):
+            return graph_processor.load_graph(input_path)
+        return graph_processor.load_graph_from_json(input_path)
+    if input_path.endswith('.graphml'):
+        return CompactGraph.from_networkx(graph_processor.load_graph_from_graphml(input_path))
+    if input_path.endswith('.npz'):
+        return graph_processor.load_graph_compact(input_path, graph=CompactGraph())
+    return graph_processor.load_graph_from_json(input_path, graph=CompactGraph())
@@ -1,10 +1,96 @@
 import networkx as nx
 import json
+import os
+
+import numpy as np
 
 from utils.logger import logger
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+COMPACT_FORMAT_VERSION = 1
+JSON_READ_CHUNK_SIZE = 1 << 20
+
+
+def _iter_json_array_stdlib(f, chunk_size: int = JSON_READ_CHUNK_SIZE):
+    """Yield the items of a top-level JSON array, reading the file in chunks"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof, started = "", 0, False, False
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of file in JSON array" if started else "Expected a JSON array")
+            buffer, pos = f.read(chunk_size), 0
+            eof = not buffer
+            continue
+        if not started:
+            if buffer[pos] != "[":
+                raise ValueError("Expected a JSON array")
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+            # A value ending exactly at the buffer end may be cut off (e.g. a number)
+            complete = end < len(buffer) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            chunk = f.read(chunk_size)
+            buffer, pos = buffer[pos:] + chunk, 0
+            eof = not chunk
+            continue
+        yield item
+        pos = end
+
 
-def load_graph_from_json(input_path: str) -> nx.MultiDiGraph:
+def iter_relationships_from_json(input_path: str):
+    """
+    Stream the relationship records of a JSON graph file one at a time
+
+    Uses ijson when it is installed, otherwise an incremental parser built on
+    json.JSONDecoder. Memory use is bounded by one record plus the read
+    buffer instead of the whole file.
+    """
+    if ijson is not None:
+        with open(input_path, 'rb') as f:
+            yield from ijson.items(f, "item", use_float=True)
+    else:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            yield from _iter_json_array_stdlib(f)
+
+
+def iter_relationships(graph: nx.MultiDiGraph):
+    """Yield one output record per edge, in the JSON graph format"""
+    for u, v, data in graph.edges(data=True):
+        u_data = graph.nodes[u]
+        v_data = graph.nodes[v]
+
+        yield {
+            "start_node": {
+                "id": u,
+                "label": u_data["label"],
+                "properties": u_data["properties"],
+            },
+            "relation": data["relation"],
+            "end_node": {
+                "id": v,
+                "label": v_data["label"],
+                "properties": v_data["properties"],
+            },
+        }
+
+
+def load_graph_from_json(input_path: str, graph=None) -> nx.MultiDiGraph:
     """
     Load a knowledge graph from JSON format
     
@@ -12,21 +98,30 @@ def load_graph_from_json(input_path: str) -> nx.MultiDiGraph:
     [
         {
             "start_node": {
+                "id": "entity_0",
                 "label": "entity",
                 "properties": {"name": "Entity Name", "description": "..."}
             },
             "relation": "relation_type",
             "end_node": {
+                "id": "entity_1",
                 "label": "entity", 
                 "properties": {"name": "Entity Name", "description": "..."}
             }
         }
     ]
+
+    Nodes are identified by "id" when present, so ids survive a save/load
+    round trip. Files without ids (older format) are deduplicated by
+    (label, name) and get ids "{label}_{counter}" in file order.
+
+    `graph` is an empty graph to load into (default: a new nx.MultiDiGraph);
+    any object with networkx's add_node/add_edge works, e.g. a CompactGraph.
     """
-    graph = nx.MultiDiGraph()
+    if graph is None:
+        graph = nx.MultiDiGraph()
     
-    with open(input_path, 'r', encoding='utf-8') as f:
-        relationships = json.load(f)
+    relationships = iter_relationships_from_json(input_path)
     
     # Track nodes to avoid duplicates and assign consistent IDs
     node_mapping = {}  # (label, name) -> node_id
@@ -44,9 +139,11 @@ def load_graph_from_json(input_path: str) -> nx.MultiDiGraph:
         elif not isinstance(start_name, str):
             start_name = str(start_name)
         
-        start_key = (start_node_data["label"], start_name)
+        # Files written with node ids keep them; older files are keyed by (label, name)
+        stored_id = start_node_data.get("id")
+        start_key = stored_id if stored_id is not None else (start_node_data["label"], start_name)
         if start_key not in node_mapping:
-            node_id = f"{start_node_data['label']}_{node_counter}"
+            node_id = stored_id if stored_id is not None else f"{start_node_data['label']}_{node_counter}"
             node_mapping[start_key] = node_id
             node_counter += 1
             
@@ -77,9 +174,10 @@ def load_graph_from_json(input_path: str) -> nx.MultiDiGraph:
         elif not isinstance(end_name, str):
             end_name = str(end_name)
         
-        end_key = (end_node_data["label"], end_name)
+        stored_id = end_node_data.get("id")
+        end_key = stored_id if stored_id is not None else (end_node_data["label"], end_name)
         if end_key not in node_mapping:
-            node_id = f"{end_node_data['label']}_{node_counter}"
+            node_id = stored_id if stored_id is not None else f"{end_node_data['label']}_{node_counter}"
             node_mapping[end_key] = node_id
             node_counter += 1
             
@@ -119,47 +217,179 @@ def save_graph_to_json(graph: nx.MultiDiGraph, output_path: str):
     [
         {
             "start_node": {
+                "id": "entity_0",
                 "label": "entity",
                 "properties": {"name": "Entity Name", "description": "..."}
             },
             "relation": "relation_type", 
             "end_node": {
+                "id": "entity_1",
                 "label": "entity",
                 "properties": {"name": "Entity Name", "description": "..."}
             }
         }
     ]
+
+    Edges are written one at a time, so the whole list never has to be held
+    in memory. The output is byte-identical to json.dump(..., indent=2).
     """
-    output = []
-    
-    for u, v, data in graph.edges(data=True):
-        u_data = graph.nodes[u]
-        v_data = graph.nodes[v]
-        
-        relationship = {
-            "start_node": {
-                "label": u_data["label"],
-                "properties": u_data["properties"],
-            },
-            "relation": data["relation"],
-            "end_node": {
-                "label": v_data["label"],
-                "properties": v_data["properties"],
-            },
-        }
-        output.append(relationship)
-    
     with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+        f.write("[")
+        empty = True
+        for relationship in iter_relationships(graph):
+            f.write("\n  " if empty else ",\n  ")
+            # Strings are escaped by json.dumps, so every newline is structural
+            f.write(json.dumps(relationship, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+            empty = False
+        f.write("]" if empty else "\n]")
+
+
+def _json_array(obj) -> np.ndarray:
+    """Serialize a JSON value into a uint8 array that np.savez stores without pickling"""
+    return np.frombuffer(json.dumps(obj, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+
+
+def _json_from_array(array: np.ndarray):
+    return json.loads(array.tobytes().decode("utf-8"))
+
+
+def save_graph_compact(graph: nx.MultiDiGraph, output_path: str):
+    """
+    Save a knowledge graph in the compact normalized format (.npz)
+
+    Every node is stored once in a node table and edges refer to nodes and
+    relations by integer index, instead of repeating both endpoint property
+    dicts on every edge as the JSON edge list does.
+
+    Arrays:
+        version:          [COMPACT_FORMAT_VERSION]
+        node_ids:         JSON list of node ids, defines node indices
+        labels:           JSON list of distinct node labels
+        node_label:       (N,) int32 index into labels
+        node_level:       (N,) int16
+        node_properties:  JSON list of node property dicts, in node order
+        node_extra_rows / node_extra: other node attributes, for the nodes that have any
+        relations:        JSON list of distinct relations
+        edge_head, edge_tail, edge_relation: (E,) int32 node / relation indices
+        edge_extra_rows / edge_extra: other edge attributes (e.g. source_chunks)
+    """
+    node_ids = list(graph.nodes())
+    node_index = {node_id: index for index, node_id in enumerate(node_ids)}
+
+    label_index = {}
+    node_label = np.empty(len(node_ids), dtype=np.int32)
+    node_level = np.empty(len(node_ids), dtype=np.int16)
+    node_properties = []
+    node_extra_rows, node_extra = [], []
+    for index, (_, data) in enumerate(graph.nodes(data=True)):
+        node_label[index] = label_index.setdefault(data.get("label"), len(label_index))
+        node_level[index] = data.get("level", 2)
+        node_properties.append(data.get("properties", {}))
+        extra = {key: value for key, value in data.items() if key not in ("label", "level", "properties")}
+        if extra:
+            node_extra_rows.append(index)
+            node_extra.append(extra)
+
+    relation_index = {}
+    edge_count = graph.number_of_edges()
+    edge_head = np.empty(edge_count, dtype=np.int32)
+    edge_tail = np.empty(edge_count, dtype=np.int32)
+    edge_relation = np.empty(edge_count, dtype=np.int32)
+    edge_extra_rows, edge_extra = [], []
+    for index, (u, v, data) in enumerate(graph.edges(data=True)):
+        edge_head[index] = node_index[u]
+        edge_tail[index] = node_index[v]
+        edge_relation[index] = relation_index.setdefault(data.get("relation"), len(relation_index))
+        if len(data) > ("relation" in data):
+            edge_extra_rows.append(index)
+            edge_extra.append({key: value for key, value in data.items() if key != "relation"})
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = f"{output_path}.tmp.npz"
+    np.savez_compressed(
+        tmp_path,
+        version=np.array([COMPACT_FORMAT_VERSION]),
+        node_ids=_json_array(node_ids),
+        labels=_json_array(list(label_index)),
+        node_label=node_label,
+        node_level=node_level,
+        node_properties=_json_array(node_properties),
+        node_extra_rows=np.array(node_extra_rows, dtype=np.int32),
+        node_extra=_json_array(node_extra),
+        relations=_json_array(list(relation_index)),
+        edge_head=edge_head,
+        edge_tail=edge_tail,
+        edge_relation=edge_relation,
+        edge_extra_rows=np.array(edge_extra_rows, dtype=np.int32),
+        edge_extra=_json_array(edge_extra),
+    )
+    os.replace(tmp_path, output_path)
+
+
+def load_graph_compact(input_path: str, graph=None) -> nx.MultiDiGraph:
+    """
+    Load a knowledge graph saved with save_graph_compact()
+
+    Unlike load_graph_from_json, edge attributes other than relation (e.g.
+    source_chunks) are preserved as saved. `graph` is an empty graph to load
+    into, as in load_graph_from_json.
+    """
+    with np.load(input_path, allow_pickle=False) as data:
+        version = int(data["version"][0])
+        if version != COMPACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact graph format version {version}: {input_path}")
+
+        node_ids = _json_from_array(data["node_ids"])
+        labels = _json_from_array(data["labels"])
+        node_properties = _json_from_array(data["node_properties"])
+        node_attrs = [
+            {"label": labels[label], "properties": properties, "level": level}
+            for label, level, properties in zip(data["node_label"].tolist(), data["node_level"].tolist(), node_properties)
+        ]
+        for row, extra in zip(data["node_extra_rows"].tolist(), _json_from_array(data["node_extra"])):
+            node_attrs[row].update(extra)
+
+        relations = _json_from_array(data["relations"])
+        edge_attrs = [{"relation": relations[relation]} for relation in data["edge_relation"].tolist()]
+        for row, extra in zip(data["edge_extra_rows"].tolist(), _json_from_array(data["edge_extra"])):
+            edge_attrs[row].update(extra)
+        heads = data["edge_head"].tolist()
+        tails = data["edge_tail"].tolist()
+
+    if graph is None:
+        graph = nx.MultiDiGraph()
+    graph.add_nodes_from(zip(node_ids, node_attrs))
+    graph.add_edges_from(
+        (node_ids[head], node_ids[tail], attrs) for head, tail, attrs in zip(heads, tails, edge_attrs)
+    )
+    return graph
+
+
+def convert_json_to_compact(input_path: str, output_path: str) -> nx.MultiDiGraph:
+    """
+    Convert a legacy JSON edge-list graph file to the compact format
+
+    Node ids are kept as load_graph_from_json reads them, so a graph loaded
+    from either file has the same ids.
+    """
+    graph = load_graph_from_json(input_path)
+    save_graph_compact(graph, output_path)
+    logger.info(
+        f"Converted {input_path} ({os.path.getsize(input_path)} bytes) to {output_path} "
+        f"({os.path.getsize(output_path)} bytes): {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges"
+    )
+    return graph
 
 
 # Legacy function for backward compatibility
 def load_graph(input_path: str) -> nx.MultiDiGraph:
     """
-    Load graph from either JSON or GraphML format (legacy support)
+    Load graph from JSON, compact (.npz) or GraphML format
     """
     if input_path.endswith('.json'):
         return load_graph_from_json(input_path)
+    elif input_path.endswith('.npz'):
+        return load_graph_compact(input_path)
     elif input_path.endswith('.graphml'):
         return load_graph_from_graphml(input_path)
     else:
@@ -208,10 +438,12 @@ def load_graph_from_graphml(input_path: str) -> nx.MultiDiGraph:
 
 def save_graph(graph: nx.MultiDiGraph, output_path: str):
     """
-    Save graph to either JSON or GraphML format based on file extension
+    Save graph to JSON, compact (.npz) or GraphML format based on file extension
     """
     if output_path.endswith('.json'):
         save_graph_to_json(graph, output_path)
+    elif output_path.endswith('.npz'):
+        save_graph_compact(graph, output_path)
     elif output_path.endswith('.graphml'):
         save_graph_to_graphml(graph, output_path)
     else:
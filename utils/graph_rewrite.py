@@ -0,0 +1,124 @@
+"""
+Bulk edge rewriting for node merges.
+
+Instead of moving edges one duplicate at a time (list the edges, scan for a
+similar edge, deep-copy the data, add and remove edges one by one), a whole
+representative mapping is applied in a single pass:
+
+1. collect every edge incident to a remapped node and remap both endpoints
+2. group the remapped edges by (head, relation, tail), together with edges
+   already present between the new endpoints
+3. keep one edge per group (an edge already at the representatives keeps its
+   data, otherwise the first remapped edge is added) and union the group's
+   source_chunks into it
+4. remove the old edges in one batch call
+
+Work is proportional to the number of edges touching remapped nodes, not to
+the size of the graph. Edges that only become self-loops because of the merge
+are dropped; edges that were self-loops before are kept on the representative.
+"""
+
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import networkx as nx
+
+__all__ = ["rewrite_edges"]
+
+
+def _merge_source_chunks(edge_data: Iterable[dict]) -> List:
+    merged = []
+    seen = set()
+    for data in edge_data:
+        for chunk in data.get("source_chunks", []) or []:
+            if chunk not in seen:
+                seen.add(chunk)
+                merged.append(chunk)
+    return merged
+
+
+def rewrite_edges(graph: nx.MultiDiGraph, mapping: Dict[Hashable, Hashable], alias_relation: Optional[str] = None,
+                  alias_relations: Iterable[str] = ()) -> Dict[str, int]:
+    """
+    Redirect every edge of `graph` through `mapping` in place. Nodes are not removed.
+
+    Args:
+        graph: Graph whose edges are rewritten
+        mapping: {node_id: representative_id}; must already be resolved (no chains)
+        alias_relation: When set, each remapped node keeps an edge
+            representative --[alias_relation]--> node, unless one with a relation
+            in alias_relations already exists
+        alias_relations: Relations treated as existing alias edges (alias_relation
+            included); such edges between a node and its representative are kept
+
+    Returns:
+        Statistics: edges_remapped (edges touching a remapped node), edges_removed,
+        edges_added, edges_merged, self_loops_dropped, alias_edges_added
+    """
+    target = {
+        node: representative for node, representative in mapping.items()
+        if node != representative and node in graph and representative in graph
+    }
+    alias_relations = set(alias_relations) | ({alias_relation} if alias_relation is not None else set())
+
+    # Every edge touching a remapped node, once
+    moved = list(target)
+    affected = list(graph.out_edges(moved, keys=True, data=True))
+    affected.extend(edge for edge in graph.in_edges(moved, keys=True, data=True) if edge[0] not in target)
+
+    # (head, relation, tail) -> data dict of the edge now holding that triple
+    placed: Dict[Tuple[Hashable, Hashable, Hashable], dict] = {}
+    to_remove = []
+    edges_added = edges_merged = self_loops_dropped = 0
+    touched = {}  # ordered set of endpoints of affected edges
+
+    for u, v, key, data in affected:
+        new_u, new_v = target.get(u, u), target.get(v, v)
+        relation = data.get("relation")
+        touched[u] = touched[v] = None
+        if new_u == new_v and u != v:
+            if alias_relation is not None and relation in alias_relations:
+                continue  # existing alias edge between a node and its representative
+            to_remove.append((u, v, key))
+            self_loops_dropped += 1
+            continue
+        to_remove.append((u, v, key))
+
+        triple = (new_u, relation, new_v)
+        existing = placed.get(triple)
+        if existing is None:
+            # An edge already between the representatives with the same relation
+            for resident in (graph.get_edge_data(new_u, new_v) or {}).values():
+                if resident.get("relation") == relation:
+                    existing = placed[triple] = resident
+                    break
+        if existing is None:
+            new_key = graph.add_edge(new_u, new_v, **data)
+            placed[triple] = graph[new_u][new_v][new_key]
+            edges_added += 1
+        else:
+            chunks = _merge_source_chunks((existing, data))
+            if chunks:
+                existing["source_chunks"] = chunks
+            edges_merged += 1
+
+    graph.remove_edges_from(to_remove)
+
+    alias_edges_added = 0
+    if alias_relation is not None:
+        for node in touched:
+            representative = target.get(node)
+            if representative is None:
+                continue
+            existing = graph.get_edge_data(representative, node) or {}
+            if not any(data.get("relation") in alias_relations for data in existing.values()):
+                graph.add_edge(representative, node, relation=alias_relation)
+                alias_edges_added += 1
+
+    return {
+        "edges_remapped": len(affected),
+        "edges_removed": len(to_remove),
+        "edges_added": edges_added + alias_edges_added,
+        "edges_merged": edges_merged,
+        "self_loops_dropped": self_loops_dropped,
+        "alias_edges_added": alias_edges_added,
+    }
@@ -0,0 +1,62 @@
+"""
+Frozen, compact snapshot of a graph's structure.
+
+Dedup passes used to keep `copy.deepcopy(self.graph)` as the "original graph",
+but the copy is only read to build LLM cache keys and for reporting. That
+doubles memory on large graphs (every node and edge attribute dict is copied)
+and takes minutes. A snapshot keeps only what those readers need: node and
+edge counts plus the sorted node ids and edge descriptors, serialized once as
+JSON fragments. The snapshot is immutable, so it stays valid while the live
+graph is rewritten.
+"""
+
+import hashlib
+import json
+from typing import Optional
+
+import networkx as nx
+
+__all__ = ["GraphSnapshot"]
+
+
+def _edge_descriptor(graph: nx.MultiDiGraph, u, v, key) -> str:
+    """Edge descriptor used in LLM cache keys; unchanged so existing caches stay valid"""
+    return f"{u}({graph.nodes[u]['properties']['name']})-{v}({graph.nodes[v]['properties']['name']})  -{key}"
+
+
+class GraphSnapshot:
+    """Immutable node/edge fingerprint of a graph at one point in time"""
+
+    __slots__ = ("node_count", "edge_count", "nodes_json", "edges_json", "_digest")
+
+    def __init__(self, node_count: int, edge_count: int, nodes_json: str, edges_json: str):
+        self.node_count = node_count
+        self.edge_count = edge_count
+        # json.dumps(sorted(...), ensure_ascii=False) of node ids and edge descriptors
+        self.nodes_json = nodes_json
+        self.edges_json = edges_json
+        self._digest: Optional[str] = None
+
+    @classmethod
+    def from_graph(cls, graph: nx.MultiDiGraph) -> "GraphSnapshot":
+        nodes = sorted(str(node) for node in graph.nodes())
+        nodes_json = json.dumps(nodes, ensure_ascii=False)
+        del nodes
+        edges = sorted(_edge_descriptor(graph, u, v, key) for u, v, key in graph.edges(keys=True))
+        edge_count = len(edges)
+        edges_json = json.dumps(edges, ensure_ascii=False)
+        del edges
+        return cls(graph.number_of_nodes(), edge_count, nodes_json, edges_json)
+
+    @property
+    def digest(self) -> str:
+        """Short hash of the snapshot, for reporting"""
+        if self._digest is None:
+            sha = hashlib.sha256()
+            sha.update(self.nodes_json.encode("utf-8"))
+            sha.update(self.edges_json.encode("utf-8"))
+            self._digest = sha.hexdigest()[:16]
+        return self._digest
+
+    def __repr__(self) -> str:
+        return f"GraphSnapshot(nodes={self.node_count}, edges={self.edge_count}, digest={self.digest})"
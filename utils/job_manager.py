@@ -0,0 +1,226 @@
+"""
+Background job manager for long-running work such as graph construction.
+
+Jobs run on a bounded thread pool, report progress through a callback, can be
+cancelled cooperatively via a threading.Event, and have their state persisted
+as one JSON file per job so status survives a server restart.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.logger import logger
+
+__all__ = ["JobManager", "JOB_ACTIVE_STATES", "JOB_FINAL_STATES"]
+
+JOB_ACTIVE_STATES = ("queued", "running")
+JOB_FINAL_STATES = ("succeeded", "failed", "cancelled", "interrupted")
+
+# Minimum seconds between progress writes to disk (stage changes are always written)
+PERSIST_INTERVAL_SECONDS = 1.0
+
+ProgressFn = Callable[[str, float, str], None]
+JobTarget = Callable[[ProgressFn, threading.Event], Any]
+
+
+class JobManager:
+    """Run jobs in the background and track their status, progress and result."""
+
+    def __init__(self, jobs_dir: str = "output/jobs", max_concurrent_jobs: int = 1):
+        """
+        Args:
+            jobs_dir: Directory where job state files are written
+            max_concurrent_jobs: Number of jobs allowed to run at the same time
+        """
+        self.jobs_dir = jobs_dir
+        self.max_concurrent_jobs = max(1, int(max_concurrent_jobs))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent_jobs, thread_name_prefix="job")
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._futures: Dict[str, Future] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._last_persist: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self._load_persisted_jobs()
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _persist(self, job: Dict[str, Any]) -> None:
+        """Atomically write the job record to disk"""
+        path = self._job_path(job["job_id"])
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(job, f, ensure_ascii=False, indent=2, default=str)
+            os.replace(tmp_path, path)
+            self._last_persist[job["job_id"]] = time.time()
+        except Exception as e:
+            logger.warning(f"Failed to persist job {job['job_id']}: {type(e).__name__}: {e}")
+
+    def _load_persisted_jobs(self) -> None:
+        """Load job records from a previous run; unfinished jobs are marked interrupted"""
+        for filename in os.listdir(self.jobs_dir):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, filename), "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable job file {filename}: {type(e).__name__}: {e}")
+                continue
+
+            if job.get("status") in JOB_ACTIVE_STATES:
+                job["status"] = "interrupted"
+                job["finished_at"] = datetime.now().isoformat()
+                job["error"] = "Server restarted before the job finished"
+                self._persist(job)
+            self._jobs[job["job_id"]] = job
+
+        if self._jobs:
+            logger.info(f"Loaded {len(self._jobs)} persisted jobs from {self.jobs_dir}")
+
+    def submit(self, kind: str, params: Dict[str, Any], target: JobTarget) -> str:
+        """
+        Queue a job and return its id.
+
+        Args:
+            kind: Job type, e.g. "construct_graph"
+            params: JSON-serializable parameters recorded with the job
+            target: Callable receiving (progress, cancel_event); its return value is stored as the result
+
+        Returns:
+            The new job id
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "job_id": job_id,
+            "kind": kind,
+            "params": params,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0.0,
+            "message": "Waiting for a free worker...",
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "result": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._cancel_events[job_id] = threading.Event()
+            self._persist(job)
+            self._futures[job_id] = self._executor.submit(self._run, job_id, target)
+
+        logger.info(f"Submitted job {job_id} ({kind}) with params {params}")
+        return job_id
+
+    def _run(self, job_id: str, target: JobTarget) -> None:
+        cancel_event = self._cancel_events[job_id]
+        with self._lock:
+            job = self._jobs[job_id]
+            if cancel_event.is_set():
+                self._finish(job, "cancelled")
+                return
+            job["status"] = "running"
+            job["started_at"] = datetime.now().isoformat()
+            self._persist(job)
+
+        def progress(stage: str, percent: float, message: str = "") -> None:
+            self.update_progress(job_id, stage, percent, message)
+
+        try:
+            result = target(progress, cancel_event)
+        except Exception as e:
+            with self._lock:
+                if cancel_event.is_set():
+                    self._finish(job, "cancelled")
+                else:
+                    job["error"] = f"{type(e).__name__}: {e}"
+                    self._finish(job, "failed")
+            logger.error(f"Job {job_id} ended with {job['status']}: {type(e).__name__}: {e}")
+            return
+
+        with self._lock:
+            job["result"] = result
+            job["progress"] = 100.0
+            self._finish(job, "succeeded")
+        logger.info(f"Job {job_id} succeeded")
+
+    def _finish(self, job: Dict[str, Any], status: str) -> None:
+        job["status"] = status
+        job["finished_at"] = datetime.now().isoformat()
+        self._futures.pop(job["job_id"], None)
+        self._persist(job)
+
+    def update_progress(self, job_id: str, stage: str, percent: float, message: str = "") -> None:
+        """Record job progress; writes to disk are throttled except on stage changes"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] in JOB_FINAL_STATES:
+                return
+            stage_changed = job["stage"] != stage
+            job["stage"] = stage
+            job["progress"] = round(max(0.0, min(100.0, float(percent))), 2)
+            job["message"] = message
+            last = self._last_persist.get(job_id, 0.0)
+            if stage_changed or time.time() - last >= PERSIST_INTERVAL_SECONDS:
+                self._persist(job)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Request cancellation. Queued jobs are cancelled immediately; running jobs
+        stop at their next progress checkpoint.
+
+        Returns:
+            False if the job does not exist or has already finished
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in JOB_ACTIVE_STATES:
+                return False
+            self._cancel_events[job_id].set()
+            future = self._futures.get(job_id)
+            if job["status"] == "queued" and future is not None and future.cancel():
+                self._finish(job, "cancelled")
+            else:
+                job["message"] = "Cancellation requested..."
+                self._persist(job)
+        logger.info(f"Cancellation requested for job {job_id}")
+        return True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list_jobs(self, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = [dict(job) for job in self._jobs.values() if kind is None or job["kind"] == kind]
+        return sorted(jobs, key=lambda job: job["created_at"], reverse=True)
+
+    def find_active(self, kind: str, **params) -> Optional[Dict[str, Any]]:
+        """Return an active job of the given kind whose params match, if any"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job["kind"] != kind or job["status"] not in JOB_ACTIVE_STATES:
+                    continue
+                if all(job["params"].get(key) == value for key, value in params.items()):
+                    return dict(job)
+        return None
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Cancel all active jobs and stop the worker pool"""
+        with self._lock:
+            active_ids = [job_id for job_id, job in self._jobs.items() if job["status"] in JOB_ACTIVE_STATES]
+        for job_id in active_ids:
+            self.cancel(job_id)
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,63 @@
+"""
+Deferred imports for heavy optional dependencies.
+
+torch, faiss, spacy, sentence-transformers and scikit-learn together add
+several seconds to interpreter startup. Modules that only need them on some
+code paths bind a LazyModule at import time; the real module is imported the
+first time one of its attributes is accessed.
+"""
+
+import importlib
+import threading
+from types import ModuleType
+from typing import Optional
+
+__all__ = ["LazyModule", "lazy_import", "is_loaded"]
+
+_import_lock = threading.RLock()
+
+
+class LazyModule(ModuleType):
+    """Module proxy that imports the target module on first attribute access"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_target"] = name
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self) -> ModuleType:
+        module: Optional[ModuleType] = self.__dict__["_lazy_module"]
+        if module is None:
+            with _import_lock:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    module = importlib.import_module(self.__dict__["_lazy_target"])
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, item: str):
+        return getattr(self._load(), item)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module '{self.__dict__['_lazy_target']}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Return a proxy for module `name` that is imported on first use.
+
+    Args:
+        name: Dotted module name, e.g. "torch" or "torch.nn.functional"
+    """
+    return LazyModule(name)
+
+
+def is_loaded(module) -> bool:
+    """Whether a LazyModule has been materialized (always True for real modules)"""
+    if isinstance(module, LazyModule):
+        return module.__dict__["_lazy_module"] is not None
+    return True
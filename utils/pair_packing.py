@@ -0,0 +1,95 @@
+"""
+Packing of candidate entity pairs into multi-pair LLM prompts.
+
+Pairs are grouped by connected component of the candidate graph, so pairs
+that share entities land in the same pack and each entity's context is sent
+once per pack instead of once per pair. Within a component, entities are
+visited breadth-first from the highest-degree entity, which keeps hubs and
+their neighbours together when a component has to be split across packs.
+"""
+
+from collections import defaultdict, deque
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+__all__ = ["pack_pairs"]
+
+
+def _components(pairs: Sequence[Tuple[Hashable, Hashable]]) -> List[List[int]]:
+    """Pair indices grouped by connected component, in order of first appearance"""
+    parent: Dict[Hashable, Hashable] = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    components: Dict[Hashable, List[int]] = {}
+    for index, (a, _) in enumerate(pairs):
+        components.setdefault(find(a), []).append(index)
+    return list(components.values())
+
+
+def _bfs_order(pairs: Sequence[Tuple[Hashable, Hashable]], pair_indices: List[int]) -> Dict[Hashable, int]:
+    neighbours = defaultdict(list)
+    for index in pair_indices:
+        a, b = pairs[index]
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+
+    # Highest degree first; ties keep first-appearance order
+    start = max(neighbours, key=lambda node: len(neighbours[node]))
+    rank = {start: 0}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for neighbour in sorted(neighbours[node], key=lambda n: -len(neighbours[n])):
+            if neighbour not in rank:
+                rank[neighbour] = len(rank)
+                queue.append(neighbour)
+    return rank
+
+
+def pack_pairs(pairs: Sequence[Tuple[Hashable, Hashable]], max_entities: int = 8,
+               max_pairs: int = 12) -> List[List[int]]:
+    """
+    Partition pairs into packs of at most max_pairs pairs over at most max_entities distinct entities.
+
+    Args:
+        pairs: (entity_a, entity_b) candidate pairs
+        max_entities: Distinct entities allowed in one pack (at least 2)
+        max_pairs: Pairs allowed in one pack (at least 1)
+
+    Returns:
+        Packs as lists of indices into `pairs`; every index appears in exactly one pack
+    """
+    max_entities = max(2, max_entities)
+    max_pairs = max(1, max_pairs)
+
+    packs: List[List[int]] = []
+    for component in _components(pairs):
+        rank = _bfs_order(pairs, component)
+        ordered = sorted(
+            component,
+            key=lambda i: (min(rank[pairs[i][0]], rank[pairs[i][1]]), max(rank[pairs[i][0]], rank[pairs[i][1]]), i)
+        )
+
+        current: List[int] = []
+        entities = set()
+        for index in ordered:
+            a, b = pairs[index]
+            new_entities = entities | {a, b}
+            if current and (len(current) >= max_pairs or len(new_entities) > max_entities):
+                packs.append(current)
+                current, new_entities = [], {a, b}
+            current.append(index)
+            entities = new_entities
+        if current:
+            packs.append(current)
+    return packs
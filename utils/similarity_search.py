@@ -0,0 +1,174 @@
+"""
+Memory-bounded similar-pair search over embedding matrices.
+
+Replaces dense N×N cosine-similarity matrices with either
+- a FAISS inner-product kNN search (when faiss is installed and the input is
+  large), or
+- blocked matrix multiplication: one tile of rows against all columns at a time,
+  keeping only the upper triangle above the threshold.
+
+Pairs are streamed into a bounded min-heap, so memory stays
+O(tile + max_pairs) no matter how many pairs clear the threshold.
+"""
+
+import heapq
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from utils.logger import logger
+
+__all__ = ["normalize_rows", "iter_similar_pairs", "top_similar_pairs", "top_scored_pairs"]
+
+# Bytes allowed for one similarity tile in the blocked matmul path
+DEFAULT_TILE_BYTES = 256 * 1024 * 1024
+# Below this many vectors the blocked path is as fast as FAISS and exact
+FAISS_MIN_VECTORS = 20000
+
+
+def normalize_rows(embeddings) -> np.ndarray:
+    """Return a float32 copy with L2-normalized rows (zero rows stay zero)"""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2:
+        raise ValueError(f"Expected a 2-D embedding matrix, got shape {matrix.shape}")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _load_faiss():
+    try:
+        import faiss
+        return faiss
+    except ImportError:
+        return None
+
+
+def _iter_pairs_blocked(matrix: np.ndarray, threshold: float, tile_bytes: int,
+                        max_pairs_per_tile: Optional[int]) -> Iterator[Tuple[int, int, float]]:
+    n = matrix.shape[0]
+    rows_per_tile = max(1, min(n, tile_bytes // max(1, n * 4)))
+    for start in range(0, n, rows_per_tile):
+        end = min(n, start + rows_per_tile)
+        # Only columns after the tile start can form i < j pairs
+        sims = matrix[start:end] @ matrix[start:].T
+        row_idx, col_idx = np.nonzero(sims >= threshold)
+        col_abs = col_idx + start
+        upper = col_abs > row_idx + start
+        row_idx, col_abs = row_idx[upper], col_abs[upper]
+        if not len(row_idx):
+            continue
+        scores = sims[row_idx, col_abs - start]
+        if max_pairs_per_tile is not None and len(scores) > max_pairs_per_tile:
+            keep = np.argpartition(-scores, max_pairs_per_tile - 1)[:max_pairs_per_tile]
+            row_idx, col_abs, scores = row_idx[keep], col_abs[keep], scores[keep]
+        for i, j, score in zip(row_idx + start, col_abs, scores):
+            yield int(i), int(j), float(score)
+
+
+def _iter_pairs_faiss(faiss, matrix: np.ndarray, threshold: float, k: int,
+                      query_batch: int) -> Iterator[Tuple[int, int, float]]:
+    n, dim = matrix.shape
+    index = faiss.IndexFlatIP(dim)
+    index.add(matrix)
+    k = min(k + 1, n)  # +1: every vector is its own nearest neighbour
+    for start in range(0, n, query_batch):
+        end = min(n, start + query_batch)
+        scores, neighbours = index.search(matrix[start:end], k)
+        for offset in range(end - start):
+            i = start + offset
+            for j, score in zip(neighbours[offset], scores[offset]):
+                if j < 0 or j == i or score < threshold:
+                    continue
+                yield (i, int(j), float(score)) if i < j else (int(j), i, float(score))
+
+
+def iter_similar_pairs(embeddings, threshold: float, k: int = 50, use_faiss: Optional[bool] = None,
+                       tile_bytes: int = DEFAULT_TILE_BYTES,
+                       max_pairs_per_tile: Optional[int] = None) -> Iterator[Tuple[int, int, float]]:
+    """
+    Yield (i, j, cosine) for row pairs whose cosine similarity is >= threshold.
+
+    The blocked path is exact and yields each pair once with i < j. The FAISS path
+    only considers each row's k nearest neighbours and may yield a pair twice
+    (once from each side), which top_similar_pairs deduplicates.
+
+    Args:
+        embeddings: (n, d) matrix; rows are normalized internally
+        threshold: Minimum cosine similarity
+        k: Neighbours per row for the FAISS kNN path
+        use_faiss: Force (True) or disable (False) FAISS; None picks by size and availability
+        tile_bytes: Memory budget for one similarity tile in the blocked path
+        max_pairs_per_tile: Keep only the best pairs of each tile (blocked path)
+    """
+    matrix = normalize_rows(embeddings)
+    if matrix.shape[0] < 2:
+        return iter(())
+
+    faiss = None
+    if use_faiss or (use_faiss is None and matrix.shape[0] >= FAISS_MIN_VECTORS):
+        faiss = _load_faiss()
+        if faiss is None and use_faiss:
+            logger.warning("faiss is not installed, falling back to blocked similarity search")
+
+    if faiss is not None:
+        return _iter_pairs_faiss(faiss, np.ascontiguousarray(matrix), threshold, k, query_batch=4096)
+    return _iter_pairs_blocked(matrix, threshold, tile_bytes, max_pairs_per_tile)
+
+
+def top_similar_pairs(embeddings, threshold: float, max_pairs: int, k: int = 50,
+                      use_faiss: Optional[bool] = None,
+                      tile_bytes: int = DEFAULT_TILE_BYTES) -> List[Tuple[int, int, float]]:
+    """
+    Return up to max_pairs (i, j, cosine) pairs above threshold, most similar first.
+
+    Ties are broken by (i, j) so results are deterministic.
+    """
+    if max_pairs <= 0:
+        return []
+
+    heap: List[Tuple[float, int, int]] = []
+    in_heap = set()
+    for i, j, score in iter_similar_pairs(embeddings, threshold, k=k, use_faiss=use_faiss,
+                                          tile_bytes=tile_bytes, max_pairs_per_tile=max_pairs):
+        if (i, j) in in_heap:
+            continue
+        # Min-heap on (score, -i, -j): the root is the pair that ranks last
+        entry = (score, -i, -j)
+        if len(heap) < max_pairs:
+            heapq.heappush(heap, entry)
+            in_heap.add((i, j))
+        elif entry > heap[0]:
+            _, old_i, old_j = heapq.heapreplace(heap, entry)
+            in_heap.discard((-old_i, -old_j))
+            in_heap.add((i, j))
+
+    return [(-neg_i, -neg_j, score) for score, neg_i, neg_j in sorted(heap, reverse=True)]
+
+
+def top_scored_pairs(embeddings, left, right, threshold: float, max_pairs: int,
+                     batch_size: int = 16384) -> List[Tuple[int, int, float]]:
+    """
+    Score only the given (left[k], right[k]) row pairs, e.g. pairs produced by blocking.
+
+    Returns up to max_pairs (i, j, cosine) pairs above threshold, most similar first.
+    """
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+    if max_pairs <= 0 or not len(left):
+        return []
+
+    matrix = normalize_rows(embeddings)
+    kept_i, kept_j, kept_scores = [], [], []
+    for start in range(0, len(left), batch_size):
+        i, j = left[start:start + batch_size], right[start:start + batch_size]
+        scores = np.einsum("ij,ij->i", matrix[i], matrix[j])
+        mask = scores >= threshold
+        kept_i.append(i[mask])
+        kept_j.append(j[mask])
+        kept_scores.append(scores[mask])
+
+    i, j, scores = np.concatenate(kept_i), np.concatenate(kept_j), np.concatenate(kept_scores)
+    # Sort by score descending, then (i, j) for deterministic ties
+    order = np.lexsort((j, i, -scores))[:max_pairs]
+    return [(int(i[k]), int(j[k]), float(scores[k])) for k in order]
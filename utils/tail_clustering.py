@@ -0,0 +1,167 @@
+"""
+Tiered clustering of tail embeddings for semantic deduplication.
+
+Small groups keep the exact average-linkage clustering over a dense distance
+matrix. Dense matrices are O(n²) memory, so large groups (e.g. hub heads with
+tens of thousands of tails) switch to one of:
+- "graph": connected components of a threshold graph that links each vector
+  to its k nearest neighbours above the similarity threshold (FAISS kNN when
+  installed, otherwise tiled matrix multiplication)
+- "hdbscan": sklearn's HDBSCAN on the normalized vectors; noise points become
+  singleton clusters
+
+All methods return the same format: a list of clusters, each a sorted list of
+row indices, ordered by their first member.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+
+from utils.logger import logger
+from utils.similarity_search import FAISS_MIN_VECTORS, _load_faiss, normalize_rows
+
+__all__ = ["CLUSTERING_METHODS", "cluster_embeddings", "knn_threshold_edges"]
+
+CLUSTERING_METHODS = ("auto", "exact", "graph", "hdbscan")
+
+DEFAULT_TILE_BYTES = 128 * 1024 * 1024
+
+
+def _labels_to_clusters(labels) -> List[List[int]]:
+    clusters = {}
+    for idx, label in enumerate(np.asarray(labels).tolist()):
+        clusters.setdefault(label, []).append(idx)
+    return sorted(clusters.values(), key=lambda members: members[0])
+
+
+def _cluster_exact(matrix: np.ndarray, threshold: float) -> List[List[int]]:
+    """Average-linkage agglomerative clustering on the dense cosine distance matrix"""
+    from sklearn.cluster import AgglomerativeClustering
+
+    similarity_matrix = matrix.astype(np.float64) @ matrix.T.astype(np.float64)
+    distance_matrix = 1 - similarity_matrix
+    # Symmetric with a zero diagonal, as required for a precomputed metric
+    distance_matrix = (distance_matrix + distance_matrix.T) / 2
+    np.fill_diagonal(distance_matrix, 0)
+
+    clustering = AgglomerativeClustering(
+        n_clusters=None,
+        distance_threshold=1 - threshold,
+        linkage="average",
+        metric="precomputed"
+    )
+    return _labels_to_clusters(clustering.fit_predict(distance_matrix))
+
+
+def knn_threshold_edges(matrix: np.ndarray, threshold: float, k: int, use_faiss: Optional[bool] = None,
+                        tile_bytes: int = DEFAULT_TILE_BYTES):
+    """
+    Edges (rows, cols) from each normalized row to its k nearest neighbours with cosine >= threshold.
+
+    Uses FAISS when requested, or automatically for large inputs when it is installed.
+    """
+    n = matrix.shape[0]
+    k = max(1, min(k, n - 1))
+
+    faiss = None
+    if use_faiss or (use_faiss is None and n >= FAISS_MIN_VECTORS):
+        faiss = _load_faiss()
+        if faiss is None and use_faiss:
+            logger.warning("faiss is not installed, falling back to tiled kNN search")
+
+    rows, cols = [], []
+    if faiss is not None:
+        index = faiss.IndexFlatIP(matrix.shape[1])
+        index.add(np.ascontiguousarray(matrix))
+        scores, neighbours = index.search(np.ascontiguousarray(matrix), k + 1)
+        source = np.repeat(np.arange(n), k + 1).reshape(n, k + 1)
+        keep = (neighbours >= 0) & (neighbours != source) & (scores >= threshold)
+        return source[keep], neighbours[keep]
+
+    rows_per_tile = max(1, min(n, tile_bytes // max(1, n * 4)))
+    for start in range(0, n, rows_per_tile):
+        end = min(n, start + rows_per_tile)
+        sims = matrix[start:end] @ matrix.T
+        sims[np.arange(end - start), np.arange(start, end)] = -np.inf  # no self edges
+        neighbours = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(sims, neighbours, axis=1)
+        local_rows, ranks = np.nonzero(scores >= threshold)
+        rows.append(local_rows + start)
+        cols.append(neighbours[local_rows, ranks])
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+def _cluster_graph(matrix: np.ndarray, threshold: float, k: int, use_faiss: Optional[bool]) -> List[List[int]]:
+    """Connected components of the kNN threshold graph"""
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n = matrix.shape[0]
+    rows, cols = knn_threshold_edges(matrix, threshold, k, use_faiss=use_faiss)
+    graph = coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    return _labels_to_clusters(labels)
+
+
+def _cluster_hdbscan(matrix: np.ndarray, threshold: float, min_cluster_size: int) -> List[List[int]]:
+    """HDBSCAN on normalized vectors; noise points (label -1) become singletons"""
+    from sklearn.cluster import HDBSCAN
+
+    # For unit vectors, euclidean distance = sqrt(2 - 2 * cosine)
+    epsilon = float(np.sqrt(max(0.0, 2.0 - 2.0 * threshold)))
+    labels = HDBSCAN(
+        min_cluster_size=max(2, min_cluster_size),
+        cluster_selection_epsilon=epsilon,
+        metric="euclidean"
+    ).fit_predict(matrix)
+    labels = np.asarray(labels).copy()
+    noise = np.flatnonzero(labels < 0)
+    labels[noise] = labels.max(initial=-1) + 1 + np.arange(len(noise))
+    return _labels_to_clusters(labels)
+
+
+def cluster_embeddings(embeddings, threshold: float, method: str = "auto", exact_max_size: int = 2000,
+                       knn_k: int = 30, use_faiss: Optional[bool] = None,
+                       hdbscan_min_cluster_size: int = 2) -> List[List[int]]:
+    """
+    Group rows whose cosine similarity clears `threshold`.
+
+    Args:
+        embeddings: (n, d) matrix; rows are normalized internally
+        threshold: Cosine similarity threshold
+        method: "exact", "graph", "hdbscan", or "auto" (exact up to exact_max_size rows, graph above)
+        exact_max_size: Largest group clustered exactly when method is "auto"
+        knn_k: Neighbours per row in the graph method
+        use_faiss: Force (True) or disable (False) FAISS for the graph method; None picks by size
+        hdbscan_min_cluster_size: min_cluster_size passed to HDBSCAN
+
+    Returns:
+        Clusters as sorted lists of row indices, ordered by their first member
+    """
+    matrix = normalize_rows(embeddings)
+    n = matrix.shape[0]
+    if n <= 1:
+        return [list(range(n))]
+
+    if method not in CLUSTERING_METHODS:
+        logger.warning(f"Unknown clustering method '{method}', using 'auto'")
+        method = "auto"
+    if method == "auto":
+        method = "exact" if n <= exact_max_size else "graph"
+
+    if method == "hdbscan":
+        try:
+            return _cluster_hdbscan(matrix, threshold, hdbscan_min_cluster_size)
+        except ImportError:
+            logger.warning("sklearn HDBSCAN not available, using threshold-graph clustering")
+            method = "graph"
+    if method == "exact":
+        try:
+            return _cluster_exact(matrix, threshold)
+        except ImportError:
+            logger.warning("sklearn not available, using threshold-graph clustering")
+    return _cluster_graph(matrix, threshold, knn_k, use_faiss)
@@ -1,20 +1,23 @@
+import hashlib
 import json
-import time
+import os
 import warnings
 from collections import defaultdict
-from typing import Dict, List
+from concurrent import futures
+from typing import Dict, List, Optional, Tuple
 
 import networkx as nx
 import numpy as np
-import scipy.sparse as sp
-import torch
 import json_repair
-from sentence_transformers import SentenceTransformer
-from sklearn.cluster import KMeans
-from sklearn.metrics.pairwise import cosine_similarity
 
-from utils import call_llm_api
+from utils import call_llm_api, embedding_store
+from utils.lazy_import import lazy_import
 from utils.logger import logger
+from utils.similarity_search import normalize_rows
+from utils.tail_clustering import knn_threshold_edges
+
+# Heavy dependencies are imported on first use to keep CLI/API startup fast
+sp = lazy_import("scipy.sparse")
 
 
 warnings.filterwarnings('ignore')
@@ -25,6 +28,107 @@ except ImportError:
     get_config = None
 
 
+COMMUNITY_ENGINES = ("kmeans", "minibatch_kmeans", "louvain")
+
+
+def similarity_graph(embeddings, adjacency, struct_weight=0.3, knn_k=10, knn_threshold=0.5):
+    """
+    Sparse symmetric similarity graph over nodes for graph-based clustering
+
+    Semantic edges link each node to its knn_k nearest neighbours with cosine
+    >= knn_threshold, weighted (1 - struct_weight) * cosine; structural edges
+    add struct_weight for every pair linked in `adjacency`. Builds in
+    O(n * k) memory instead of the dense n x n matrix.
+    """
+    n = embeddings.shape[0]
+    if n <= 1:
+        return sp.csr_matrix((n, n), dtype=np.float32)
+
+    normalized = normalize_rows(embeddings)
+    rows, cols = knn_threshold_edges(normalized, knn_threshold, knn_k)
+    scores = pair_cosine(normalized, rows, cols)
+    semantic = sp.csr_matrix(((1 - struct_weight) * scores, (rows, cols)), shape=(n, n), dtype=np.float32)
+    semantic = semantic.maximum(semantic.T)
+
+    structural = sp.csr_matrix(adjacency, dtype=np.float32, copy=True)
+    structural.data[:] = 1.0
+    structural = structural.maximum(structural.T)
+    structural.setdiag(0)
+    structural.eliminate_zeros()
+
+    return (semantic + struct_weight * structural).tocsr()
+
+
+def pair_cosine(normalized, rows, cols, chunk_size: int = 65536) -> np.ndarray:
+    """Row-wise dot products of normalized[rows] and normalized[cols], gathered a chunk of pairs at a time"""
+    scores = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), chunk_size):
+        end = start + chunk_size
+        scores[start:end] = np.einsum("ij,ij->i", normalized[rows[start:end]], normalized[cols[start:end]])
+    return scores
+
+
+def top_k_per_row(matrix, k: int):
+    """(rows, cols, values) of the k largest stored entries in each row of a sparse matrix"""
+    matrix = sp.coo_matrix(matrix)
+    order = np.lexsort((-matrix.data, matrix.row))
+    rows, cols, values = matrix.row[order], matrix.col[order], matrix.data[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows, side="left")
+    keep = rank < k
+    return rows[keep], cols[keep], values[keep]
+
+
+def _binary_adjacency(adjacency):
+    adjacency = sp.csr_matrix(adjacency, dtype=np.float32, copy=True)
+    adjacency.data[:] = 1.0
+    return adjacency
+
+
+def jaccard_pairs(adjacency, rows, cols) -> np.ndarray:
+    """Jaccard similarity of the neighbour sets (adjacency rows) of each (row, col) pair"""
+    adjacency = _binary_adjacency(adjacency)
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+    intersection = np.asarray(adjacency[rows].multiply(adjacency[cols]).sum(axis=1)).ravel()
+    return intersection / (degrees[rows] + degrees[cols] - intersection + 1e-9)
+
+
+def jaccard_top_k(adjacency, k: int, block_rows: int = 4096):
+    """
+    (rows, cols, values) of each node's k most Jaccard-similar other nodes
+
+    Shared-neighbour counts are computed one block of rows at a time as a
+    sparse product, so only pairs with a common neighbour are materialized.
+    """
+    adjacency = _binary_adjacency(adjacency)
+    n = adjacency.shape[0]
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+    adjacency_t = adjacency.T.tocsr()
+
+    rows, cols, values = [], [], []
+    for start in range(0, n, block_rows):
+        intersection = (adjacency[start:start + block_rows] @ adjacency_t).tocoo()
+        block_row = intersection.row + start
+        keep = block_row != intersection.col
+        block_row, block_col, shared = block_row[keep], intersection.col[keep], intersection.data[keep]
+        jaccard = shared / (degrees[block_row] + degrees[block_col] - shared + 1e-9)
+        block = sp.coo_matrix((jaccard, (block_row - start, block_col)), shape=(min(block_rows, n - start), n))
+        block_rows_k, block_cols_k, block_values_k = top_k_per_row(block, k)
+        rows.append(block_rows_k + start)
+        cols.append(block_cols_k)
+        values.append(block_values_k)
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+
+
+def louvain_partition(weights, resolution=1.0, seed=42) -> List[List[int]]:
+    """Louvain communities of a sparse weighted graph, as sorted row indices"""
+    sim_graph = nx.from_scipy_sparse_array(weights, edge_attribute="weight")
+    communities = nx.community.louvain_communities(sim_graph, weight="weight", resolution=resolution, seed=seed)
+    return sorted((sorted(community) for community in communities), key=lambda members: members[0])
+
+
 class FastTreeComm:
     def __init__(self, graph, embedding_model="all-MiniLM-L6-v2", struct_weight=0.3, config=None):
         """
@@ -44,7 +148,30 @@ class FastTreeComm:
         if config:
             embedding_model = embedding_model or config.tree_comm.embedding_model
             struct_weight = struct_weight if struct_weight != 0.3 else config.tree_comm.struct_weight
-        
+
+        tree_comm_config = getattr(config, "tree_comm", None)
+        self.naming_max_workers = max(1, int(getattr(tree_comm_config, "naming_max_workers", 8)))
+        self.naming_token_budget = max(1, int(getattr(tree_comm_config, "naming_token_budget", 2000)))
+        self.naming_max_batch_size = max(1, int(getattr(tree_comm_config, "naming_max_batch_size", 20)))
+        self.naming_min_llm_size = int(getattr(tree_comm_config, "naming_min_llm_size", 3))
+        self.naming_cache_path = getattr(tree_comm_config, "naming_cache_path", "cache/community_names.json")
+        self.community_engine = str(getattr(tree_comm_config, "community_engine", "kmeans")).lower()
+        if self.community_engine not in COMMUNITY_ENGINES:
+            raise ValueError(f"Unknown community engine {self.community_engine!r}, expected one of {COMMUNITY_ENGINES}")
+        self.louvain_resolution = float(getattr(tree_comm_config, "louvain_resolution", 1.0))
+        self.community_knn_k = max(1, int(getattr(tree_comm_config, "community_knn_k", 10)))
+        self.community_knn_threshold = float(getattr(tree_comm_config, "community_knn_threshold", 0.5))
+        self.sim_top_k = max(1, int(getattr(tree_comm_config, "sim_top_k", 20)))
+        self.embedding_batch_size = max(1, int(getattr(tree_comm_config, "embedding_batch_size", 128)))
+        self.incremental_assign_threshold = float(getattr(tree_comm_config, "incremental_assign_threshold", 0.5))
+        self.incremental_size_drift = float(getattr(tree_comm_config, "incremental_size_drift", 0.5))
+        self.incremental_cohesion_drift = float(getattr(tree_comm_config, "incremental_cohesion_drift", 0.1))
+        embeddings_config = getattr(config, "embeddings", None)
+        self.embedding_store = embedding_store.open_store(
+            getattr(embeddings_config, "store_path", "cache/embeddings"), embedding_model
+        )
+        
+        from sentence_transformers import SentenceTransformer
         self.model = SentenceTransformer(embedding_model)
         self.semantic_cache = {}
         self.struct_weight = struct_weight
@@ -104,65 +231,64 @@ class FastTreeComm:
 
     def get_triple_embedding(self, node_id):
         """leverage triple-level embedding to represent one node"""
-        if node_id not in self.semantic_cache:
-            triples = self.triple_strings_cache.get(node_id, [])
-            text = ", ".join(triples) if triples else self.graph.nodes[node_id]["properties"]["name"]
-            self.semantic_cache[node_id] = self.model.encode(text)
-        return self.semantic_cache[node_id]
-    
+        return self.get_triple_embeddings_batch([node_id])[0]
+
+    def _triple_text(self, node_id):
+        triples = self.triple_strings_cache.get(node_id, [])
+        return " ".join(triples) if triples else self.node_names[node_id]
+
+    def _encode_texts(self, texts):
+        # SentenceTransformer.encode already runs without gradient tracking
+        return self.model.encode(texts, batch_size=self.embedding_batch_size, convert_to_numpy=True)
+
     def get_triple_embeddings_batch(self, node_ids):
-        """Batch processing for GPU acceleration with optimized caching"""
+        """
+        Triple embeddings of `node_ids`, read through the persistent embedding store
+
+        Texts already in the store (from earlier runs or other nodes with the
+        same triples) are not re-encoded; the rest are encoded in batches of
+        embedding_batch_size.
+        """
         uncached_ids = [nid for nid in node_ids if nid not in self.semantic_cache]
         
         if uncached_ids:
-            texts = []
-            for nid in uncached_ids:
-                triples = self.triple_strings_cache.get(nid, [])
-                text = " ".join(triples) if triples else self.node_names[nid]
-                texts.append(text)
-            
-            with torch.no_grad():
-                embeddings = self.model.encode(texts, convert_to_tensor=True, batch_size=128)
-                
+            embeddings = self.embedding_store.encode(
+                [self._triple_text(nid) for nid in uncached_ids], self._encode_texts, self.embedding_batch_size
+            )
             for nid, emb in zip(uncached_ids, embeddings):
-                self.semantic_cache[nid] = emb.cpu().numpy()
+                self.semantic_cache[nid] = emb
         return np.array([self.semantic_cache[nid] for nid in node_ids])
 
-    def _compute_jaccard_matrix_vectorized(self, level_nodes):
-
-        node_to_idx = {node: i for i, node in enumerate(self.node_list)}
-        level_indices = [node_to_idx[node] for node in level_nodes if node in node_to_idx]
-
-        if not level_indices:
-            return np.zeros((len(level_nodes), len(level_nodes)))
-
-        sub_adj = self.adjacency_sparse[level_indices][:, level_indices]
-        intersection = sub_adj.dot(sub_adj.T).toarray()
-        row_sums = np.array(sub_adj.sum(axis=1)).flatten()
-
-        union = row_sums[:, None] + row_sums - intersection
-        jaccard_matrix = intersection / (union + 1e-9)
-        np.fill_diagonal(jaccard_matrix, 1.0)
-
-        return jaccard_matrix
+    def _compute_sim_matrix(self, level_nodes, top_k=None):
+        """
+        Sparse symmetric combined similarity, keeping each node's top_k most similar nodes
 
-    def _compute_sim_matrix(self, level_nodes):
-        start_time = time.time()
-        
+        Candidates are each node's top_k semantic neighbours (tiled kNN) and its
+        top_k structural neighbours (blocked sparse Jaccard); both similarities
+        are then computed exactly for the candidate pairs only, so memory is
+        O(n * top_k) instead of n x n.
+        """
         node_count = len(level_nodes)
         if node_count <= 1:
-            return np.eye(node_count)
+            return sp.csr_matrix((node_count, node_count), dtype=np.float32)
+        top_k = max(1, min(top_k or self.sim_top_k, node_count - 1))
 
-        embeddings = self.get_triple_embeddings_batch(level_nodes)
-        
-        embeddings_normalized = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-9)
-        semantic_sim_matrix = np.dot(embeddings_normalized, embeddings_normalized.T)
+        normalized = normalize_rows(self.get_triple_embeddings_batch(level_nodes))
+        sub_adj = self._level_adjacency(level_nodes)
 
-        structural_sim_matrix = self._compute_jaccard_matrix_vectorized(level_nodes)
-        
-        sim_matrix = (self.struct_weight * structural_sim_matrix + 
-                     (1 - self.struct_weight) * semantic_sim_matrix)
-        return sim_matrix
+        semantic_rows, semantic_cols = knn_threshold_edges(normalized, -1.0, top_k)
+        structural_rows, structural_cols, _ = jaccard_top_k(sub_adj, top_k)
+        pairs = np.unique(np.concatenate([semantic_rows, structural_rows]).astype(np.int64) * node_count +
+                          np.concatenate([semantic_cols, structural_cols]))
+        rows, cols = pairs // node_count, pairs % node_count
+
+        semantic_sim = pair_cosine(normalized, rows, cols)
+        structural_sim = jaccard_pairs(sub_adj, rows, cols)
+        sim = self.struct_weight * structural_sim + (1 - self.struct_weight) * semantic_sim
+
+        rows, cols, sim = top_k_per_row(sp.coo_matrix((sim, (rows, cols)), shape=(node_count, node_count)), top_k)
+        sim_matrix = sp.csr_matrix((sim, (rows, cols)), shape=(node_count, node_count), dtype=np.float32)
+        return sim_matrix.maximum(sim_matrix.T)
 
     def _fast_clustering(self, level_nodes, n_clusters=None):
         if len(level_nodes) <= 2:
@@ -173,7 +299,12 @@ class FastTreeComm:
         
         embeddings = self.get_triple_embeddings_batch(level_nodes)
         
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=5)
+        if self.community_engine == "minibatch_kmeans":
+            from sklearn.cluster import MiniBatchKMeans
+            kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, n_init=3, batch_size=1024)
+        else:
+            from sklearn.cluster import KMeans
+            kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=5)
         cluster_labels = kmeans.fit_predict(embeddings)
         
         clusters = defaultdict(list)
@@ -183,9 +314,22 @@ class FastTreeComm:
         return dict(clusters)
 
     def detect_communities(self, level_nodes, max_iter=1, merge_threshold=0.5):
+        """
+        Partition level nodes into communities with the configured engine
+
+        - kmeans: KMeans over all nodes, then each cluster is re-clustered and
+          similar sub-clusters merged (_refine_cluster)
+        - minibatch_kmeans: a single MiniBatchKMeans pass, no refinement
+        - louvain: Louvain on the sparse kNN-semantic + structural graph
+        """
         if len(level_nodes) <= 1:
             return {0: level_nodes} if level_nodes else {}
 
+        if self.community_engine == "louvain":
+            return self._louvain_communities(level_nodes)
+        if self.community_engine == "minibatch_kmeans":
+            return dict(enumerate(self._fast_clustering(level_nodes).values()))
+
         initial_clusters = self._fast_clustering(level_nodes)
         final_communities = {}
         comm_id = 0
@@ -202,6 +346,24 @@ class FastTreeComm:
         
         return final_communities
 
+    def _level_adjacency(self, level_nodes):
+        """Adjacency restricted to `level_nodes`, in their order"""
+        node_to_idx = {node: i for i, node in enumerate(self.node_list)}
+        level_indices = [node_to_idx[node] for node in level_nodes]
+        return self.adjacency_sparse[level_indices][:, level_indices]
+
+    def _louvain_communities(self, level_nodes):
+        embeddings = self.get_triple_embeddings_batch(level_nodes)
+        weights = similarity_graph(
+            embeddings,
+            self._level_adjacency(level_nodes),
+            struct_weight=self.struct_weight,
+            knn_k=self.community_knn_k,
+            knn_threshold=self.community_knn_threshold,
+        )
+        partition = louvain_partition(weights, resolution=self.louvain_resolution)
+        return {comm_id: [level_nodes[i] for i in members] for comm_id, members in enumerate(partition)}
+
     def _refine_cluster(self, cluster_nodes, max_iter, merge_threshold):
         if len(cluster_nodes) <= 3:
             return {0: cluster_nodes}
@@ -215,11 +377,6 @@ class FastTreeComm:
         for cluster_id, nodes in initial_clusters.items():
             center = self._compute_community_center(nodes)
             cluster_centers[cluster_id] = center
-        
-        center_nodes = list(cluster_centers.values())
-        center_sim_matrix = self._compute_sim_matrix(center_nodes)
-        
-        center_to_idx = {center: idx for idx, center in enumerate(center_nodes)}
 
         current_clusters = initial_clusters.copy()
         current_centers = cluster_centers.copy()
@@ -228,27 +385,18 @@ class FastTreeComm:
             changed = False
             
             cluster_ids = list(current_clusters.keys())
-            n_clusters = len(cluster_ids)
-            
-            cluster_similarities = []
+            # Only each center's top-k most similar centers are candidates for merging
+            center_sim_matrix = self._compute_sim_matrix([current_centers[c] for c in cluster_ids]).tocoo()
             
-            for i in range(n_clusters):
-                for j in range(i + 1, n_clusters):
-                    cluster1_id = cluster_ids[i]
-                    cluster2_id = cluster_ids[j]
-                    
-                    center1 = current_centers[cluster1_id]
-                    center2 = current_centers[cluster2_id]
-                    idx1 = center_to_idx[center1]
-                    idx2 = center_to_idx[center2]
-                    center_sim = center_sim_matrix[idx1][idx2]
-                    
-                    if center_sim >= merge_threshold:
-                        cluster_similarities.append({
-                            'cluster1': cluster1_id,
-                            'cluster2': cluster2_id,
-                            'similarity': center_sim
-                        })
+            cluster_similarities = [
+                {
+                    'cluster1': cluster_ids[i],
+                    'cluster2': cluster_ids[j],
+                    'similarity': float(center_sim)
+                }
+                for i, j, center_sim in zip(center_sim_matrix.row, center_sim_matrix.col, center_sim_matrix.data)
+                if i < j and center_sim >= merge_threshold
+            ]
             
             cluster_similarities.sort(key=lambda x: x['similarity'], reverse=True)
             
@@ -271,9 +419,7 @@ class FastTreeComm:
                         merged_nodes = current_clusters[cluster1_id] + current_clusters[cluster2_id]
                         new_clusters[next_cluster_id] = merged_nodes
                         
-                        new_center = self._compute_community_center(merged_nodes)
-                        new_centers[next_cluster_id] = new_center
-                        center_to_idx[new_center] = len(center_to_idx)
+                        new_centers[next_cluster_id] = self._compute_community_center(merged_nodes)
                         
                         merged_clusters.add(cluster1_id)
                         merged_clusters.add(cluster2_id)
@@ -314,21 +460,18 @@ class FastTreeComm:
             return community_nodes[0]
         return self.extract_keywords_from_community(community_nodes)[0]
 
-    def _build_batch_prompt(self, community_batch):
-        batch_data = []
-        for comm_id, members in community_batch:
-            member_names = [self.node_names[n] for n in members]
-            center_node = self._compute_community_center(members)
-            center_name = self.node_names[center_node]
-            
-            comm_info = {
-                "id": comm_id,
-                "center": center_name,
-                "members": member_names[:10], 
-                "size": len(members)
-            }
-            batch_data.append(comm_info)
-        
+    def _community_info(self, comm_id, members) -> Dict:
+        """Community data sent to the LLM for naming"""
+        member_names = [self.node_names[n] for n in members]
+        center_node = self._compute_community_center(members)
+        return {
+            "id": comm_id,
+            "center": self.node_names[center_node],
+            "members": member_names[:10],
+            "size": len(members)
+        }
+
+    def _build_batch_prompt(self, batch_data: List[Dict]):
         prompt = f"""Generate names and summaries for the following {len(batch_data)} communities.
         Communities data: {json.dumps(batch_data, ensure_ascii=False)}
         
@@ -356,55 +499,165 @@ class FastTreeComm:
         response_json = json_repair.loads(response_text)
 
         return response_json
-        
 
-    def create_super_nodes(self, comm_to_nodes: Dict[str, List[str]], level: int = 4, batch_size: int = 5):
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough prompt token count: ~4 ASCII characters per token, one token per other character"""
+        ascii_chars = sum(1 for char in text if ord(char) < 128)
+        return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+    def _pack_naming_batches(self, infos: List[Dict], max_batch_size: int) -> List[List[Dict]]:
+        """Group community infos into prompts of at most max_batch_size communities and ~naming_token_budget tokens"""
+        batches, current, current_tokens = [], [], 0
+        for info in infos:
+            tokens = self._estimate_tokens(json.dumps(info, ensure_ascii=False))
+            if current and (len(current) >= max_batch_size or current_tokens + tokens > self.naming_token_budget):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(info)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _member_set_key(member_names: List[str]) -> str:
+        """Cache key of a community: hash of its sorted member names"""
+        payload = json.dumps(sorted(str(name) for name in member_names), ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def _load_naming_cache(self) -> Dict[str, Dict]:
+        if not self.naming_cache_path or not os.path.exists(self.naming_cache_path):
+            return {}
+        try:
+            with open(self.naming_cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to load community name cache {self.naming_cache_path}: {e}")
+            return {}
+
+    def _save_naming_cache(self, cache: Dict[str, Dict]) -> None:
+        if not self.naming_cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.naming_cache_path) or ".", exist_ok=True)
+            tmp_path = f"{self.naming_cache_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False)
+            os.replace(tmp_path, self.naming_cache_path)
+        except Exception as e:
+            logger.warning(f"Failed to save community name cache {self.naming_cache_path}: {e}")
+
+    def _fallback_community_info(self, comm_id, members) -> Dict:
+        """Name a community without the LLM: center member's name plus a member-list summary"""
+        center_name = self.node_names[self._compute_community_center(members)]
+        member_names = [self.node_names[n] for n in members]
+        shown = ", ".join(str(name) for name in member_names[:5])
+        more = f" and {len(member_names) - 5} more" if len(member_names) > 5 else ""
+        return {
+            "id": comm_id,
+            "name": str(center_name),
+            "summary": f"Community of {len(members)} members: {shown}{more}",
+        }
+
+    def _name_communities(self, communities: List[Tuple], batch_size: int) -> Dict[str, Dict]:
+        """
+        {str(comm_id): {"name", "summary"}} for every community.
+
+        Cached names (keyed by member set) are reused, communities smaller than
+        naming_min_llm_size are named without the LLM, and the rest are packed
+        into prompts by token budget and sent with up to naming_max_workers
+        requests in flight. A failed batch falls back to non-LLM names.
+        """
+        cache = self._load_naming_cache()
+        names: Dict[str, Dict] = {}
+        keys: Dict[str, str] = {}
+        to_request = []
+        for comm_id, members in communities:
+            key = keys[str(comm_id)] = self._member_set_key([self.node_names[n] for n in members])
+            if key in cache:
+                names[str(comm_id)] = cache[key]
+            elif not self.llm_client or len(members) < self.naming_min_llm_size:
+                names[str(comm_id)] = self._fallback_community_info(comm_id, members)
+            else:
+                to_request.append((comm_id, members))
+
+        batches = self._pack_naming_batches(
+            [self._community_info(comm_id, members) for comm_id, members in to_request], batch_size
+        )
+        logger.info(
+            f"Naming {len(communities)} communities: {len(communities) - len(to_request)} from cache or without LLM, "
+            f"{len(to_request)} in {len(batches)} LLM batches"
+        )
+
+        def _name_batch(batch_data: List[Dict]) -> Dict[str, Dict]:
+            llm_results = self._call_llm_api_batch(self._build_batch_prompt(batch_data))
+            return {str(item.get("id", "")): item for item in llm_results if isinstance(item, dict)}
+
+        members_by_id = {str(comm_id): members for comm_id, members in to_request}
+        if batches:
+            with futures.ThreadPoolExecutor(max_workers=min(self.naming_max_workers, len(batches))) as executor:
+                future_to_batch = {executor.submit(_name_batch, batch): batch for batch in batches}
+                for future in futures.as_completed(future_to_batch):
+                    batch = future_to_batch[future]
+                    try:
+                        llm_dict = future.result()
+                    except Exception as e:
+                        logger.error(f"Batch LLM processing failed: {e}")
+                        llm_dict = {}
+                    for info in batch:
+                        comm_key = str(info["id"])
+                        llm_info = llm_dict.get(comm_key, {})
+                        if llm_info.get("name"):
+                            names[comm_key] = {
+                                "name": llm_info["name"],
+                                "summary": llm_info.get("summary", f"Community of {info['size']} members"),
+                            }
+                            cache[keys[comm_key]] = names[comm_key]
+                        else:
+                            names[comm_key] = self._fallback_community_info(info["id"], members_by_id[comm_key])
+            self._save_naming_cache(cache)
+
+        return names
+
+    def create_super_nodes(self, comm_to_nodes: Dict[str, List[str]], level: int = 4, batch_size: Optional[int] = None):
+        """
+        Add one community node per community with at least two members, linked by member_of edges.
+
+        batch_size caps the communities per naming prompt (default: tree_comm.naming_max_batch_size).
+        """
         super_nodes = {}
         communities = [(comm_id, members) for comm_id, members in comm_to_nodes.items() 
                       if len(members) >= 2]
-        
-        for i in range(0, len(communities), batch_size):
-            batch = communities[i:i+batch_size]
-            
-            if self.llm_client:
-                try:
-                    batch_prompt = self._build_batch_prompt(batch)
-                    llm_results = self._call_llm_api_batch(batch_prompt)
-                    
-                    llm_dict = {str(item.get("id", "")): item for item in llm_results}
-                except Exception as e:
-                    logger.error(f"Batch LLM processing failed: {e}")
-                    llm_dict = {}
-            else:
-                llm_dict = {}
-            
-            for comm_id, members in batch:
-                try:
-                    llm_info = llm_dict.get(str(comm_id), {})
-                    comm_name = llm_info.get("name", f"Community_{comm_id}")
-                    comm_summary = llm_info.get("summary", f"Community of {len(members)} members")
-                    
-                    super_node_id = f"comm_{level}_{comm_id}"
-                    member_names = [self.node_names[n] for n in members]
-                    
-                    self.graph.add_node(
-                        super_node_id,
-                        label="community",
-                        level=level,
-                        properties={
-                            "name": comm_name,
-                            "description": comm_summary,
-                            "members": member_names
-                        }
-                    )
-                    
-                    for node in members:
-                        self.graph.add_edge(node, super_node_id, relation="member_of")
-                    
-                    super_nodes[super_node_id] = member_names
-                    
-                except Exception as e:
-                    logger.error(f"Error creating super node for community {comm_id}: {e}")
+        names = self._name_communities(communities, batch_size or self.naming_max_batch_size)
+
+        for comm_id, members in communities:
+            try:
+                comm_info = names.get(str(comm_id), {})
+                comm_name = comm_info.get("name", f"Community_{comm_id}")
+                comm_summary = comm_info.get("summary", f"Community of {len(members)} members")
+                
+                super_node_id = f"comm_{level}_{comm_id}"
+                member_names = [self.node_names[n] for n in members]
+                
+                self.graph.add_node(
+                    super_node_id,
+                    label="community",
+                    level=level,
+                    properties={
+                        "name": comm_name,
+                        "description": comm_summary,
+                        "members": member_names
+                    }
+                )
+                
+                for node in members:
+                    self.graph.add_edge(node, super_node_id, relation="member_of")
+                
+                super_nodes[super_node_id] = member_names
+                
+            except Exception as e:
+                logger.error(f"Error creating super node for community {comm_id}: {e}")
         
         logger.info(f"Created {len(super_nodes)} super nodes")
         return super_nodes
@@ -418,6 +671,7 @@ class FastTreeComm:
         node_embeddings = self.get_triple_embeddings_batch(community_nodes)
         avg_embedding = np.mean(node_embeddings, axis=0)
         
+        from sklearn.metrics.pairwise import cosine_similarity
         semantic_scores = cosine_similarity(node_embeddings, [avg_embedding]).flatten()
         
         max_degree = max(structural_scores.values()) if structural_scores else 1
@@ -433,7 +687,7 @@ class FastTreeComm:
         top_nodes = sorted(community_nodes, key=lambda x: combined_scores[x], reverse=True)[:top_k]
         return top_nodes
 
-    def create_super_nodes_with_keywords(self, comm_to_nodes: Dict[str, List[str]], level: int = 4, batch_size: int = 5):
+    def create_super_nodes_with_keywords(self, comm_to_nodes: Dict[str, List[str]], level: int = 4, batch_size: Optional[int] = None):
         super_nodes = self.create_super_nodes(comm_to_nodes, level, batch_size)
         
         keyword_mapping = {}
@@ -470,4 +724,123 @@ class FastTreeComm:
         
         return super_nodes, keyword_mapping
 
-    
\ No newline at end of file
+    
+    def _centroid_cohesion(self, members: List[str]) -> Tuple[np.ndarray, float]:
+        """Normalized centroid of the members' triple embeddings and their mean cosine to it"""
+        embeddings = normalize_rows(self.get_triple_embeddings_batch(members))
+        centroid = embeddings.mean(axis=0)
+        norm = np.linalg.norm(centroid)
+        if norm > 0:
+            centroid = centroid / norm
+        return centroid, float(np.mean(embeddings @ centroid))
+
+    def record_community_stats(self, comm_to_nodes: Dict, level: int = 4) -> None:
+        """Store each community's size and cohesion as the baseline for incremental drift checks"""
+        for comm_id, members in comm_to_nodes.items():
+            super_node_id = f"comm_{level}_{comm_id}"
+            if super_node_id not in self.graph or len(members) < 2:
+                continue
+            properties = self.graph.nodes[super_node_id]["properties"]
+            properties["clustered_size"] = len(members)
+            properties["cohesion"] = round(self._centroid_cohesion(members)[1], 4)
+
+    def existing_communities(self, level: int = 4) -> Dict[str, List[str]]:
+        """comm_id -> member node ids of the community nodes already in the graph"""
+        prefix = f"comm_{level}_"
+        communities = {}
+        for node, data in self.graph.nodes(data=True):
+            if data.get("label") != "community" or data.get("level") != level or not str(node).startswith(prefix):
+                continue
+            members = [u for u, _, relation in self.graph.in_edges(node, data="relation") if relation == "member_of"]
+            communities[str(node)[len(prefix):]] = list(dict.fromkeys(members))
+        return communities
+
+    def _remove_community(self, comm_id, level: int = 4) -> None:
+        """Remove a community node and the keyword nodes that only describe it"""
+        super_node_id = f"comm_{level}_{comm_id}"
+        for keyword_node in list(self.graph.predecessors(super_node_id)):
+            if self.graph.nodes[keyword_node].get("label") != "keyword":
+                continue
+            keyword_of = {v for _, v, relation in self.graph.out_edges(keyword_node, data="relation")
+                          if relation == "keyword_of"}
+            if keyword_of <= {super_node_id}:
+                self.graph.remove_node(keyword_node)
+        self.graph.remove_node(super_node_id)
+
+    def update_communities(self, level_nodes: List[str], level: int = 4, batch_size: Optional[int] = None):
+        """
+        Incrementally maintain the communities already in the graph
+
+        - Level nodes without a community join the existing community with the
+          most similar centroid when the cosine reaches incremental_assign_threshold;
+          the rest are clustered into new communities
+        - A community that grew by more than incremental_size_drift (relative to
+          its clustered_size) or lost more than incremental_cohesion_drift cohesion
+          is re-clustered on its own members
+        - Only new and re-clustered communities are named and get keywords;
+          communities that absorbed members without drifting keep their name
+
+        Returns (super_nodes, keyword_mapping) for the rebuilt communities, as
+        create_super_nodes_with_keywords does, or None when the graph has no
+        communities at this level yet.
+        """
+        existing = self.existing_communities(level)
+        if not existing:
+            return None
+
+        level_set = set(level_nodes)
+        communities, assigned = {}, set()
+        for comm_id, members in existing.items():
+            communities[comm_id] = [node for node in members if node in level_set and node not in assigned]
+            assigned.update(communities[comm_id])
+        new_nodes = [node for node in level_nodes if node not in assigned]
+
+        comm_ids = [comm_id for comm_id, members in communities.items() if members]
+        baseline, grown, leftovers = {}, {}, new_nodes
+        if comm_ids and new_nodes:
+            for comm_id in comm_ids:
+                baseline[comm_id] = self._centroid_cohesion(communities[comm_id])
+            centroids = np.stack([baseline[comm_id][0] for comm_id in comm_ids])
+            sims = normalize_rows(self.get_triple_embeddings_batch(new_nodes)) @ centroids.T
+            best = sims.argmax(axis=1)
+            leftovers = []
+            for node, index, score in zip(new_nodes, best, sims[np.arange(len(new_nodes)), best]):
+                if score >= self.incremental_assign_threshold:
+                    grown.setdefault(comm_ids[index], []).append(node)
+                else:
+                    leftovers.append(node)
+
+        numeric_ids = [int(comm_id) for comm_id in existing if comm_id.isdigit()]
+        next_id = max(numeric_ids, default=-1) + 1
+        rebuilt = {}
+
+        for comm_id, added in grown.items():
+            members = communities[comm_id] + added
+            properties = self.graph.nodes[f"comm_{level}_{comm_id}"]["properties"]
+            base_size = properties.get("clustered_size") or len(communities[comm_id])
+            base_cohesion = properties.get("cohesion", baseline[comm_id][1])
+            cohesion = self._centroid_cohesion(members)[1]
+            if len(members) > base_size * (1 + self.incremental_size_drift) or \
+                    base_cohesion - cohesion > self.incremental_cohesion_drift:
+                self._remove_community(comm_id, level)
+                for sub_comm in self.detect_communities(members).values():
+                    rebuilt[next_id] = sub_comm
+                    next_id += 1
+            else:
+                super_node_id = f"comm_{level}_{comm_id}"
+                for node in added:
+                    self.graph.add_edge(node, super_node_id, relation="member_of")
+                properties["members"] = [self.node_names[node] for node in members]
+
+        if len(leftovers) > 1:
+            for sub_comm in self.detect_communities(leftovers).values():
+                rebuilt[next_id] = sub_comm
+                next_id += 1
+
+        logger.info(
+            f"Incremental communities: {len(new_nodes)} new nodes, {len(new_nodes) - len(leftovers)} assigned to "
+            f"{len(grown)} existing communities, {len(rebuilt)} communities rebuilt"
+        )
+        super_nodes, keyword_mapping = self.create_super_nodes_with_keywords(rebuilt, level, batch_size)
+        self.record_community_stats(rebuilt, level)
+        return super_nodes, keyword_mapping
@@ -0,0 +1,170 @@
+"""
+Persistent disjoint-set (union-find) over entity ids.
+
+One structure is shared by every stage that merges entities (head dedup,
+tail dedup application, retrieval alias resolution), so merges are
+transitive everywhere and new entities can be merged incrementally instead of
+recomputing all groups from scratch.
+
+Ids are interned to dense integers; parent pointers and ranks are flat
+arrays with path compression and union by rank. The root of a set is an
+internal detail: each set also carries an explicit representative, chosen by
+the caller on union (e.g. the LLM-chosen canonical entity), and that is what
+find() returns. The structure is saved as a single .npz next to the graph.
+"""
+
+import os
+from typing import Dict, Hashable, Iterable, List, Optional
+
+import numpy as np
+
+from utils.logger import logger
+
+__all__ = ["EntityUnionFind", "resolver_path_for_graph"]
+
+FORMAT_VERSION = 1
+
+
+def resolver_path_for_graph(graph_path: str) -> str:
+    """Path of the union-find file saved alongside a graph JSON file"""
+    root, _ = os.path.splitext(graph_path)
+    return f"{root}_entity_resolution.npz"
+
+
+class EntityUnionFind:
+    """Disjoint sets of entity ids with caller-chosen representatives"""
+
+    def __init__(self, ids: Iterable[Hashable] = ()):
+        self._ids: List[Hashable] = []
+        self._index: Dict[Hashable, int] = {}
+        self._parent: List[int] = []
+        self._rank: List[int] = []
+        # Representative index, meaningful at root positions only
+        self._representative: List[int] = []
+        for entity_id in ids:
+            self.add(entity_id)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, entity_id: Hashable) -> bool:
+        return entity_id in self._index
+
+    def add(self, entity_id: Hashable) -> int:
+        """Register an id as a singleton set (no-op if known); returns its index"""
+        index = self._index.get(entity_id)
+        if index is None:
+            index = len(self._ids)
+            self._index[entity_id] = index
+            self._ids.append(entity_id)
+            self._parent.append(index)
+            self._rank.append(0)
+            self._representative.append(index)
+        return index
+
+    def _root(self, index: int) -> int:
+        parent = self._parent
+        root = index
+        while parent[root] != root:
+            root = parent[root]
+        # Path compression
+        while parent[index] != root:
+            parent[index], index = root, parent[index]
+        return root
+
+    def find(self, entity_id: Hashable) -> Hashable:
+        """Representative of the id's set; unknown ids are their own representative"""
+        index = self._index.get(entity_id)
+        if index is None:
+            return entity_id
+        return self._ids[self._representative[self._root(index)]]
+
+    def connected(self, first: Hashable, second: Hashable) -> bool:
+        if first == second:
+            return True
+        if first not in self._index or second not in self._index:
+            return False
+        return self._root(self._index[first]) == self._root(self._index[second])
+
+    def union(self, duplicate: Hashable, canonical: Hashable) -> Hashable:
+        """
+        Merge the sets of both ids.
+
+        The merged set keeps the representative of `canonical`'s set, so callers
+        decide which entity survives independently of the internal tree shape.
+
+        Returns:
+            The representative of the merged set
+        """
+        duplicate_root = self._root(self.add(duplicate))
+        canonical_root = self._root(self.add(canonical))
+        representative = self._representative[canonical_root]
+        if duplicate_root != canonical_root:
+            # Union by rank
+            if self._rank[duplicate_root] > self._rank[canonical_root]:
+                duplicate_root, canonical_root = canonical_root, duplicate_root
+            self._parent[duplicate_root] = canonical_root
+            if self._rank[duplicate_root] == self._rank[canonical_root]:
+                self._rank[canonical_root] += 1
+            self._representative[canonical_root] = representative
+        return self._ids[representative]
+
+    def mapping(self) -> Dict[Hashable, Hashable]:
+        """{entity_id: representative} for every id that is not its own representative"""
+        result = {}
+        for index, entity_id in enumerate(self._ids):
+            representative = self._ids[self._representative[self._root(index)]]
+            if representative != entity_id:
+                result[entity_id] = representative
+        return result
+
+    def groups(self) -> Dict[Hashable, List[Hashable]]:
+        """{representative: members} for every set with more than one member"""
+        members: Dict[Hashable, List[Hashable]] = {}
+        for index, entity_id in enumerate(self._ids):
+            members.setdefault(self._ids[self._representative[self._root(index)]], []).append(entity_id)
+        return {representative: group for representative, group in members.items() if len(group) > 1}
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Fully compress first so the saved parents point straight at roots
+        for index in range(len(self._ids)):
+            self._root(index)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            version=np.array([FORMAT_VERSION]),
+            ids=np.array([str(entity_id) for entity_id in self._ids], dtype=str),
+            parent=np.array(self._parent, dtype=np.int64),
+            rank=np.array(self._rank, dtype=np.int16),
+            representative=np.array(self._representative, dtype=np.int64),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["EntityUnionFind"]:
+        """Load a structure saved with save(); returns None if missing or from another format version"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"][0]) != FORMAT_VERSION:
+                logger.warning(f"Ignoring entity resolution file {path} with format version {int(data['version'][0])}")
+                return None
+            resolver = cls()
+            resolver._ids = data["ids"].tolist()
+            resolver._index = {entity_id: index for index, entity_id in enumerate(resolver._ids)}
+            resolver._parent = data["parent"].tolist()
+            resolver._rank = data["rank"].tolist()
+            resolver._representative = data["representative"].tolist()
+        return resolver
+
+    @classmethod
+    def from_alias_graph(cls, graph) -> "EntityUnionFind":
+        """Rebuild from node properties written by head dedup (node_role == "alias", alias_of)"""
+        resolver = cls()
+        for node_id, data in graph.nodes(data=True):
+            properties = data.get("properties", {}) if isinstance(data, dict) else {}
+            canonical = properties.get("alias_of") if isinstance(properties, dict) else None
+            if canonical and properties.get("node_role") == "alias":
+                resolver.union(node_id, canonical)
+        return resolver
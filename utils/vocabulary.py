@@ -0,0 +1,89 @@
+"""
+String vocabularies for relations and labels.
+
+A knowledge graph has a few hundred distinct relations and a handful of node
+labels / schema types, but each edge or node holds its own copy of the
+string as parsed from an LLM response. A Vocabulary maps each distinct
+value to a small integer code, in first-seen order, and keeps one canonical
+object per value:
+
+- intern(value) returns the canonical object, so all edges share one
+  string per relation and equality checks hit the identity fast path
+- code(value) returns the integer code, for grouping keys, array storage
+  (CompactGraph) and FAISS row ids
+- vocab[code] maps a code back to its value
+
+None is a valid value (e.g. an edge without a relation).
+"""
+
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional
+
+__all__ = ["Vocabulary", "relation_vocabulary"]
+
+
+class Vocabulary:
+    """Distinct values <-> dense integer codes, in first-seen order"""
+
+    __slots__ = ("_codes", "_values")
+
+    def __init__(self, values: Iterable[Hashable] = ()):
+        self._codes: Dict[Hashable, int] = {}
+        self._values: List[Hashable] = []
+        for value in values:
+            self.code(value)
+
+    def code(self, value: Hashable) -> int:
+        """Code of `value`, adding it if unseen"""
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._values)
+            self._codes[value] = code
+            self._values.append(value)
+        return code
+
+    def intern(self, value: Hashable) -> Hashable:
+        """Canonical object equal to `value`, adding it if unseen; unhashable values are returned as-is"""
+        try:
+            return self._values[self.code(value)]
+        except TypeError:
+            return value
+
+    def get(self, value: Hashable, default: Optional[int] = None) -> Optional[int]:
+        """Code of `value` without adding it"""
+        return self._codes.get(value, default)
+
+    @property
+    def values(self) -> List[Hashable]:
+        """All values, indexed by code"""
+        return self._values
+
+    def __getitem__(self, code: int) -> Hashable:
+        return self._values[code]
+
+    def __contains__(self, value) -> bool:
+        try:
+            return value in self._codes
+        except TypeError:
+            return False
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        return f"Vocabulary(size={len(self._values)})"
+
+
+def relation_vocabulary(graph) -> Vocabulary:
+    """
+    Sorted vocabulary of the relations present in `graph` (edges without one are skipped)
+
+    Uses the CompactGraph's own relation vocabulary when available instead of
+    scanning every edge.
+    """
+    relations = getattr(graph, "relation_vocab", None)
+    if relations is None:
+        relations = {data['relation'] for _, _, data in graph.edges(data=True) if 'relation' in data}
+    return Vocabulary(sorted(relation for relation in relations if relation is not None))